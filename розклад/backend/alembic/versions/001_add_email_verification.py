@@ -16,9 +16,14 @@ branch_labels = None
 depends_on = None
 
 
+def _add_column(table: str, column: sa.Column):
+    if column.name not in {c['name'] for c in sa.inspect(op.get_bind()).get_columns(table)}:
+        op.add_column(table, column)
+
+
 def upgrade() -> None:
-    # Add is_verified column to users table
-    op.add_column('users', sa.Column('is_verified', sa.Boolean(), nullable=False, server_default='false'))
+    # Add is_verified column to users table (unless created on startup)
+    _add_column('users', sa.Column('is_verified', sa.Boolean(), nullable=False, server_default='false'))
 
 
 def downgrade() -> None:
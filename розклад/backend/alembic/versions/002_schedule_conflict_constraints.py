@@ -0,0 +1,61 @@
+"""schedule access-path indexes and conflict constraints
+
+Revision ID: 002_schedule_constraints
+Revises: 001_email_verification
+Create Date: 2026-10-18 12:00:00.000000
+
+Existing double bookings must be resolved before upgrading, otherwise the
+unique indexes cannot be built. Indexes the application already created on
+startup are left alone.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '002_schedule_constraints'
+down_revision = '001_email_verification'
+branch_labels = None
+depends_on = None
+
+WEEKLY_BOOKING = "specific_date IS NULL AND status <> 'CANCELLED'"
+DATED_BOOKING = "specific_date IS NOT NULL AND status <> 'CANCELLED'"
+EFFECTIVE_TEACHER = sa.text("coalesce(substitute_teacher_id, teacher_id)")
+
+INDEXES = [
+    ('ix_schedule_entries_group_slot', ['group_id', 'day_of_week', 'time_slot_id']),
+    ('ix_schedule_entries_teacher_slot', ['teacher_id', 'day_of_week', 'time_slot_id']),
+    ('ix_schedule_entries_classroom_slot', ['classroom_id', 'day_of_week', 'time_slot_id']),
+    ('ix_schedule_entries_substitute_teacher_id', ['substitute_teacher_id']),
+    ('ix_schedule_entries_specific_date', ['specific_date']),
+]
+
+UNIQUE_BOOKINGS = [
+    ('uq_schedule_weekly_teacher', ['day_of_week', 'time_slot_id', EFFECTIVE_TEACHER], WEEKLY_BOOKING),
+    ('uq_schedule_weekly_group', ['day_of_week', 'time_slot_id', 'group_id'], WEEKLY_BOOKING),
+    ('uq_schedule_weekly_classroom', ['day_of_week', 'time_slot_id', 'classroom_id'], WEEKLY_BOOKING),
+    ('uq_schedule_dated_teacher', ['specific_date', 'time_slot_id', EFFECTIVE_TEACHER], DATED_BOOKING),
+    ('uq_schedule_dated_group', ['specific_date', 'time_slot_id', 'group_id'], DATED_BOOKING),
+    ('uq_schedule_dated_classroom', ['specific_date', 'time_slot_id', 'classroom_id'], DATED_BOOKING),
+]
+
+
+def upgrade() -> None:
+    # Build the indexes without locking schedule_entries against writes
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, 'schedule_entries', columns, postgresql_concurrently=True, if_not_exists=True)
+        for name, columns, where in UNIQUE_BOOKINGS:
+            op.create_index(
+                name, 'schedule_entries', columns, unique=True,
+                postgresql_where=sa.text(where), sqlite_where=sa.text(where),
+                postgresql_concurrently=True, if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(UNIQUE_BOOKINGS):
+            op.drop_index(name, table_name='schedule_entries', postgresql_concurrently=True)
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='schedule_entries', postgresql_concurrently=True)
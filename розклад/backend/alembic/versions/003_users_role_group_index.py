@@ -0,0 +1,28 @@
+"""index users by role and group for notification fan-out
+
+Revision ID: 003_users_role_group
+Revises: 002_schedule_constraints
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '003_users_role_group'
+down_revision = '002_schedule_constraints'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_users_role_group_id', 'users', ['role', 'group_id'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_role_group_id', table_name='users', postgresql_concurrently=True)
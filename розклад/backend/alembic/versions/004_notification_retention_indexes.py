@@ -0,0 +1,59 @@
+"""index notifications for inboxes and retention sweeps
+
+Revision ID: 004_notification_retention
+Revises: 003_users_role_group
+Create Date: 2026-10-18 21:00:00.000000
+
+Also creates the notifications_archive table, unless the application
+already created it on startup.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004_notification_retention'
+down_revision = '003_users_role_group'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_notifications_user_read_created', ['user_id', 'is_read', 'created_at']),
+    ('ix_notifications_created_at', ['created_at']),
+]
+
+
+notification_type = sa.Enum(
+    'SCHEDULE_CHANGE', 'SUBSTITUTION', 'CANCELLATION', 'RESCHEDULE', 'CLASSROOM_CHANGE', 'CHANGE_REQUEST_UPDATE',
+    name='notificationtype', create_type=False,
+)
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('notifications_archive'):
+        op.create_table(
+            'notifications_archive',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('title', sa.String(), nullable=False),
+            sa.Column('message', sa.Text(), nullable=False),
+            sa.Column('type', notification_type, nullable=False),
+            sa.Column('is_read', sa.Boolean(), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('schedule_entry_id', sa.Integer(), nullable=True),
+            sa.Column('change_request_id', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('read_at', sa.DateTime(), nullable=True),
+            sa.Column('archived_at', sa.DateTime(), nullable=False),
+        )
+        op.create_index('ix_notifications_archive_user_id', 'notifications_archive', ['user_id'])
+
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, 'notifications', columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='notifications', postgresql_concurrently=True)
+    op.drop_table('notifications_archive')
@@ -0,0 +1,41 @@
+"""notification digests and delivery preference
+
+Revision ID: 005_notification_digests
+Revises: 004_notification_retention
+Create Date: 2026-10-18 22:00:00.000000
+
+Existing users keep one notification per event; digests are opt-in.
+Columns the application already created on startup are left alone.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005_notification_digests'
+down_revision = '004_notification_retention'
+branch_labels = None
+depends_on = None
+
+notification_delivery = sa.Enum('IMMEDIATE', 'DIGEST', name='notificationdelivery')
+
+
+def _add_column(table: str, column: sa.Column):
+    if column.name not in {c['name'] for c in sa.inspect(op.get_bind()).get_columns(table)}:
+        op.add_column(table, column)
+
+
+def upgrade() -> None:
+    notification_delivery.create(op.get_bind(), checkfirst=True)
+    _add_column('users', sa.Column(
+        'notification_delivery', notification_delivery, nullable=False, server_default='IMMEDIATE'
+    ))
+    _add_column('notifications', sa.Column('digest_count', sa.Integer(), nullable=False, server_default='1'))
+    _add_column('notifications_archive', sa.Column('digest_count', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    op.drop_column('notifications_archive', 'digest_count')
+    op.drop_column('notifications', 'digest_count')
+    op.drop_column('users', 'notification_delivery')
+    notification_delivery.drop(op.get_bind(), checkfirst=True)
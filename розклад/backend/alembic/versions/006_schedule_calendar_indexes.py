@@ -0,0 +1,38 @@
+"""index dated schedule entries for calendar ranges
+
+Revision ID: 006_schedule_calendar
+Revises: 005_notification_digests
+Create Date: 2026-10-19 10:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006_schedule_calendar'
+down_revision = '005_notification_digests'
+branch_labels = None
+depends_on = None
+
+DATED = sa.text("specific_date IS NOT NULL")
+
+INDEXES = [
+    ('ix_schedule_entries_group_date', ['group_id', 'specific_date']),
+    ('ix_schedule_entries_teacher_date', ['teacher_id', 'specific_date']),
+    ('ix_schedule_entries_classroom_date', ['classroom_id', 'specific_date']),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(
+                name, 'schedule_entries', columns, postgresql_where=DATED,
+                postgresql_concurrently=True, if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='schedule_entries', postgresql_concurrently=True)
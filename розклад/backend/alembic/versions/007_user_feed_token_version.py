@@ -0,0 +1,32 @@
+"""calendar feed token version
+
+Revision ID: 007_feed_token_version
+Revises: 006_schedule_calendar
+Create Date: 2026-10-19 12:00:00.000000
+
+Feed tokens issued before this revision carry no version and are treated
+as version 0, so existing subscriptions keep working until revoked.
+A column the application already created on startup is left alone.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007_feed_token_version'
+down_revision = '006_schedule_calendar'
+branch_labels = None
+depends_on = None
+
+
+def _add_column(table: str, column: sa.Column):
+    if column.name not in {c['name'] for c in sa.inspect(op.get_bind()).get_columns(table)}:
+        op.add_column(table, column)
+
+
+def upgrade() -> None:
+    _add_column('users', sa.Column('feed_token_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'feed_token_version')
@@ -0,0 +1,82 @@
+from datetime import date
+from typing import Callable, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.cache import response_cache
+from app.database import get_read_db
+from app.core.security import admin_institution
+from app.schemas.analytics import WorkloadReport, UtilizationReport, ChangeReport
+from app.services.analytics import (
+    load_occupancy, workload_report, utilization_report, change_report, default_change_range
+)
+from app.services.schedule_versions import ALL_SCOPE, REFERENCE_SCOPE, current_versions
+
+router = APIRouter()
+
+workload_adapter = TypeAdapter(WorkloadReport)
+utilization_adapter = TypeAdapter(UtilizationReport)
+change_adapter = TypeAdapter(ChangeReport)
+
+REPORT_TAGS = [f"{scope}:{scope_id}" for scope, scope_id in (ALL_SCOPE, REFERENCE_SCOPE)]
+
+
+@router.get("/workload", response_model=WorkloadReport)
+def get_workload(
+    institution_id: int = Depends(admin_institution),
+    db: Session = Depends(get_read_db),
+):
+    """Weekly load of every teacher and group: lessons, hours, busiest day and gaps.
+
+    Also reports how evenly lessons are spread over the teachers.
+    """
+    return _cached_report(db, f"workload:{institution_id}", workload_adapter,
+                          lambda: workload_report(load_occupancy(db, institution_id)))
+
+
+@router.get("/utilization", response_model=UtilizationReport)
+def get_utilization(
+    institution_id: int = Depends(admin_institution),
+    db: Session = Depends(get_read_db),
+):
+    """Share of the working week's periods each classroom is in use."""
+    return _cached_report(db, f"utilization:{institution_id}", utilization_adapter,
+                          lambda: utilization_report(load_occupancy(db, institution_id)))
+
+
+@router.get("/changes", response_model=ChangeReport)
+def get_change_rates(
+    institution_id: int = Depends(admin_institution),
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: Session = Depends(get_read_db),
+):
+    """Approved substitutions and cancellations per 100 scheduled lessons, per teacher.
+
+    Defaults to the last ANALYTICS_CHANGE_WINDOW_DAYS days.
+    """
+    default_from, default_to = default_change_range(settings.ANALYTICS_CHANGE_WINDOW_DAYS)
+    from_date, to_date = from_date or default_from, to_date or default_to
+    if to_date < from_date:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    return _cached_report(
+        db, f"changes:{institution_id}:{from_date}:{to_date}", change_adapter,
+        lambda: change_report(db, load_occupancy(db, institution_id), institution_id, from_date, to_date)
+    )
+
+
+def _cached_report(db: Session, name: str, adapter: TypeAdapter, build: Callable[[], dict]) -> Response:
+    """Serve a report from the response cache, building it on a miss.
+
+    Reports are keyed by the schedule versions, so any schedule write (in
+    any institution) or rename makes them stale.
+    """
+    versions = current_versions(db, [ALL_SCOPE, REFERENCE_SCOPE])
+    cache_key = f"analytics:{name}:{versions[ALL_SCOPE]}:{versions[REFERENCE_SCOPE]}"
+    body = response_cache.get(cache_key)
+    if body is None:
+        body = adapter.dump_json(adapter.validate_python(build()))
+        response_cache.set(cache_key, body, tags=REPORT_TAGS)
+    return Response(content=body, media_type="application/json")
@@ -1,34 +1,51 @@
-from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import EmailStr
 
-from app.core.config import settings
-from app.core.security import create_access_token, verify_password, get_password_hash
-from app.core.email import create_verification_token, verify_token, send_verification_email
-from app.database import get_db
+from app.core.passwords import PasswordPoolBusy, verify_password_async, get_password_hash_async
+from app.core.email import verify_token
+from app.database import get_async_db
 from app.models.user import User
-from app.schemas.user import UserCreate, UserInDB, Token, EmailVerification, EmailVerificationResponse
+from app.schemas.user import (
+    UserCreate, UserInDB, Token, RefreshTokenRequest, EmailVerification, EmailVerificationResponse
+)
+from app.services.refresh_tokens import issue_tokens, rotate_refresh_token, revoke_refresh_token
+from app.services.jobs import enqueue
 
 router = APIRouter()
 
 
+def _hashing_busy_response():
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Too many login attempts in progress, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
+
 @router.post("/register", response_model=UserInDB)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user."""
     # Check if user already exists
-    if db.query(User).filter(User.email == user.email).first():
+    if await db.scalar(select(User.id).where(User.email == user.email)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    if db.query(User).filter(User.username == user.username).first():
+    if await db.scalar(select(User.id).where(User.username == user.username)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already taken"
         )
     
+    try:
+        hashed_password = await get_password_hash_async(user.password)
+    except PasswordPoolBusy:
+        return _hashing_busy_response()
+    
     # Create new user (не активний до верифікації email)
     db_user = User(
         email=user.email,
@@ -36,7 +53,7 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         full_name=user.full_name,
         role=user.role,
         phone=user.phone,
-        hashed_password=get_password_hash(user.password),
+        hashed_password=hashed_password,
         institution_id=user.institution_id,
         teacher_id=user.teacher_id,
         group_id=user.group_id,
@@ -44,24 +61,26 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         is_verified=False
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    
-    # Відправити email для верифікації
-    verification_token = create_verification_token(db_user.email)
-    send_verification_email(db_user.email, verification_token)
+    # Відправити email для верифікації (у фоні, після commit)
+    enqueue(db, "send_verification_email", email=db_user.email)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Login and get access token."""
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await db.scalar(select(User).where(User.username == form_data.username))
+    try:
+        password_ok = bool(user) and await verify_password_async(form_data.password, user.hashed_password)
+    except PasswordPoolBusy:
+        return _hashing_busy_response()
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -79,15 +98,31 @@ def login(
             detail="Account is inactive. Please contact administrator."
         )
     
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.id}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return issue_tokens(user)
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(request: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    """Exchange a refresh token for a new access and refresh token."""
+    tokens = await rotate_refresh_token(db, request.refresh_token)
+    if tokens is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return tokens
+
+
+@router.post("/logout")
+async def logout(request: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    """Revoke a refresh token and every token rotated from the same login."""
+    await revoke_refresh_token(db, request.refresh_token)
+    return {"message": "Logged out"}
 
 
 @router.post("/verify-email", response_model=EmailVerificationResponse)
-def verify_email(verification: EmailVerification, db: Session = Depends(get_db)):
+async def verify_email(verification: EmailVerification, db: AsyncSession = Depends(get_async_db)):
     """Verify user email with token."""
     email = verify_token(verification.token)
     
@@ -97,7 +132,7 @@ def verify_email(verification: EmailVerification, db: Session = Depends(get_db))
             detail="Invalid or expired verification token"
         )
     
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -113,7 +148,7 @@ def verify_email(verification: EmailVerification, db: Session = Depends(get_db))
     # Активувати користувача
     user.is_verified = True
     user.is_active = True
-    db.commit()
+    await db.commit()
     
     return {
         "message": "Email successfully verified! You can now login.",
@@ -122,9 +157,9 @@ def verify_email(verification: EmailVerification, db: Session = Depends(get_db))
 
 
 @router.post("/resend-verification")
-def resend_verification(email: EmailStr, db: Session = Depends(get_db)):
+async def resend_verification(email: EmailStr, db: AsyncSession = Depends(get_async_db)):
     """Resend verification email."""
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email))
     
     if not user:
         # Не показуємо чи існує користувач (безпека)
@@ -137,8 +172,8 @@ def resend_verification(email: EmailStr, db: Session = Depends(get_db)):
         )
     
     # Відправити новий токен
-    verification_token = create_verification_token(user.email)
-    send_verification_email(user.email, verification_token)
+    enqueue(db, "send_verification_email", email=user.email)
+    await db.commit()
     
     return {"message": "Verification email sent successfully"}
 
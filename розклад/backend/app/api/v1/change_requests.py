@@ -1,15 +1,22 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from datetime import datetime
 
-from app.database import get_db
+from app.core.config import settings
+from app.database import get_db, get_read_db
+from app.core.pagination import paginate_newest_first
 from app.core.security import get_current_active_user, require_role
-from app.models.user import User
+from app.models.user import User, UserRole
 from app.models.change_request import ChangeRequest, ChangeRequestStatus
 from app.models.schedule import ScheduleEntry
-from app.models.notification import Notification, NotificationType
-from app.schemas.change_request import ChangeRequestCreate, ChangeRequestUpdate, ChangeRequestInDB
+from app.schemas.change_request import (
+    ChangeRequestCreate, ChangeRequestUpdate, ChangeRequestInDB, ChangeRequestDecision, ChangeRequestBatchResult
+)
+from app.schemas.pagination import Page
+from app.services.conflicts import find_conflicts, conflict_detail, booking_guard
+from app.services.jobs import enqueue
+from app.services.change_requests import apply_change, process_batch
 
 router = APIRouter()
 
@@ -38,22 +45,53 @@ def create_change_request(
         created_by=current_user.id
     )
     db.add(db_request)
+    db.flush()
+    
+    # Notify admins once the request is committed
+    enqueue(db, "notify_change_request_created", change_request_id=db_request.id)
     db.commit()
     db.refresh(db_request)
     
-    # Notify admins
-    notify_admins_of_new_request(db, db_request)
-    
     return db_request
 
 
-@router.get("/", response_model=List[ChangeRequestInDB])
+@router.post("/batch", response_model=ChangeRequestBatchResult)
+def process_change_requests(
+    decisions: List[ChangeRequestDecision],
+    atomic: bool = Query(False),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("super_admin", "admin"))
+):
+    """Approve or reject many change requests in one transaction (Admin/Super Admin only).
+
+    Approvals are checked for conflicts against the schedule and against
+    the earlier decisions of the batch. Each item gets a result; with
+    `atomic=true` nothing is applied unless every item succeeds.
+    """
+    if len(decisions) > settings.CHANGE_REQUEST_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many change requests: at most {settings.CHANGE_REQUEST_BATCH_MAX_ITEMS} per request"
+        )
+    
+    with booking_guard(db):
+        result = process_batch(db, decisions, current_user.id, atomic=atomic)
+        db.commit()
+    return result
+
+
+@router.get("/", response_model=Union[List[ChangeRequestInDB], Page[ChangeRequestInDB]])
 def get_change_requests(
     status: ChangeRequestStatus = None,
-    db: Session = Depends(get_db),
+    limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get change requests. Admins see all, teachers see their own."""
+    """Get change requests. Admins see all, teachers see their own.
+
+    Passing `limit` (or `cursor`) returns a page ordered newest first with `next_cursor`.
+    """
     query = db.query(ChangeRequest)
     
     if current_user.role == "teacher":
@@ -62,13 +100,16 @@ def get_change_requests(
     if status:
         query = query.filter(ChangeRequest.status == status)
     
-    return query.order_by(ChangeRequest.created_at.desc()).all()
+    if limit is None and cursor is None:
+        return query.order_by(ChangeRequest.created_at.desc()).all()
+    
+    return paginate_newest_first(query, ChangeRequest, limit, cursor)
 
 
 @router.get("/{request_id}", response_model=ChangeRequestInDB)
 def get_change_request(
     request_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get a specific change request."""
@@ -109,12 +150,12 @@ def update_change_request(
     if request_update.status == ChangeRequestStatus.APPROVED:
         apply_change_to_schedule(db, db_request)
     
-    db.commit()
+    with booking_guard(db):
+        # Notify relevant users once the change is committed
+        enqueue(db, "notify_change_request_processed", change_request_id=db_request.id)
+        db.commit()
     db.refresh(db_request)
     
-    # Notify relevant users
-    notify_users_of_change(db, db_request)
-    
     return db_request
 
 
@@ -127,75 +168,9 @@ def apply_change_to_schedule(db: Session, change_request: ChangeRequest):
     if not schedule_entry:
         return
     
-    if change_request.change_type == "cancellation":
-        schedule_entry.status = "cancelled"
-    elif change_request.change_type == "substitution":
-        schedule_entry.status = "substituted"
-        schedule_entry.substitute_teacher_id = change_request.new_teacher_id
-    elif change_request.change_type == "reschedule":
-        schedule_entry.status = "rescheduled"
-        if change_request.new_time_slot_id:
-            schedule_entry.time_slot_id = change_request.new_time_slot_id
-        if change_request.new_date:
-            schedule_entry.specific_date = change_request.new_date
-    elif change_request.change_type == "classroom_change":
-        schedule_entry.original_classroom_id = schedule_entry.classroom_id
-        schedule_entry.classroom_id = change_request.new_classroom_id
-    
-    schedule_entry.change_request_id = change_request.id
-    schedule_entry.notes = change_request.reason
-
-
-def notify_admins_of_new_request(db: Session, change_request: ChangeRequest):
-    """Notify all admins of a new change request."""
-    admins = db.query(User).filter(User.role.in_(["super_admin", "admin"])).all()
-    
-    for admin in admins:
-        notification = Notification(
-            user_id=admin.id,
-            title="New Change Request",
-            message=f"A new change request has been submitted: {change_request.change_type}",
-            type=NotificationType.CHANGE_REQUEST_UPDATE,
-            change_request_id=change_request.id
-        )
-        db.add(notification)
-
-
-def notify_users_of_change(db: Session, change_request: ChangeRequest):
-    """Notify relevant users when a change request is processed."""
-    schedule_entry = db.query(ScheduleEntry).filter(
-        ScheduleEntry.id == change_request.schedule_entry_id
-    ).first()
-    
-    if not schedule_entry:
-        return
+    apply_change(schedule_entry, change_request)
     
-    # Notify the requester
-    requester = db.query(User).filter(User.id == change_request.created_by).first()
-    if requester:
-        notification = Notification(
-            user_id=requester.id,
-            title=f"Change Request {change_request.status.value.title()}",
-            message=f"Your change request has been {change_request.status.value}",
-            type=NotificationType.CHANGE_REQUEST_UPDATE,
-            change_request_id=change_request.id
-        )
-        db.add(notification)
-    
-    # If approved, notify students in the group
-    if change_request.status == ChangeRequestStatus.APPROVED:
-        students = db.query(User).filter(
-            User.role == "student",
-            User.group_id == schedule_entry.group_id
-        ).all()
-        
-        for student in students:
-            notification = Notification(
-                user_id=student.id,
-                title="Schedule Change",
-                message=f"Your {schedule_entry.subject.name} class has been {change_request.change_type.value}",
-                type=NotificationType.SCHEDULE_CHANGE,
-                schedule_entry_id=schedule_entry.id
-            )
-            db.add(notification)
-
+    # Substitutions, reschedules and room changes must not double-book anyone
+    busy = find_conflicts(db, schedule_entry, ignore=[schedule_entry.id])
+    if busy:
+        raise HTTPException(status_code=400, detail=conflict_detail(busy))
@@ -3,7 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.core.security import get_current_active_user, require_role
 from app.models.user import User
 from app.models.classroom import Classroom, ClassroomType
@@ -50,7 +50,7 @@ def create_classroom(
 def get_classrooms(
     institution_id: int = None,
     type: ClassroomType = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all classrooms."""
@@ -69,7 +69,7 @@ def get_classrooms(
 @router.get("/{classroom_id}", response_model=ClassroomInDB)
 def get_classroom(
     classroom_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get a specific classroom."""
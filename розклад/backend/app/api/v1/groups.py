@@ -3,7 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.core.security import get_current_active_user, require_role
 from app.models.user import User
 from app.models.group import Group
@@ -47,7 +47,7 @@ def create_group(
 @router.get("/", response_model=List[GroupInDB])
 def get_groups(
     institution_id: int = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all groups."""
@@ -63,7 +63,7 @@ def get_groups(
 @router.get("/{group_id}", response_model=GroupInDB)
 def get_group(
     group_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get a specific group."""
@@ -0,0 +1,68 @@
+import enum
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.core.security import admin_institution
+from app.models.group import Group
+from app.models.teacher import Teacher
+from app.models.classroom import Classroom
+from app.models.subject import Subject
+from app.models.time_slot import TimeSlot
+from app.schemas.imports import ImportResult
+from app.services.imports import ImportFormatError, ImportSpec, file_format, import_rows, read_rows
+from app.api.v1.groups import GroupCreate
+from app.api.v1.teachers import TeacherCreate
+from app.api.v1.classrooms import ClassroomCreate
+from app.api.v1.subjects import SubjectCreate
+from app.api.v1.time_slots import TimeSlotCreate
+
+router = APIRouter()
+
+
+class ImportEntity(str, enum.Enum):
+    GROUPS = "groups"
+    TEACHERS = "teachers"
+    CLASSROOMS = "classrooms"
+    SUBJECTS = "subjects"
+    TIME_SLOTS = "time-slots"
+
+
+IMPORTS = {
+    ImportEntity.GROUPS: ImportSpec(Group, GroupCreate, ("name",)),
+    ImportEntity.TEACHERS: ImportSpec(Teacher, TeacherCreate, ("full_name",)),
+    ImportEntity.CLASSROOMS: ImportSpec(Classroom, ClassroomCreate, ("name",)),
+    ImportEntity.SUBJECTS: ImportSpec(Subject, SubjectCreate, ("name",)),
+    ImportEntity.TIME_SLOTS: ImportSpec(TimeSlot, TimeSlotCreate, ("period_number",)),
+}
+
+
+@router.post("/{entity}", response_model=ImportResult)
+def import_file(
+    entity: ImportEntity,
+    file: UploadFile = File(...),
+    institution_id: int = Depends(admin_institution),
+    atomic: bool = Query(False),
+    db: Session = Depends(get_db),
+):
+    """Create or update many records from a CSV or Excel file (Admin/Super Admin only).
+
+    The first row names the columns, as in the create request of the entity.
+    Rows matching an existing record of the institution by name (teachers:
+    full_name, time slots: period_number) update it; the others are created.
+    Invalid rows are reported by row number. With `atomic=true` nothing is
+    written unless every row is valid.
+    """
+    try:
+        rows = read_rows(file.file, file_format(file.filename))
+        result = import_rows(db, IMPORTS[entity], rows, institution_id)
+    except ImportFormatError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if atomic and result["failed"]:
+        db.rollback()
+        result["created"] = result["updated"] = 0
+    else:
+        db.commit()
+    return result
@@ -1,13 +1,23 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import asyncio
+import json
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from datetime import datetime
 
-from app.database import get_db
-from app.core.security import get_current_active_user
+from app.core.config import settings
+from app.database import get_async_db, get_async_read_db
+from app.core.pagination import paginate_newest_first_async
+from app.core.security import get_current_active_user, get_stream_user
+from app.core.events import event_broker
 from app.models.user import User
-from app.models.notification import Notification, NotificationType
+from app.models.notification import Notification, NotificationType, NotificationDelivery
+from app.models.notification_counter import NotificationCounter
+from app.schemas.pagination import Page
+from app.services.notification_counters import adjust_unread, reset_unread, count_unread
 
 router = APIRouter()
 
@@ -18,86 +28,193 @@ class NotificationInDB(BaseModel):
     message: str
     type: NotificationType
     is_read: bool
+    digest_count: int = 1
     created_at: datetime
-    read_at: datetime = None
+    read_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
 
 
-@router.get("/", response_model=List[NotificationInDB])
-def get_notifications(
+class NotificationPreferences(BaseModel):
+    delivery: NotificationDelivery
+
+
+class UnreadCount(BaseModel):
+    unread: int
+
+
+@router.get("/", response_model=Union[List[NotificationInDB], Page[NotificationInDB]])
+async def get_notifications(
     unread_only: bool = False,
-    db: Session = Depends(get_db),
+    limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get user's notifications."""
-    query = db.query(Notification).filter(Notification.user_id == current_user.id)
+    """Get user's notifications.
+
+    Passing `limit` (or `cursor`) returns a page ordered newest first with `next_cursor`.
+    """
+    query = select(Notification).where(Notification.user_id == current_user.id)
     
     if unread_only:
-        query = query.filter(Notification.is_read == False)
+        query = query.where(Notification.is_read == False)
+    
+    if limit is None and cursor is None:
+        return (await db.scalars(query.order_by(Notification.created_at.desc()))).all()
+    
+    return await paginate_newest_first_async(db, query, Notification, limit, cursor)
+
+
+@router.get("/unread-count", response_model=UnreadCount)
+async def get_unread_count(
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Number of unread notifications, read from the user's counter."""
+    unread = await db.scalar(
+        select(NotificationCounter.unread).where(NotificationCounter.user_id == current_user.id)
+    )
+    if unread is None:
+        # No counter yet (only older notifications); the reconciliation job creates it
+        unread = await db.run_sync(count_unread, current_user.id)
+    return {"unread": unread}
+
+
+@router.get("/preferences", response_model=NotificationPreferences)
+async def get_notification_preferences(
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get how the user's notifications are delivered."""
+    delivery = await db.scalar(select(User.notification_delivery).where(User.id == current_user.id))
+    return {"delivery": delivery}
+
+
+@router.put("/preferences", response_model=NotificationPreferences)
+async def update_notification_preferences(
+    preferences: NotificationPreferences,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Choose between one notification per event and merged digests."""
+    await db.execute(
+        update(User).where(User.id == current_user.id)
+        .values(notification_delivery=preferences.delivery)
+    )
+    await db.commit()
+    return preferences
+
+
+@router.get("/stream")
+async def stream_notifications(current_user: User = Depends(get_stream_user)):
+    """Server-sent events with new notifications and schedule changes.
+
+    Authenticate with the usual Bearer header or, from a browser
+    EventSource, with `?token=<access token>`. Events:
+
+    * `notification`: a new notification (NotificationInDB fields)
+    * `schedule_changed`: the schedule of the listed scopes changed; refetch it
+
+    A comment line is sent every STREAM_HEARTBEAT_SECONDS to keep proxies
+    from closing the connection. The stream holds no database connection.
+    """
+    async def events():
+        subscriber = event_broker.subscribe(current_user)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    item = await asyncio.wait_for(
+                        subscriber.queue.get(), timeout=settings.STREAM_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is None:
+                    # Fell too far behind; the client reconnects and refetches
+                    break
+                type, data = item
+                yield f"event: {type}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            event_broker.unsubscribe(subscriber)
     
-    return query.order_by(Notification.created_at.desc()).all()
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.put("/{notification_id}/read", response_model=NotificationInDB)
-def mark_notification_as_read(
+async def mark_notification_as_read(
     notification_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Mark a notification as read."""
-    notification = db.query(Notification).filter(
+    notification = await db.scalar(select(Notification).where(
         Notification.id == notification_id,
         Notification.user_id == current_user.id
-    ).first()
+    ))
     
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
     
-    notification.is_read = True
-    notification.read_at = datetime.utcnow()
-    db.commit()
-    db.refresh(notification)
+    # Conditional update: of two concurrent requests only one decrements
+    result = await db.execute(update(Notification).where(
+        Notification.id == notification_id,
+        Notification.is_read == False
+    ).values(
+        is_read=True,
+        read_at=datetime.utcnow()
+    ))
+    if result.rowcount:
+        await db.run_sync(adjust_unread, {current_user.id: -1})
+    await db.commit()
     
     return notification
 
 
 @router.put("/mark-all-read")
-def mark_all_notifications_as_read(
-    db: Session = Depends(get_db),
+async def mark_all_notifications_as_read(
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Mark all notifications as read."""
-    db.query(Notification).filter(
+    await db.execute(update(Notification).where(
         Notification.user_id == current_user.id,
         Notification.is_read == False
-    ).update({
-        "is_read": True,
-        "read_at": datetime.utcnow()
-    })
-    db.commit()
+    ).values(
+        is_read=True,
+        read_at=datetime.utcnow()
+    ))
+    await db.run_sync(reset_unread, current_user.id)
+    await db.commit()
     
     return {"message": "All notifications marked as read"}
 
 
 @router.delete("/{notification_id}")
-def delete_notification(
+async def delete_notification(
     notification_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Delete a notification."""
-    notification = db.query(Notification).filter(
+    notification = await db.scalar(select(Notification).where(
         Notification.id == notification_id,
         Notification.user_id == current_user.id
-    ).first()
+    ))
     
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
     
-    db.delete(notification)
-    db.commit()
+    if not notification.is_read:
+        await db.run_sync(adjust_unread, {current_user.id: -1})
+    await db.delete(notification)
+    await db.commit()
     
     return {"message": "Notification deleted successfully"}
 
@@ -1,116 +1,413 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import AsyncIterator, List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from datetime import date
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import TypeAdapter
+from datetime import date, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 
-from app.database import get_db
-from app.core.security import get_current_active_user, require_role
+from app.core.config import settings
+from app.core.cache import response_cache
+from app.database import get_async_db, get_async_read_db, get_read_db
+from app.core.pagination import decode_cursor, keyset_paginate, split_page
+from app.core.security import (
+    get_current_active_user, require_role, admin_institution, manages_institution, create_feed_token,
+    decode_feed_token
+)
 from app.models.user import User
-from app.models.schedule import ScheduleEntry, ScheduleStatus
-from app.schemas.schedule import ScheduleEntryCreate, ScheduleEntryUpdate, ScheduleEntryWithDetails
+from app.models.schedule import ScheduleEntry, ScheduleStatus, DayOfWeek
+from app.schemas.schedule import (
+    ScheduleEntryCreate, ScheduleEntryUpdate, ScheduleEntryWithDetails, ScheduleOccurrence, ScheduleBulkResult,
+    CalendarFeedKind, CalendarFeedLink
+)
+from app.schemas.pagination import Page
+from app.schemas.timetable import TimetableGenerateRequest, TimetableJobInDB
+from app.models.timetable_job import TimetableJob, TimetableJobStatus
+from app.services.schedule_details import schedule_details_query, row_to_details, fetch_entry_details
+from app.services.conflicts import find_conflicts, conflict_detail, booking_guard
+from app.services.schedule_bulk import bulk_create_entries
+from app.services.timetable_generation import start_generation_job, apply_generation_job, describe_job
+from app.services.schedule_scope import scope_for_user
+from app.services.schedule_versions import schedule_etag, etag_matches, cache_tags
+from app.services.calendar import weekly_template, expand_calendar
+from app.services import ics
+from app.services.schedule_export import export_periods, grid_rows, export_csv, export_xlsx, read_chunks
 
 router = APIRouter()
 
+# Serializers for cached schedule listings
+schedule_list_adapter = TypeAdapter(List[ScheduleEntryWithDetails])
+schedule_page_adapter = TypeAdapter(Page[ScheduleEntryWithDetails])
+occurrence_adapter = TypeAdapter(ScheduleOccurrence)
+
 
 @router.post("/", response_model=ScheduleEntryWithDetails)
-def create_schedule_entry(
+async def create_schedule_entry(
     entry: ScheduleEntryCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("super_admin", "admin"))
 ):
     """Create a new schedule entry (Admin/Super Admin only)."""
+    entry_id = await db.run_sync(_create_entry, entry)
+    return await db.run_sync(fetch_entry_details, entry_id)
+
+
+def _create_entry(db: Session, entry: ScheduleEntryCreate) -> int:
     # Check for conflicts
-    conflicts = db.query(ScheduleEntry).filter(
-        and_(
-            ScheduleEntry.day_of_week == entry.day_of_week,
-            ScheduleEntry.time_slot_id == entry.time_slot_id,
-            or_(
-                ScheduleEntry.teacher_id == entry.teacher_id,
-                ScheduleEntry.group_id == entry.group_id,
-                ScheduleEntry.classroom_id == entry.classroom_id
-            )
-        )
-    ).first()
+    busy = find_conflicts(db, entry)
+    if busy:
+        raise HTTPException(status_code=400, detail=conflict_detail(busy))
     
-    if conflicts:
+    db_entry = ScheduleEntry(**entry.dict())
+    db.add(db_entry)
+    with booking_guard(db):
+        db.flush()
+        entry_id = db_entry.id
+        db.commit()
+    return entry_id
+
+
+@router.post("/bulk", response_model=ScheduleBulkResult)
+async def bulk_create_schedule_entries(
+    entries: List[ScheduleEntryCreate],
+    atomic: bool = Query(False),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_role("super_admin", "admin"))
+):
+    """Create many schedule entries in one transaction (Admin/Super Admin only).
+
+    Every item is validated against existing entries and the rest of the batch;
+    invalid items are reported by index. With `atomic=true` nothing is created
+    unless every item is valid.
+    """
+    if len(entries) > settings.SCHEDULE_BULK_MAX_ITEMS:
         raise HTTPException(
             status_code=400,
-            detail="Schedule conflict: Teacher, group, or classroom already occupied at this time"
+            detail=f"Too many entries: at most {settings.SCHEDULE_BULK_MAX_ITEMS} per request"
         )
     
-    db_entry = ScheduleEntry(**entry.dict())
-    db.add(db_entry)
-    db.commit()
-    db.refresh(db_entry)
+    return await db.run_sync(_bulk_create, entries, atomic)
+
+
+def _bulk_create(db: Session, entries: List[ScheduleEntryCreate], atomic: bool) -> dict:
+    with booking_guard(db):
+        result = bulk_create_entries(db, entries, atomic=atomic)
+        db.commit()
+    return result
+
+
+@router.post("/generate", response_model=TimetableJobInDB, status_code=202)
+async def generate_timetable(
+    request: TimetableGenerateRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_role("super_admin", "admin"))
+):
+    """Start automatic timetable generation in the background (Admin/Super Admin only).
+
+    Poll GET /schedule/generate/{job_id} for progress, then apply the result
+    with POST /schedule/generate/{job_id}/apply.
+    """
+    institution_id = request.institution_id or current_user.institution_id
+    if not institution_id:
+        raise HTTPException(status_code=400, detail="institution_id is required")
+    if not manages_institution(current_user, institution_id):
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    if not request.curriculum:
+        raise HTTPException(status_code=400, detail="Curriculum is empty")
+    
+    job = await db.run_sync(start_generation_job, institution_id, current_user.id, request)
+    return describe_job(job)
+
+
+@router.get("/generate/{job_id}", response_model=TimetableJobInDB)
+async def get_timetable_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_role("super_admin", "admin"))
+):
+    """Get the status, progress and result of a generation job."""
+    job = await _get_timetable_job(db, job_id, current_user)
+    return describe_job(job)
+
+
+@router.post("/generate/{job_id}/apply", response_model=ScheduleBulkResult)
+async def apply_timetable_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_role("super_admin", "admin"))
+):
+    """Write a completed generation job's entries to the schedule."""
+    job = await _get_timetable_job(db, job_id, current_user)
+    if job.status != TimetableJobStatus.COMPLETED:
+        raise HTTPException(status_code=400, detail=f"Job is {job.status.value}, not completed")
     
-    return get_schedule_entry_with_details(db, db_entry)
+    return await db.run_sync(apply_generation_job, job)
+
 
+async def _get_timetable_job(db: AsyncSession, job_id: int, current_user: User) -> TimetableJob:
+    """Load a generation job of the user's institution (any for super admins)."""
+    job = await db.get(TimetableJob, job_id)
+    if not job or not manages_institution(current_user, job.institution_id):
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    return job
 
-@router.get("/", response_model=List[ScheduleEntryWithDetails])
-def get_schedule(
+
+@router.get("/", response_model=Union[List[ScheduleEntryWithDetails], Page[ScheduleEntryWithDetails]])
+async def get_schedule(
     group_id: Optional[int] = Query(None),
     teacher_id: Optional[int] = Query(None),
     classroom_id: Optional[int] = Query(None),
     specific_date: Optional[date] = Query(None),
-    db: Session = Depends(get_db),
+    limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get schedule entries with filters."""
-    query = db.query(ScheduleEntry)
-    
-    # Apply filters based on user role
-    if current_user.role == "student" and current_user.group_id:
-        query = query.filter(ScheduleEntry.group_id == current_user.group_id)
-    elif current_user.role == "teacher" and current_user.teacher_id:
-        query = query.filter(
-            or_(
-                ScheduleEntry.teacher_id == current_user.teacher_id,
-                ScheduleEntry.substitute_teacher_id == current_user.teacher_id
-            )
-        )
+    """Get schedule entries with filters.
+
+    Passing `limit` (or `cursor`) switches to keyset pagination ordered by
+    (day_of_week, time_slot_id, id) and returns a page with `next_cursor`.
+    Responses carry an ETag; a matching `If-None-Match` gets 304.
+    Everyone with the same effective filters (e.g. all students of a group)
+    shares one cached response until the schedule of that scope changes.
+    """
+    scope = scope_for_user(current_user, group_id, teacher_id, classroom_id, specific_date)
+    
+    # Conditional GET: answered from the version counters alone
+    etag = await db.run_sync(schedule_etag, scope, limit, cursor)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    # The ETag changes with every relevant write, so it also keys the cache
+    cache_key = "schedule:" + etag.strip('"')
+    body = response_cache.get(cache_key)
+    if body is None:
+        body = await _render_schedule(db, scope, limit, cursor)
+        response_cache.set(cache_key, body, tags=cache_tags(scope))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _render_schedule(db: AsyncSession, scope, limit: Optional[int], cursor: Optional[str]) -> bytes:
+    query = scope.apply(schedule_details_query())
     
-    # Apply additional filters
-    if group_id:
-        query = query.filter(ScheduleEntry.group_id == group_id)
-    if teacher_id:
-        query = query.filter(
-            or_(
-                ScheduleEntry.teacher_id == teacher_id,
-                ScheduleEntry.substitute_teacher_id == teacher_id
-            )
+    if limit is None and cursor is None:
+        items = [row_to_details(row) for row in await db.execute(query)]
+        return schedule_list_adapter.dump_json(schedule_list_adapter.validate_python(items))
+    
+    limit = limit or settings.DEFAULT_PAGE_SIZE
+    sort_columns = [ScheduleEntry.day_of_week, ScheduleEntry.time_slot_id, ScheduleEntry.id]
+    cursor_values = decode_cursor(cursor, [DayOfWeek, int, int]) if cursor else None
+    rows = (await db.execute(keyset_paginate(query, sort_columns, cursor_values, limit))).all()
+    rows, next_cursor = split_page(
+        rows, limit, lambda row: (row.day_of_week, row.time_slot_id, row.id)
+    )
+    page = {"items": [row_to_details(row) for row in rows], "next_cursor": next_cursor}
+    return schedule_page_adapter.dump_json(schedule_page_adapter.validate_python(page))
+
+
+@router.get("/calendar", response_model=List[ScheduleOccurrence])
+async def get_calendar(
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    group_id: Optional[int] = Query(None),
+    teacher_id: Optional[int] = Query(None),
+    classroom_id: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the classes of every day from `from` to `to` (inclusive).
+
+    Recurring entries are expanded to their dates; dated entries (one-off
+    classes, cancellations, substitutions and moves of a single week)
+    replace the recurring class of their group and time slot on that date.
+    The response is streamed in date and time order.
+    """
+    if to_date < from_date:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (to_date - from_date).days >= settings.CALENDAR_MAX_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Date range too long: at most {settings.CALENDAR_MAX_DAYS} days per request"
         )
-    if classroom_id:
-        query = query.filter(ScheduleEntry.classroom_id == classroom_id)
-    if specific_date:
-        query = query.filter(ScheduleEntry.specific_date == specific_date)
     
-    entries = query.all()
-    return [get_schedule_entry_with_details(db, entry) for entry in entries]
+    scope = scope_for_user(current_user, group_id, teacher_id, classroom_id)
+    template = await weekly_template(db, scope)
+    occurrences = expand_calendar(db, scope, from_date, to_date, template)
+    return StreamingResponse(_json_array(occurrences), media_type="application/json")
+
+
+async def _json_array(occurrences: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    separator = b"["
+    async for occurrence in occurrences:
+        yield separator + occurrence_adapter.dump_json(occurrence_adapter.validate_python(occurrence))
+        separator = b","
+    yield b"]" if separator == b"," else b"[]"
+
+
+@router.post("/ics/{kind}/{scope_id}/token", response_model=CalendarFeedLink)
+async def create_calendar_feed(
+    kind: CalendarFeedKind,
+    scope_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the subscription URL of a group's, teacher's or classroom's iCalendar feed.
+
+    The URL carries a token granting read access to this feed only. Users
+    restricted to their own schedule (students, teachers) can only
+    subscribe to it.
+    """
+    scope = ics.feed_scope(kind.value, scope_id)
+    if scope_for_user(current_user, **{f"{kind.value}_id": scope_id}) != scope:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    user = await db.get(User, current_user.id)
+    token = create_feed_token(current_user.id, kind.value, scope_id, user.feed_token_version)
+    url = request.url_for("get_calendar_feed", kind=kind.value, scope_id=scope_id)
+    return {"url": str(url.include_query_params(token=token))}
+
+
+@router.delete("/ics/tokens")
+async def revoke_calendar_feeds(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Revoke every calendar feed URL the current user has created."""
+    user = await db.get(User, current_user.id)
+    user.feed_token_version += 1
+    await db.commit()
+    return {"message": "Calendar feed links revoked"}
+
+
+@router.get("/ics/{kind}/{scope_id}")
+async def get_calendar_feed(
+    kind: CalendarFeedKind,
+    scope_id: int,
+    token: str = Query(...),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """iCalendar feed of a group, teacher or classroom (see POST .../token).
+
+    Supports conditional requests (ETag and Last-Modified); the rendered
+    feed is cached until the schedule it shows changes.
+    """
+    claims = decode_feed_token(token)
+    if not claims or claims.get("scope") != kind.value or claims.get("sid") != scope_id:
+        raise HTTPException(status_code=401, detail="Invalid feed token")
+    # Tokens issued before versioning carry no version and count as version 0
+    owner = await db.get(User, int(claims["sub"]))
+    if not owner or not owner.is_active or claims.get("ver", 0) != owner.feed_token_version:
+        raise HTTPException(status_code=401, detail="Invalid feed token")
+    
+    name = await db.run_sync(ics.feed_name, kind.value, scope_id)
+    if name is None:
+        raise HTTPException(status_code=404, detail=f"{kind.value.title()} not found")
+    
+    scope = ics.feed_scope(kind.value, scope_id)
+    etag, last_modified, tags = await db.run_sync(ics.feed_validators, scope)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    if etag_matches(if_none_match, etag) or (
+        not if_none_match and _not_modified_since(if_modified_since, last_modified)
+    ):
+        return Response(status_code=304, headers=headers)
+    
+    cache_key = "ics:" + etag.strip('"')
+    body = response_cache.get(cache_key)
+    if body is not None:
+        return Response(content=body, media_type=ics.MEDIA_TYPE, headers=headers)
+    feed = ics.render_feed(db, scope, name)
+    return StreamingResponse(_cache_stream(feed, cache_key, tags), media_type=ics.MEDIA_TYPE, headers=headers)
+
+
+def _not_modified_since(if_modified_since: Optional[str], last_modified) -> bool:
+    if not if_modified_since or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    # HTTP dates have whole seconds
+    return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+
+async def _cache_stream(chunks: AsyncIterator[bytes], cache_key: str, tags) -> AsyncIterator[bytes]:
+    """Pass a rendered response through, caching it once it is complete."""
+    body = []
+    async for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+    response_cache.set(cache_key, b"".join(body), tags=tags)
+
+
+@router.get("/export.csv")
+def export_schedule_csv(
+    institution_id: int = Depends(admin_institution),
+    db: Session = Depends(get_read_db),
+):
+    """Download the institution's weekly timetable as a CSV grid (Admin/Super Admin only).
+
+    One row per group and day, one column per period. The file is streamed
+    as it is read.
+    """
+    rows = grid_rows(db, institution_id, export_periods(db, institution_id))
+    return StreamingResponse(
+        export_csv(rows),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="timetable.csv"'}
+    )
+
+
+@router.get("/export.xlsx")
+def export_schedule_xlsx(
+    institution_id: int = Depends(admin_institution),
+    db: Session = Depends(get_read_db),
+):
+    """Download the institution's weekly timetable as an Excel grid (Admin/Super Admin only)."""
+    workbook = export_xlsx(grid_rows(db, institution_id, export_periods(db, institution_id)))
+    return StreamingResponse(
+        read_chunks(workbook),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": 'attachment; filename="timetable.xlsx"'}
+    )
 
 
 @router.get("/{entry_id}", response_model=ScheduleEntryWithDetails)
-def get_schedule_entry(
+async def get_schedule_entry(
     entry_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get a specific schedule entry."""
-    entry = db.query(ScheduleEntry).filter(ScheduleEntry.id == entry_id).first()
+    entry = await db.run_sync(fetch_entry_details, entry_id)
     if not entry:
         raise HTTPException(status_code=404, detail="Schedule entry not found")
     
-    return get_schedule_entry_with_details(db, entry)
+    return entry
 
 
 @router.put("/{entry_id}", response_model=ScheduleEntryWithDetails)
-def update_schedule_entry(
+async def update_schedule_entry(
     entry_id: int,
     entry_update: ScheduleEntryUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("super_admin", "admin"))
 ):
     """Update a schedule entry (Admin/Super Admin only)."""
+    await db.run_sync(_update_entry, entry_id, entry_update)
+    return await db.run_sync(fetch_entry_details, entry_id)
+
+
+def _update_entry(db: Session, entry_id: int, entry_update: ScheduleEntryUpdate):
     db_entry = db.query(ScheduleEntry).filter(ScheduleEntry.id == entry_id).first()
     if not db_entry:
         raise HTTPException(status_code=404, detail="Schedule entry not found")
@@ -119,40 +416,26 @@ def update_schedule_entry(
     for field, value in update_data.items():
         setattr(db_entry, field, value)
     
-    db.commit()
-    db.refresh(db_entry)
+    busy = find_conflicts(db, db_entry, ignore=[entry_id])
+    if busy:
+        raise HTTPException(status_code=400, detail=conflict_detail(busy))
     
-    return get_schedule_entry_with_details(db, db_entry)
+    with booking_guard(db):
+        db.commit()
 
 
 @router.delete("/{entry_id}")
-def delete_schedule_entry(
+async def delete_schedule_entry(
     entry_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("super_admin", "admin"))
 ):
     """Delete a schedule entry (Admin/Super Admin only)."""
-    db_entry = db.query(ScheduleEntry).filter(ScheduleEntry.id == entry_id).first()
+    db_entry = await db.get(ScheduleEntry, entry_id)
     if not db_entry:
         raise HTTPException(status_code=404, detail="Schedule entry not found")
     
-    db.delete(db_entry)
-    db.commit()
+    await db.delete(db_entry)
+    await db.commit()
     
     return {"message": "Schedule entry deleted successfully"}
-
-
-def get_schedule_entry_with_details(db: Session, entry: ScheduleEntry) -> dict:
-    """Helper function to get schedule entry with related details."""
-    return {
-        **entry.__dict__,
-        "group_name": entry.group.name,
-        "subject_name": entry.subject.name,
-        "teacher_name": entry.teacher.full_name,
-        "classroom_name": entry.classroom.name,
-        "time_slot_name": entry.time_slot.name,
-        "start_time": str(entry.time_slot.start_time),
-        "end_time": str(entry.time_slot.end_time),
-        "substitute_teacher_name": entry.substitute_teacher.full_name if entry.substitute_teacher else None
-    }
-
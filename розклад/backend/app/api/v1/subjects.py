@@ -3,7 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.core.security import get_current_active_user, require_role
 from app.models.user import User
 from app.models.subject import Subject, SubjectType
@@ -46,7 +46,7 @@ def create_subject(
 @router.get("/", response_model=List[SubjectInDB])
 def get_subjects(
     institution_id: int = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all subjects."""
@@ -62,7 +62,7 @@ def get_subjects(
 @router.get("/{subject_id}", response_model=SubjectInDB)
 def get_subject(
     subject_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get a specific subject."""
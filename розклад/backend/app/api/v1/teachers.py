@@ -3,7 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.core.security import get_current_active_user, require_role
 from app.models.user import User
 from app.models.teacher import Teacher
@@ -48,7 +48,7 @@ def create_teacher(
 @router.get("/", response_model=List[TeacherInDB])
 def get_teachers(
     institution_id: int = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all teachers."""
@@ -64,7 +64,7 @@ def get_teachers(
 @router.get("/{teacher_id}", response_model=TeacherInDB)
 def get_teacher(
     teacher_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get a specific teacher."""
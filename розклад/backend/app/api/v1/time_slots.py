@@ -4,7 +4,7 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from datetime import time
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.core.security import get_current_active_user, require_role
 from app.models.user import User
 from app.models.time_slot import TimeSlot
@@ -48,7 +48,7 @@ def create_time_slot(
 @router.get("/", response_model=List[TimeSlotInDB])
 def get_time_slots(
     institution_id: int = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all time slots."""
@@ -64,7 +64,7 @@ def get_time_slots(
 @router.get("/{time_slot_id}", response_model=TimeSlotInDB)
 def get_time_slot(
     time_slot_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get a specific time slot."""
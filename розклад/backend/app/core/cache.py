@@ -0,0 +1,152 @@
+"""Response cache with tag-based invalidation.
+
+Values are bytes (serialized responses). Each value is stored with a set of
+tags; `invalidate_tags` drops every value carrying one of them. Two
+backends are available, selected by CACHE_BACKEND:
+
+* "memory" - per-process LRU bounded by CACHE_MAX_ENTRIES, with a TTL.
+* "redis"  - shared by all workers (REDIS_URL); tags are Redis sets.
+* "none"   - caching disabled.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from app.core.config import settings
+
+
+class ResponseCache:
+    """Interface shared by the cache backends."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    def set(self, key: str, value: bytes, tags: Iterable[str] = (), ttl: Optional[int] = None):
+        pass
+
+    def invalidate_tags(self, tags: Iterable[str]):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUCache(ResponseCache):
+    """Thread-safe in-process LRU cache with per-entry expiry.
+
+    Unlike the shared backends it can hold any Python object, not just bytes.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: int = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._values: "OrderedDict[str, Tuple[float, Any, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._values.get(key)
+            if item is None:
+                return None
+            expires_at, value, _ = item
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._values.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, tags: Iterable[str] = (), ttl: Optional[int] = None):
+        tags = tuple(tags)
+        expires_at = time.monotonic() + (ttl or self.ttl_seconds)
+        with self._lock:
+            self._remove(key)
+            self._values[key] = (expires_at, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._values) > self.max_entries:
+                self._remove(next(iter(self._values)))
+
+    def invalidate_tags(self, tags: Iterable[str]):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._tags.clear()
+
+    def __len__(self):
+        return len(self._values)
+
+    def _remove(self, key: str):
+        item = self._values.pop(key, None)
+        if item is None:
+            return
+        for tag in item[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisCache(ResponseCache):
+    """Cache shared between workers through Redis.
+
+    Every tag is a set of the keys stored under it, expiring together with
+    the newest of them.
+    """
+
+    def __init__(self, url: str, ttl_seconds: int = 300, prefix: str = "rozklad:cache:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, tags: Iterable[str] = (), ttl: Optional[int] = None):
+        ttl = ttl or self.ttl_seconds
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, value, ex=ttl)
+        for tag in tags:
+            tag_key = self.prefix + "tag:" + tag
+            pipe.sadd(tag_key, self.prefix + key)
+            pipe.expire(tag_key, ttl)
+        pipe.execute()
+
+    def invalidate_tags(self, tags: Iterable[str]):
+        tag_keys = [self.prefix + "tag:" + tag for tag in tags]
+        if not tag_keys:
+            return
+        pipe = self.client.pipeline()
+        for tag_key in tag_keys:
+            pipe.smembers(tag_key)
+        keys = set().union(*pipe.execute())
+        self.client.delete(*tag_keys, *keys)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+def create_cache() -> ResponseCache:
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCache(settings.REDIS_URL, ttl_seconds=settings.CACHE_TTL_SECONDS)
+    if settings.CACHE_BACKEND == "memory":
+        return LRUCache(max_entries=settings.CACHE_MAX_ENTRIES, ttl_seconds=settings.CACHE_TTL_SECONDS)
+    return ResponseCache()
+
+
+response_cache = create_cache()
@@ -0,0 +1,109 @@
+"""Connection pools that record how long checkouts wait.
+
+Every engine created by app.database is registered here under a name, so
+the pool metrics endpoint can report each pool's size, usage, saturation
+and checkout wait times.
+"""
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Checkouts slower than this count as "waited" (the pool was exhausted)
+SLOW_CHECKOUT_SECONDS = 0.01
+
+
+class PoolStats:
+    """Checkout wait counters of one pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.waited = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            if wait >= SLOW_CHECKOUT_SECONDS:
+                self.waited += 1
+            if timed_out:
+                self.timeouts += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "waited_checkouts": self.waited,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(1000 * self.total_wait / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(1000 * self.max_wait, 3),
+            }
+
+
+class InstrumentedPoolMixin:
+    """Times every checkout of a QueuePool-based pool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+registered_engines: Dict[str, object] = {}
+
+
+def register_engine(name: str, engine):
+    """Make an engine (sync or async) visible to pool_metrics()."""
+    registered_engines[name] = getattr(engine, "sync_engine", engine)
+    return engine
+
+
+def pool_metrics() -> Dict[str, dict]:
+    """Size, usage and checkout wait statistics of every registered pool."""
+    metrics = {}
+    for name, engine in registered_engines.items():
+        pool = engine.pool
+        info = {"pool": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            info.update({
+                "size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "saturation": round(pool.checkedout() / capacity, 3) if capacity else None,
+            })
+        stats = getattr(pool, "stats", None)
+        if stats is not None:
+            info.update(stats.as_dict())
+        metrics[name] = info
+    return metrics
@@ -1,8 +1,7 @@
-from typing import List
 from datetime import datetime, timedelta
 from jose import jwt
 from app.core.config import settings
-import smtplib
+from app.core.mail_transport import smtp_configured, smtp_pool
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
@@ -45,7 +44,7 @@ def send_verification_email(email: str, token: str):
     
     # Якщо налаштований SMTP:
     try:
-        if settings.MAIL_USERNAME and settings.MAIL_PASSWORD:
+        if smtp_configured():
             print(f"📤 Відправка email через SMTP...")
             send_smtp_email(
                 to_email=email,
@@ -83,12 +82,12 @@ def send_verification_email(email: str, token: str):
             print(f"⚠️ SMTP не налаштований. Email НЕ відправлено.")
     except Exception as e:
         print(f"❌ Помилка відправки email: {e}")
-        import traceback
-        traceback.print_exc()
+        # Let the job queue retry the send
+        raise
 
 
-def send_smtp_email(to_email: str, subject: str, body: str):
-    """Send email using SMTP."""
+def build_email(to_email: str, subject: str, body: str) -> MIMEMultipart:
+    """Build an HTML email from the configured sender."""
     msg = MIMEMultipart('alternative')
     msg['Subject'] = subject
     msg['From'] = settings.MAIL_FROM
@@ -96,12 +95,12 @@ def send_smtp_email(to_email: str, subject: str, body: str):
     
     html_part = MIMEText(body, 'html')
     msg.attach(html_part)
-    
-    with smtplib.SMTP(settings.MAIL_SERVER, settings.MAIL_PORT) as server:
-        if settings.MAIL_TLS:
-            server.starttls()
-        server.login(settings.MAIL_USERNAME, settings.MAIL_PASSWORD)
-        server.send_message(msg)
+    return msg
+
+
+def send_smtp_email(to_email: str, subject: str, body: str):
+    """Send email using SMTP (over a pooled connection)."""
+    smtp_pool.send(build_email(to_email, subject, body))
 
 
 def send_password_reset_email(email: str, token: str):
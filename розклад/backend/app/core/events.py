@@ -0,0 +1,292 @@
+"""Push events to connected clients.
+
+Writes record events with `publish_event(db, event)`; they are delivered
+only if the transaction commits. Each API worker keeps its own
+`event_broker`, which hands events to the streams (SSE connections) of the
+users they concern. How an event reaches every worker depends on
+EVENT_BROADCAST:
+
+* "local": events are dispatched in the process that committed them.
+  Enough for a single API process with the in-process job worker.
+* "postgres": events are sent with pg_notify inside the transaction, so
+  PostgreSQL delivers them on commit to every worker listening on
+  EVENT_CHANNEL (including external job workers' events). Payloads must
+  stay under NOTIFY_PAYLOAD_LIMIT bytes: an event's recipients are split
+  over as many notifications as needed, and an event that cannot fit is
+  dropped with a logged error instead of failing the transaction.
+
+An event is a dict with a "type" and a "data" payload plus its audience:
+"recipients" ([[user_id, notification_id], ...]) or "scopes" (schedule
+scopes as [[name, id], ...]) with the "institutions" they belong to. Scope
+events reach super admins, the admins of those institutions and the users
+of those institutions whose own scopes are listed. "principals_changed"
+events carry "users" instead and drop those users from every worker's
+principal cache.
+
+An idle stream is just a parked coroutine and an empty queue; a client
+that falls STREAM_QUEUE_SIZE events behind is disconnected and is
+expected to reconnect and refetch.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.principals import Principal, forget_principal
+from app.models.user import User, UserRole
+
+logger = logging.getLogger(__name__)
+
+# Roles that see schedule changes of every scope of their institution
+SCHEDULE_ADMIN_ROLES = (UserRole.SUPER_ADMIN, UserRole.ADMIN)
+
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_PAYLOAD_LIMIT = 7999
+
+
+class Subscriber:
+    """One connected stream."""
+
+    def __init__(self, principal: Principal, queue_size: int):
+        self.principal = principal
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def sees_institutions(self, institutions: Set[int]) -> bool:
+        return self.principal.role == UserRole.SUPER_ADMIN or self.principal.institution_id in institutions
+
+    def scopes(self) -> Set[tuple]:
+        scopes = {("reference", 0)}
+        if self.principal.group_id:
+            scopes.add(("group", self.principal.group_id))
+        if self.principal.teacher_id:
+            scopes.add(("teacher", self.principal.teacher_id))
+        return scopes
+
+
+class EventBroker:
+    """Routes events to the subscribers of this process."""
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[Subscriber]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, principal: Principal) -> Subscriber:
+        """Register a stream; must be called from the event loop."""
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(principal, self.queue_size)
+        self._subscribers[principal.id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        streams = self._subscribers.get(subscriber.principal.id)
+        if streams is not None:
+            streams.discard(subscriber)
+            if not streams:
+                del self._subscribers[subscriber.principal.id]
+
+    def publish(self, event: dict):
+        """Dispatch an event; safe to call from any thread."""
+        if "users" in event:
+            for user_id in event["users"]:
+                forget_principal(user_id)
+            return
+        if self._loop is None or not self._subscribers:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._dispatch, event)
+        except RuntimeError:
+            # The loop has been closed (shutdown)
+            pass
+
+    def _dispatch(self, event: dict):
+        if "recipients" in event:
+            for user_id, notification_id in event["recipients"]:
+                data = dict(event["data"], id=notification_id)
+                for subscriber in list(self._subscribers.get(user_id, ())):
+                    self._deliver(subscriber, event["type"], data)
+        elif "scopes" in event:
+            scopes = {tuple(scope) for scope in event["scopes"]}
+            institutions = set(event.get("institutions", ()))
+            for streams in list(self._subscribers.values()):
+                for subscriber in list(streams):
+                    if not subscriber.sees_institutions(institutions):
+                        continue
+                    if subscriber.principal.role in SCHEDULE_ADMIN_ROLES or scopes & subscriber.scopes():
+                        self._deliver(subscriber, event["type"], event["data"])
+
+    def _deliver(self, subscriber: Subscriber, type: str, data: dict):
+        try:
+            subscriber.queue.put_nowait((type, data))
+            self.delivered += 1
+        except asyncio.QueueFull:
+            # Too slow: replace the backlog with a disconnect marker
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(None)
+            self.unsubscribe(subscriber)
+            self.dropped += 1
+
+    def metrics(self) -> dict:
+        return {
+            "broadcast": settings.EVENT_BROADCAST,
+            "users": len(self._subscribers),
+            "streams": sum(len(streams) for streams in self._subscribers.values()),
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+class LocalBroadcast:
+    """Deliver committed events to this process only."""
+
+    def __init__(self, broker: EventBroker):
+        self.broker = broker
+
+    def send(self, session: Session, event: dict):
+        session.info.setdefault("pending_events", []).append(event)
+
+    def committed(self, events):
+        for event in events:
+            self.broker.publish(event)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class PostgresBroadcast:
+    """Deliver events to every worker through LISTEN/NOTIFY."""
+
+    def __init__(self, broker: EventBroker, database_url: str, channel: str):
+        self.broker = broker
+        # asyncpg takes a plain libpq URL
+        self.dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.channel = channel
+        self._task: Optional[asyncio.Task] = None
+
+    def send(self, session: Session, event: dict):
+        payloads = notify_payloads(event, NOTIFY_PAYLOAD_LIMIT)
+        if not payloads:
+            logger.error("Dropped a %s event: it does not fit in a NOTIFY payload", event.get("type"))
+            return
+        # NOTIFY is transactional: delivered on commit, dropped on rollback
+        for payload in payloads:
+            session.connection().execute(select(func.pg_notify(self.channel, payload)))
+
+    def committed(self, events):
+        pass
+
+    async def start(self):
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _listen(self):
+        import asyncpg
+
+        def on_notify(connection, pid, channel, payload):
+            self.broker.publish(json.loads(payload))
+
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(self.channel, on_notify)
+                await closed.wait()
+                logger.warning("Event listener connection closed, reconnecting")
+            except asyncio.CancelledError:
+                if connection is not None:
+                    await connection.close()
+                raise
+            except Exception:
+                logger.exception("Event listener failed, reconnecting")
+            await asyncio.sleep(5)
+
+
+def _encode(value) -> str:
+    return json.dumps(value, default=str, ensure_ascii=False, separators=(",", ":"))
+
+
+def notify_payloads(event: dict, limit: int) -> List[str]:
+    """Serialize `event` into payloads of at most `limit` UTF-8 bytes.
+
+    The recipients of a notification event are split over several payloads
+    by their serialized size. Returns [] if the event cannot fit at all.
+    """
+    payload = _encode(event)
+    if len(payload.encode()) <= limit:
+        return [payload]
+    recipients = event.get("recipients")
+    if not recipients:
+        return []
+    base = len(_encode(dict(event, recipients=[])).encode())
+    payloads, chunk, size = [], [], base
+    for recipient in recipients:
+        # The recipient plus its separating comma
+        recipient_size = len(_encode(recipient)) + 1
+        if base + recipient_size > limit:
+            return []
+        if size + recipient_size > limit:
+            payloads.append(_encode(dict(event, recipients=chunk)))
+            chunk, size = [], base
+        chunk.append(recipient)
+        size += recipient_size
+    payloads.append(_encode(dict(event, recipients=chunk)))
+    return payloads
+
+
+def create_broadcast(broker: EventBroker):
+    if settings.EVENT_BROADCAST == "postgres":
+        return PostgresBroadcast(broker, settings.DATABASE_URL, settings.EVENT_CHANNEL)
+    return LocalBroadcast(broker)
+
+
+event_broker = EventBroker(queue_size=settings.STREAM_QUEUE_SIZE)
+broadcast = create_broadcast(event_broker)
+
+
+def publish_event(db: Session, event: dict):
+    """Deliver `event` to connected clients once `db` commits."""
+    broadcast.send(db, event)
+
+
+@event.listens_for(Session, "after_flush")
+def _publish_user_changes(session, flush_context):
+    changed = sorted(
+        obj.id for obj in list(session.dirty) + list(session.deleted)
+        if isinstance(obj, User) and obj.id is not None
+    )
+    if changed:
+        publish_event(session, {"type": "principals_changed", "users": changed})
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed_events(session):
+    if session.in_nested_transaction():
+        return
+    events = session.info.pop("pending_events", None)
+    if events:
+        broadcast.committed(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_events(session):
+    if session.in_nested_transaction():
+        return
+    session.info.pop("pending_events", None)
@@ -0,0 +1,231 @@
+"""Pooled SMTP transport.
+
+Opening an SMTP connection costs a TCP and TLS handshake plus a login, so
+the transport keeps up to MAIL_POOL_SIZE authenticated connections open
+and reuses them. A connection is replaced after
+MAIL_MAX_MESSAGES_PER_CONNECTION messages (providers cap messages per
+session), after MAIL_IDLE_TIMEOUT_SECONDS of inactivity, or when the
+server drops it. Sends are throttled to MAIL_RATE_LIMIT_PER_MINUTE across
+all connections of the process.
+
+`send_many` splits a bulk send into batches of MAIL_BATCH_SIZE and sends
+the batches in parallel, one connection each.
+"""
+import logging
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# SMTP errors after which the connection is discarded and the message retried
+# (socket errors are handled the same way)
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)
+
+
+def smtp_configured() -> bool:
+    """Whether emails are actually sent (otherwise they are only logged)."""
+    return settings.MAIL_ENABLED or bool(settings.MAIL_USERNAME and settings.MAIL_PASSWORD)
+
+
+class RateLimiter:
+    """Token bucket shared by all connections; `rate_per_minute` 0 disables it."""
+
+    def __init__(self, rate_per_minute: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class PooledConnection:
+    """An SMTP session plus the bookkeeping needed to decide when to replace it."""
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    def close(self):
+        try:
+            self.smtp.quit()
+        except Exception:
+            self.smtp.close()
+
+
+class SMTPPool:
+    """A bounded pool of authenticated SMTP connections."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = True,
+        use_ssl: bool = False,
+        size: int = 4,
+        max_messages_per_connection: int = 100,
+        idle_timeout: float = 60.0,
+        timeout: float = 30.0,
+        rate_per_minute: int = 0,
+        retries: int = 2,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.size = size
+        self.max_messages_per_connection = max_messages_per_connection
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.retries = retries
+        self.rate_limiter = RateLimiter(rate_per_minute)
+        self._idle: "queue.LifoQueue[PooledConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.sent = 0
+        self.failed = 0
+
+    def _connect(self) -> PooledConnection:
+        if self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.use_tls:
+                smtp.starttls()
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+        with self._lock:
+            self.connects += 1
+        return PooledConnection(smtp)
+
+    def _checkout(self) -> PooledConnection:
+        """Reuse a fresh idle connection or open a new one."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - conn.last_used < self.idle_timeout:
+                return conn
+            # The server has likely timed the session out by now
+            conn.close()
+
+    def _send_batch(self, messages: List[Message]) -> List[Tuple[Message, Exception]]:
+        """Send messages over one connection, reconnecting as needed."""
+        failures = []
+        conn = None
+        # At most `size` batches hold a connection at once
+        self._slots.acquire()
+        try:
+            for message in messages:
+                for attempt in range(self.retries + 1):
+                    try:
+                        if conn is None:
+                            # After a dropped connection the idle ones are suspect too
+                            conn = self._connect() if attempt else self._checkout()
+                        self.rate_limiter.acquire()
+                        conn.smtp.send_message(message)
+                        conn.sent += 1
+                        with self._lock:
+                            self.sent += 1
+                        if conn.sent >= self.max_messages_per_connection:
+                            conn.close()
+                            conn = None
+                        break
+                    except smtplib.SMTPException as exc:
+                        if not isinstance(exc, RECONNECT_ERRORS):
+                            # Refused sender/recipients or data: only this message failed
+                            failures.append((message, exc))
+                            break
+                        error = exc
+                    except OSError as exc:
+                        error = exc
+                    logger.warning("SMTP connection failed (attempt %s): %s", attempt + 1, error)
+                    if conn is not None:
+                        conn.smtp.close()
+                        conn = None
+                    if attempt == self.retries:
+                        failures.append((message, error))
+        finally:
+            if conn is not None:
+                conn.last_used = time.monotonic()
+                self._idle.put(conn)
+            self._slots.release()
+        with self._lock:
+            self.failed += len(failures)
+        return failures
+
+    def send(self, message: Message):
+        """Send one message; raises if it could not be delivered."""
+        failures = self.send_many([message])
+        if failures:
+            raise failures[0][1]
+
+    def send_many(self, messages: List[Message], batch_size: Optional[int] = None) -> List[Tuple[Message, Exception]]:
+        """Send messages in parallel batches; returns (message, error) for each failure."""
+        if not messages:
+            return []
+        batch_size = batch_size or settings.MAIL_BATCH_SIZE
+        batches = [messages[i:i + batch_size] for i in range(0, len(messages), batch_size)]
+        if len(batches) == 1:
+            return self._send_batch(batches[0])
+        with ThreadPoolExecutor(max_workers=min(self.size, len(batches)), thread_name_prefix="smtp") as executor:
+            return [failure for result in executor.map(self._send_batch, batches) for failure in result]
+
+    def metrics(self) -> dict:
+        return {
+            "pool_size": self.size,
+            "idle_connections": self._idle.qsize(),
+            "connects": self.connects,
+            "sent": self.sent,
+            "failed": self.failed,
+        }
+
+    def close(self):
+        """Close every idle connection."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+smtp_pool = SMTPPool(
+    host=settings.MAIL_SERVER,
+    port=settings.MAIL_PORT,
+    username=settings.MAIL_USERNAME,
+    password=settings.MAIL_PASSWORD,
+    use_tls=settings.MAIL_TLS,
+    use_ssl=settings.MAIL_SSL,
+    size=settings.MAIL_POOL_SIZE,
+    max_messages_per_connection=settings.MAIL_MAX_MESSAGES_PER_CONNECTION,
+    idle_timeout=settings.MAIL_IDLE_TIMEOUT_SECONDS,
+    timeout=settings.MAIL_TIMEOUT_SECONDS,
+    rate_per_minute=settings.MAIL_RATE_LIMIT_PER_MINUTE,
+)
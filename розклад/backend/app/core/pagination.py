@@ -0,0 +1,76 @@
+import base64
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+from app.core.config import settings
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key of the last row of a page into an opaque cursor."""
+    def plain(value):
+        if isinstance(value, Enum):
+            return value.value
+        if isinstance(value, (date, datetime)):
+            return value.isoformat()
+        return value
+
+    raw = json.dumps([plain(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, parsers: Sequence[Callable[[Any], Any]]) -> Tuple[Any, ...]:
+    """Decode a cursor produced by encode_cursor(), converting each value with its parser."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if len(values) != len(parsers):
+            raise ValueError("cursor length mismatch")
+        return tuple(parse(value) for parse, value in zip(parsers, values))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def keyset_paginate(query, columns: Sequence, cursor_values: Optional[Tuple], limit: int, descending: bool = False):
+    """Order a select by `columns` and seek past `cursor_values`.
+
+    The seek is a row-value comparison on an indexed sort key, so every page
+    costs the same as the first one. One extra row is fetched to detect
+    whether a next page exists.
+    """
+    if cursor_values is not None:
+        key = tuple_(*columns)
+        query = query.where(key < cursor_values if descending else key > cursor_values)
+    order = [column.desc() if descending else column.asc() for column in columns]
+    return query.order_by(*order).limit(limit + 1)
+
+
+def split_page(rows: List, limit: int, sort_key: Callable[[Any], Sequence[Any]]) -> Tuple[List, Optional[str]]:
+    """Trim the look-ahead row and build the cursor for the next page."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(sort_key(rows[-1]))
+
+
+def paginate_newest_first(query, model, limit: Optional[int], cursor: Optional[str]) -> dict:
+    """Keyset-paginate an ORM query on (created_at, id), newest first."""
+    limit = limit or settings.DEFAULT_PAGE_SIZE
+    cursor_values = decode_cursor(cursor, [datetime.fromisoformat, int]) if cursor else None
+    items = keyset_paginate(query, [model.created_at, model.id], cursor_values, limit, descending=True).all()
+    items, next_cursor = split_page(items, limit, lambda item: (item.created_at, item.id))
+    return {"items": items, "next_cursor": next_cursor}
+
+
+async def paginate_newest_first_async(db, statement, model, limit: Optional[int], cursor: Optional[str]) -> dict:
+    """Async counterpart of paginate_newest_first for a select() of `model`."""
+    limit = limit or settings.DEFAULT_PAGE_SIZE
+    cursor_values = decode_cursor(cursor, [datetime.fromisoformat, int]) if cursor else None
+    page = keyset_paginate(statement, [model.created_at, model.id], cursor_values, limit, descending=True)
+    items = (await db.scalars(page)).all()
+    items, next_cursor = split_page(items, limit, lambda item: (item.created_at, item.id))
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,123 @@
+"""bcrypt hashing, run in a bounded process pool.
+
+bcrypt is deliberately slow, so a burst of logins (everyone signing in at
+8:00) would otherwise occupy the API's threads and CPU. Hashes run in
+BCRYPT_WORKERS processes; at most BCRYPT_MAX_QUEUE more requests may wait
+for a worker, beyond that callers get PasswordPoolBusy (HTTP 503).
+
+This module must stay importable without the database: worker processes
+import it to run verify_password / get_password_hash.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Optional
+
+import bcrypt
+
+from app.core.config import settings
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against a hash."""
+    # Truncate password to 72 bytes if needed (bcrypt limitation)
+    password_bytes = plain_password.encode('utf-8')
+    if len(password_bytes) > 72:
+        password_bytes = password_bytes[:72]
+    
+    hashed_bytes = hashed_password.encode('utf-8')
+    return bcrypt.checkpw(password_bytes, hashed_bytes)
+
+
+def get_password_hash(password: str) -> str:
+    """Hash a password."""
+    # Truncate password to 72 bytes if needed (bcrypt limitation)
+    password_bytes = password.encode('utf-8')
+    if len(password_bytes) > 72:
+        password_bytes = password_bytes[:72]
+    
+    # Generate salt and hash
+    salt = bcrypt.gensalt()
+    hashed = bcrypt.hashpw(password_bytes, salt)
+    return hashed.decode('utf-8')
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when too many hashes are already waiting for a worker."""
+
+
+class PasswordPool:
+    """Process pool for bcrypt with a bounded queue and usage counters."""
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=get_context("spawn")
+                )
+            return self._executor
+
+    async def run(self, fn, *args):
+        """Run `fn(*args)` in the pool, failing fast when the queue is full."""
+        with self._lock:
+            if self.in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordPoolBusy()
+            self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.wrap_future(self._get_executor().submit(fn, *args))
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+                self.total_seconds += elapsed
+                self.max_seconds = max(self.max_seconds, elapsed)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "in_flight": self.in_flight,
+                "queued": max(self.in_flight - self.workers, 0),
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_ms": round(1000 * self.total_seconds / self.completed, 1) if self.completed else 0.0,
+                "max_ms": round(1000 * self.max_seconds, 1),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+password_pool = PasswordPool(
+    workers=settings.BCRYPT_WORKERS or os.cpu_count() or 1,
+    max_queue=settings.BCRYPT_MAX_QUEUE,
+)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_pool.run(get_password_hash, password)
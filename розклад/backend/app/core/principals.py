@@ -0,0 +1,121 @@
+"""The authenticated user as seen by request handlers.
+
+Handlers only need a user's id, role and scoping ids, so `get_current_user`
+returns a small immutable Principal instead of a User row. Principals are
+cached per worker and dropped as soon as a change to the user row commits:
+in this process right away, in the others through the event broadcast
+(app.core.events; with EVENT_BROADCAST "local" only this process is
+reached and other workers pick the change up after
+PRINCIPAL_CACHE_TTL_SECONDS).
+
+With TOKEN_EMBED_CLAIMS the principal is read from the access token
+itself, including whether the user is active, and nothing is looked up:
+a deactivated user keeps access until the token expires, which is why
+such tokens are short-lived (EMBEDDED_CLAIMS_TOKEN_EXPIRE_MINUTES).
+Refreshing them always reads the user row.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.models.user import User, UserRole
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    role: UserRole
+    is_active: bool
+    institution_id: Optional[int] = None
+    group_id: Optional[int] = None
+    teacher_id: Optional[int] = None
+
+
+PRINCIPAL_COLUMNS = (
+    User.id, User.role, User.is_active, User.institution_id, User.group_id, User.teacher_id
+)
+
+principal_cache = LRUCache(
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+def principal_claims(user) -> dict:
+    """Token claims describing `user` (see TOKEN_EMBED_CLAIMS)."""
+    return {
+        "role": UserRole(user.role).value,
+        "active": bool(user.is_active),
+        "institution_id": user.institution_id,
+        "group_id": user.group_id,
+        "teacher_id": user.teacher_id,
+    }
+
+
+def principal_from_claims(user_id: int, payload: dict) -> Optional[Principal]:
+    """Build a principal from token claims; None if the token carries none."""
+    try:
+        role = UserRole(payload["role"])
+        is_active = payload["active"]
+    except (KeyError, ValueError):
+        return None
+    return Principal(
+        id=user_id,
+        role=role,
+        is_active=bool(is_active),
+        institution_id=payload.get("institution_id"),
+        group_id=payload.get("group_id"),
+        teacher_id=payload.get("teacher_id"),
+    )
+
+
+def forget_principal(user_id: int):
+    """Drop the cached principal of `user_id` in this process."""
+    principal_cache.delete(f"user:{user_id}")
+
+
+async def load_principal(db, user_id: int, fresh: bool = False) -> Optional[Principal]:
+    """Return the cached principal of `user_id`, loading it with `db` on a miss.
+
+    `fresh` always reads the user row.
+    """
+    key = f"user:{user_id}"
+    principal = None if fresh else principal_cache.get(key)
+    if principal is None:
+        row = (await db.execute(select(*PRINCIPAL_COLUMNS).where(User.id == user_id))).first()
+        if row is None:
+            return None
+        principal = Principal(**row._mapping)
+        principal_cache.set(key, principal)
+    return principal
+
+
+# Drop cached principals once a change to their user row commits
+
+@event.listens_for(Session, "after_flush")
+def _collect_user_changes(session, flush_context):
+    changed = {
+        obj.id for obj in list(session.dirty) + list(session.deleted)
+        if isinstance(obj, User) and obj.id is not None
+    }
+    if changed:
+        session.info.setdefault("changed_users", set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    if session.in_nested_transaction():
+        return
+    for user_id in session.info.pop("changed_users", ()):
+        forget_principal(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_changes(session):
+    if session.in_nested_transaction():
+        return
+    session.info.pop("changed_users", None)
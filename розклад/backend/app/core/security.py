@@ -1,40 +1,17 @@
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-import bcrypt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.database import get_db
-from app.models.user import User
+from app.core.passwords import verify_password, get_password_hash
+from app.core.principals import Principal, load_principal, principal_from_claims
+from app.database import AsyncSessionLocal
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a hash."""
-    # Truncate password to 72 bytes if needed (bcrypt limitation)
-    password_bytes = plain_password.encode('utf-8')
-    if len(password_bytes) > 72:
-        password_bytes = password_bytes[:72]
-    
-    hashed_bytes = hashed_password.encode('utf-8')
-    return bcrypt.checkpw(password_bytes, hashed_bytes)
-
-
-def get_password_hash(password: str) -> str:
-    """Hash a password."""
-    # Truncate password to 72 bytes if needed (bcrypt limitation)
-    password_bytes = password.encode('utf-8')
-    if len(password_bytes) > 72:
-        password_bytes = password_bytes[:72]
-    
-    # Generate salt and hash
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password_bytes, salt)
-    return hashed.decode('utf-8')
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login", auto_error=False)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -49,31 +26,121 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get the current authenticated user."""
+def create_refresh_token(user_id: int, family: Optional[str] = None) -> str:
+    """Create a single-use refresh token.
+
+    `family` ties together all tokens rotated from one login, so a reused
+    token can revoke the whole chain.
+    """
+    to_encode = {
+        "sub": str(user_id),
+        "type": "refresh",
+        "jti": uuid.uuid4().hex,
+        "fam": family or uuid.uuid4().hex,
+        "exp": datetime.utcnow() + timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES),
+    }
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def decode_refresh_token(token: str) -> Optional[dict]:
+    """Return the claims of a valid, unexpired refresh token, else None."""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("type") != "refresh" or not payload.get("jti") or not payload.get("fam"):
+        return None
+    return payload
+
+
+def create_feed_token(user_id: int, kind: str, scope_id: int, version: int) -> str:
+    """Create a token granting read access to one calendar feed.
+
+    Calendar apps cannot log in, so the token is part of the subscription
+    URL and does not expire. It carries the user's feed_token_version and
+    is only accepted while that version is current and the user is active;
+    changing SECRET_KEY revokes all feed tokens.
+    """
+    to_encode = {"sub": str(user_id), "type": "feed", "scope": kind, "sid": scope_id, "ver": version}
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def decode_feed_token(token: str) -> Optional[dict]:
+    """Return the claims of a valid feed token, else None."""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("type") != "feed":
+        return None
+    return payload
+
+
+def token_user_id(token: Optional[str]) -> Optional[int]:
+    """The user id of a validly signed access token, without loading the user."""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        user_id = int(payload.get("sub"))
+    except (JWTError, AttributeError, TypeError, ValueError):
+        return None
+    if payload.get("type") in ("refresh", "feed"):
+        return None
+    return user_id
+
+
+async def authenticate_token(token: Optional[str]) -> Principal:
+    """Resolve an access token to its principal, or raise 401."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if not token:
+        raise credentials_exception
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
+        user_id = int(payload.get("sub"))
+    except (JWTError, TypeError, ValueError):
+        raise credentials_exception
+    # Refresh and feed tokens are only accepted by their own endpoints
+    if payload.get("type") in ("refresh", "feed"):
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = principal_from_claims(user_id, payload) if settings.TOKEN_EMBED_CLAIMS else None
+    if user is None:
+        async with AsyncSessionLocal() as db:
+            user = await load_principal(db, user_id)
     if user is None:
         raise credentials_exception
     return user
 
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    """Get the current authenticated user.
+
+    Served from the token's claims (TOKEN_EMBED_CLAIMS) or the principal
+    cache; only a cache miss loads the user, in a short-lived async session
+    of its own.
+    """
+    return await authenticate_token(token)
+
+
+async def get_stream_user(
+    token: Optional[str] = Query(None),
+    bearer: Optional[str] = Depends(optional_oauth2_scheme),
+) -> Principal:
+    """Active user of a streaming request.
+
+    Browsers' EventSource cannot send headers, so the access token may also
+    be passed as the `token` query parameter.
+    """
+    user = await authenticate_token(bearer or token)
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return user
+
+
+async def get_current_active_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     """Get the current active user."""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -82,7 +149,7 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
 
 def require_role(*allowed_roles: str):
     """Dependency to check if user has required role."""
-    async def role_checker(current_user: User = Depends(get_current_active_user)) -> User:
+    async def role_checker(current_user: Principal = Depends(get_current_active_user)) -> Principal:
         if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -91,3 +158,24 @@ def require_role(*allowed_roles: str):
         return current_user
     return role_checker
 
+
+def manages_institution(user: Principal, institution_id: int) -> bool:
+    """Whether the user administers the institution (super admins administer all)."""
+    return user.role == "super_admin" or user.institution_id == institution_id
+
+
+async def admin_institution(
+    institution_id: Optional[int] = Query(None),
+    current_user: Principal = Depends(require_role("super_admin", "admin")),
+) -> int:
+    """Institution an admin endpoint works on (`institution_id` query parameter).
+
+    Defaults to the user's own institution; admins cannot name another one.
+    """
+    institution_id = institution_id or current_user.institution_id
+    if not institution_id:
+        raise HTTPException(status_code=400, detail="institution_id is required")
+    if not manages_institution(current_user, institution_id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+    return institution_id
+
@@ -1,11 +1,74 @@
+import itertools
+import time
+from typing import Optional
+
+from fastapi import Request
+from starlette.datastructures import Headers, MutableHeaders
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from app.core.cache import response_cache
 from app.core.config import settings
+from app.core.db_pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool, register_engine
+
+# asyncio drivers used when ASYNC_DATABASE_URL is not set
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+# Set after a successful write; reads go to the primary until it expires
+READ_PRIMARY_COOKIE = "read_primary_until"
+# The same pin for the authenticated user, in the cache backend, so it
+# also holds for the user's other clients and for clients without cookies
+READ_PRIMARY_KEY = "read_primary:{}"
+
+
+def async_database_url(url: str) -> str:
+    """Swap the sync driver of a database URL for its asyncio counterpart."""
+    url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """Pool settings for an engine; SQLite (development, tests) keeps its default pools."""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _create_engines(url: str, async_url: str, name: str):
+    sync_engine = register_engine(name, create_engine(url, **engine_options(url)))
+    async_engine = register_engine(
+        f"{name}-async", create_async_engine(async_url, **engine_options(async_url, is_async=True))
+    )
+    return sync_engine, async_engine
 
-engine = create_engine(settings.DATABASE_URL)
+
+engine, async_engine = _create_engines(
+    settings.DATABASE_URL,
+    settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL),
+    "primary",
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+replica_engines = [
+    _create_engines(url, async_database_url(url), f"replica-{index}")
+    for index, url in enumerate(settings.DATABASE_REPLICA_URLS)
+]
+_replica_cycle = itertools.cycle(replica_engines)
 
 Base = declarative_base()
 
@@ -18,3 +81,85 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db():
+    """Dependency for getting an async database session."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _request_user_id(headers) -> Optional[int]:
+    """The user id of the request's bearer token, None for anonymous requests."""
+    from app.core.security import token_user_id
+
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    return token_user_id(token) if scheme.lower() == "bearer" else None
+
+
+def _read_engines(request: Request):
+    """Pick a replica (sync, async) engine pair, or None to read from the primary."""
+    if not replica_engines:
+        return None
+    try:
+        if float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time():
+            return None
+    except ValueError:
+        pass
+    user_id = _request_user_id(request.headers)
+    if user_id is not None and response_cache.get(READ_PRIMARY_KEY.format(user_id)):
+        return None
+    return next(_replica_cycle)
+
+
+def get_read_db(request: Request):
+    """Dependency for read-only endpoints: a session on a replica when configured."""
+    engines = _read_engines(request)
+    db = SessionLocal(bind=engines[0]) if engines else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    """Async counterpart of get_read_db."""
+    engines = _read_engines(request)
+    async with (AsyncSessionLocal(bind=engines[1]) if engines else AsyncSessionLocal()) as db:
+        yield db
+
+
+class ReadYourWritesMiddleware:
+    """Pin a client to the primary for a while after each successful write.
+
+    Replicas lag behind the primary, so without this a client could write
+    and then immediately read its old data back from a replica. The pin is
+    a cookie and, for authenticated writes, an entry keyed by the user id
+    in the cache backend: shared by all workers with CACHE_BACKEND=redis,
+    per process with "memory", and absent with "none".
+    """
+
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in self.SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                user_id = _request_user_id(Headers(scope=scope))
+                if user_id is not None:
+                    response_cache.set(READ_PRIMARY_KEY.format(user_id), b"1", ttl=settings.READ_YOUR_WRITES_SECONDS)
+                until = time.time() + settings.READ_YOUR_WRITES_SECONDS
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "set-cookie",
+                    f"{READ_PRIMARY_COOKIE}={until:.3f}; Max-Age={settings.READ_YOUR_WRITES_SECONDS}; "
+                    "Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
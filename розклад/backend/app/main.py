@@ -1,10 +1,17 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
-from app.database import engine, Base
+from app.database import engine, Base, replica_engines, ReadYourWritesMiddleware
+from app.core.db_pool import pool_metrics
+from app.core.passwords import password_pool
+from app.core.mail_transport import smtp_pool
+from app.core.events import event_broker, broadcast
+from app.core.security import require_role
+from app.services.jobs import start_local_worker, stop_local_worker
+import app.services.job_handlers  # noqa: F401  (register the job handlers)
 from app.api.v1 import auth, schedule, change_requests
-from app.api.v1 import groups, teachers, classrooms, subjects, time_slots, notifications
+from app.api.v1 import groups, teachers, classrooms, subjects, time_slots, notifications, imports, analytics
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -24,6 +31,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Route a client's reads to the primary right after it writes
+if replica_engines:
+    app.add_middleware(ReadYourWritesMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["Authentication"])
 app.include_router(schedule.router, prefix=f"{settings.API_V1_STR}/schedule", tags=["Schedule"])
@@ -34,6 +45,8 @@ app.include_router(classrooms.router, prefix=f"{settings.API_V1_STR}/classrooms"
 app.include_router(subjects.router, prefix=f"{settings.API_V1_STR}/subjects", tags=["Subjects"])
 app.include_router(time_slots.router, prefix=f"{settings.API_V1_STR}/time-slots", tags=["Time Slots"])
 app.include_router(notifications.router, prefix=f"{settings.API_V1_STR}/notifications", tags=["Notifications"])
+app.include_router(imports.router, prefix=f"{settings.API_V1_STR}/imports", tags=["Imports"])
+app.include_router(analytics.router, prefix=f"{settings.API_V1_STR}/analytics", tags=["Analytics"])
 
 
 @app.get("/")
@@ -51,3 +64,62 @@ def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
 
+
+# Detailed metrics describe the deployment, so only super admins see them
+internal_metrics = [Depends(require_role("super_admin"))]
+
+
+@app.get("/health/db", dependencies=internal_metrics)
+def database_pool_health():
+    """Connection pool usage and checkout wait times of every engine."""
+    return pool_metrics()
+
+
+@app.get("/health/password-hashing", dependencies=internal_metrics)
+def password_hashing_health():
+    """bcrypt worker pool usage and queue depth."""
+    return password_pool.metrics()
+
+
+@app.get("/health/email", dependencies=internal_metrics)
+def email_transport_health():
+    """SMTP connection pool usage and delivery counters."""
+    return smtp_pool.metrics()
+
+
+@app.get("/health/streams", dependencies=internal_metrics)
+def event_stream_health():
+    """Connected notification streams of this worker."""
+    return event_broker.metrics()
+
+
+@app.on_event("startup")
+async def start_event_broadcast():
+    await broadcast.start()
+
+
+@app.on_event("shutdown")
+async def stop_event_broadcast():
+    await broadcast.stop()
+
+
+@app.on_event("startup")
+def start_job_worker():
+    if settings.JOB_WORKER_MODE == "inprocess":
+        start_local_worker()
+
+
+@app.on_event("shutdown")
+def shutdown_password_pool():
+    password_pool.shutdown()
+
+
+@app.on_event("shutdown")
+def shutdown_job_worker():
+    stop_local_worker()
+
+
+@app.on_event("shutdown")
+def shutdown_smtp_pool():
+    smtp_pool.close()
+
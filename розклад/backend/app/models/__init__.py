@@ -7,5 +7,9 @@ from app.models.classroom import Classroom
 from app.models.time_slot import TimeSlot
 from app.models.schedule import ScheduleEntry
 from app.models.change_request import ChangeRequest
-from app.models.notification import Notification
-
+from app.models.notification import Notification, ArchivedNotification
+from app.models.timetable_job import TimetableJob
+from app.models.schedule_version import ScheduleVersion
+from app.models.revoked_token import RevokedToken
+from app.models.job import Job
+from app.models.notification_counter import NotificationCounter
@@ -0,0 +1,40 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, Index, Enum as SQLEnum
+from datetime import datetime
+import enum
+
+from app.database import Base
+
+
+class JobStatus(str, enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class Job(Base):
+    """A background job, written in the same transaction as the change that needs it."""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Workers poll for due pending jobs
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(64), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(SQLEnum(JobStatus), default=JobStatus.PENDING, nullable=False)
+    
+    # Retries
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=5, nullable=False)
+    last_error = Column(Text, nullable=True)
+    
+    # Set while a worker runs the job
+    locked_by = Column(String(64), nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    
+    # Timestamps
+    run_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
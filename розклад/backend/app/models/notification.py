@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -15,8 +15,19 @@ class NotificationType(str, enum.Enum):
     CHANGE_REQUEST_UPDATE = "change_request_update"
 
 
+class NotificationDelivery(str, enum.Enum):
+    IMMEDIATE = "immediate"  # one notification per event
+    DIGEST = "digest"  # bursts are merged into one notification
+
+
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # Inboxes: a user's (unread) notifications, newest first
+        Index("ix_notifications_user_read_created", "user_id", "is_read", "created_at"),
+        # Retention sweeps by age
+        Index("ix_notifications_created_at", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     
@@ -27,6 +38,8 @@ class Notification(Base):
     
     # Status
     is_read = Column(Boolean, default=False)
+    # Number of events merged into this notification
+    digest_count = Column(Integer, default=1, nullable=False)
     
     # Foreign keys
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -40,3 +53,24 @@ class Notification(Base):
     # Relationships
     user = relationship("User", back_populates="notifications")
 
+
+class ArchivedNotification(Base):
+    """A notification moved out of `notifications` by the retention job."""
+    __tablename__ = "notifications_archive"
+
+    id = Column(Integer, primary_key=True)
+    title = Column(String, nullable=False)
+    message = Column(Text, nullable=False)
+    type = Column(SQLEnum(NotificationType), nullable=False)
+    is_read = Column(Boolean, default=False)
+    digest_count = Column(Integer, default=1, nullable=False)
+    
+    # Plain ids: archived rows must not block deleting users or entries
+    user_id = Column(Integer, nullable=False, index=True)
+    schedule_entry_id = Column(Integer, nullable=True)
+    change_request_id = Column(Integer, nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime)
+    read_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
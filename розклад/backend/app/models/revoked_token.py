@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, DateTime
+
+from app.database import Base
+
+
+class RevokedToken(Base):
+    """A used or revoked refresh token id ("jti"), or a whole token family ("fam:<id>").
+
+    Rows are only needed until the token would have expired anyway.
+    """
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(64), primary_key=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Date, Enum as SQLEnum, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Date, Enum as SQLEnum, Text, Index, func, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -23,8 +23,45 @@ class ScheduleStatus(str, enum.Enum):
     SUBSTITUTED = "substituted"
 
 
+# Rows that occupy their slot: cancelled entries free it. Recurring and dated
+# entries are kept unique separately; dated and recurring entries of the
+# same weekday are checked against each other by app.services.conflicts.
+WEEKLY_BOOKING = text("specific_date IS NULL AND status <> 'CANCELLED'")
+DATED_BOOKING = text("specific_date IS NOT NULL AND status <> 'CANCELLED'")
+DATED = text("specific_date IS NOT NULL")
+
+
+def _unique_booking(name, *columns, where):
+    return Index(name, *columns, unique=True, postgresql_where=where, sqlite_where=where)
+
+
 class ScheduleEntry(Base):
     __tablename__ = "schedule_entries"
+    __table_args__ = (
+        # Access paths of the schedule filters
+        Index("ix_schedule_entries_group_slot", "group_id", "day_of_week", "time_slot_id"),
+        Index("ix_schedule_entries_teacher_slot", "teacher_id", "day_of_week", "time_slot_id"),
+        Index("ix_schedule_entries_classroom_slot", "classroom_id", "day_of_week", "time_slot_id"),
+        Index("ix_schedule_entries_substitute_teacher_id", "substitute_teacher_id"),
+        Index("ix_schedule_entries_specific_date", "specific_date"),
+        # Dated entries of a date range (calendar expansion)
+        Index("ix_schedule_entries_group_date", "group_id", "specific_date", postgresql_where=DATED),
+        Index("ix_schedule_entries_teacher_date", "teacher_id", "specific_date", postgresql_where=DATED),
+        Index("ix_schedule_entries_classroom_date", "classroom_id", "specific_date", postgresql_where=DATED),
+        # Conflict freedom; the effective teacher is the substitute if there is one
+        _unique_booking(
+            "uq_schedule_weekly_teacher", "day_of_week", "time_slot_id",
+            func.coalesce(text("substitute_teacher_id"), text("teacher_id")), where=WEEKLY_BOOKING,
+        ),
+        _unique_booking("uq_schedule_weekly_group", "day_of_week", "time_slot_id", "group_id", where=WEEKLY_BOOKING),
+        _unique_booking("uq_schedule_weekly_classroom", "day_of_week", "time_slot_id", "classroom_id", where=WEEKLY_BOOKING),
+        _unique_booking(
+            "uq_schedule_dated_teacher", "specific_date", "time_slot_id",
+            func.coalesce(text("substitute_teacher_id"), text("teacher_id")), where=DATED_BOOKING,
+        ),
+        _unique_booking("uq_schedule_dated_group", "specific_date", "time_slot_id", "group_id", where=DATED_BOOKING),
+        _unique_booking("uq_schedule_dated_classroom", "specific_date", "time_slot_id", "classroom_id", where=DATED_BOOKING),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     
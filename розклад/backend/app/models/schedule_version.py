@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime
+
+from app.database import Base
+
+
+class ScheduleVersion(Base):
+    """Change counter of one schedule scope (a group, teacher, classroom or "all")."""
+    __tablename__ = "schedule_versions"
+
+    scope = Column(String(16), primary_key=True)
+    scope_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    
+    # Timestamps
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
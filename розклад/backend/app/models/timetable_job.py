@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, JSON, Text, Enum as SQLEnum
+from datetime import datetime
+import enum
+
+from app.database import Base
+
+
+class TimetableJobStatus(str, enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    APPLIED = "applied"
+
+
+class TimetableJob(Base):
+    __tablename__ = "timetable_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(SQLEnum(TimetableJobStatus), default=TimetableJobStatus.PENDING, nullable=False)
+    progress = Column(Float, default=0.0)
+    
+    # Solver input (curriculum, days, time budget) and output (entries, unplaced lessons, cost)
+    params = Column(JSON, nullable=False)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    
+    # Foreign keys
+    institution_id = Column(Integer, ForeignKey("institutions.id"), nullable=False)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
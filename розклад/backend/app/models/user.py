@@ -1,9 +1,10 @@
-from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, DateTime, Enum as SQLEnum
+from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, DateTime, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
 
 from app.database import Base
+from app.models.notification import NotificationDelivery
 
 
 class UserRole(str, enum.Enum):
@@ -16,6 +17,10 @@ class UserRole(str, enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Notification fan-out selects recipients by role and group
+        Index("ix_users_role_group_id", "role", "group_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
@@ -26,6 +31,11 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     is_verified = Column(Boolean, default=False)
     phone = Column(String, nullable=True)
+    notification_delivery = Column(
+        SQLEnum(NotificationDelivery), default=NotificationDelivery.IMMEDIATE, nullable=False
+    )
+    # Embedded in calendar feed tokens; bumping it revokes the user's feed URLs
+    feed_token_version = Column(Integer, default=0, nullable=False)
     
     # Foreign keys
     institution_id = Column(Integer, ForeignKey("institutions.id"), nullable=True)
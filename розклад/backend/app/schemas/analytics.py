@@ -0,0 +1,64 @@
+from pydantic import BaseModel
+from typing import Dict, List
+from datetime import date
+
+
+class TeacherLoad(BaseModel):
+    teacher_id: int
+    name: str
+    lessons_per_week: int
+    hours_per_week: float
+    days_per_week: int
+    max_lessons_per_day: int
+    gaps: int
+
+
+class GroupLoad(BaseModel):
+    group_id: int
+    name: str
+    lessons_per_week: int
+    lessons_per_day: Dict[str, int]
+    max_lessons_per_day: int
+    min_lessons_per_day: int
+    gaps: int
+
+
+class WorkloadReport(BaseModel):
+    teachers: List[TeacherLoad]
+    groups: List[GroupLoad]
+    average_teacher_lessons: float
+    teacher_lessons_stddev: float
+
+
+class ClassroomUtilization(BaseModel):
+    classroom_id: int
+    name: str
+    occupied_slots: int
+    available_slots: int
+    utilization: float
+
+
+class UtilizationReport(BaseModel):
+    classrooms: List[ClassroomUtilization]
+    average_utilization: float
+
+
+class TeacherChanges(BaseModel):
+    teacher_id: int
+    name: str
+    scheduled_lessons: int
+    substitutions: int
+    cancellations: int
+    substitution_rate: float
+    cancellation_rate: float
+
+
+class ChangeReport(BaseModel):
+    from_date: date
+    to_date: date
+    scheduled_lessons: int
+    substitutions: int
+    cancellations: int
+    substitution_rate: float
+    cancellation_rate: float
+    teachers: List[TeacherChanges]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime, date
 from app.models.change_request import ChangeType, ChangeRequestStatus
 
@@ -28,6 +28,23 @@ class ChangeRequestUpdate(BaseModel):
     new_teacher_id: Optional[int] = None
 
 
+class ChangeRequestDecision(BaseModel):
+    id: int
+    status: ChangeRequestStatus
+    admin_comment: Optional[str] = None
+
+
+class ChangeRequestBatchItem(BaseModel):
+    id: int
+    status: str  # the applied status, "error" or "rolled_back"
+    detail: Optional[str] = None
+
+
+class ChangeRequestBatchResult(BaseModel):
+    processed: int
+    results: List[ChangeRequestBatchItem]
+
+
 class ChangeRequestInDB(ChangeRequestBase):
     id: int
     status: ChangeRequestStatus
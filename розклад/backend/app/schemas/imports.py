@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import List
+
+
+class ImportRowError(BaseModel):
+    row: int
+    detail: str
+
+
+class ImportResult(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    errors: List[ImportRowError]
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime, date
+import enum
 from app.models.schedule import DayOfWeek, ScheduleStatus
 
 
@@ -16,7 +17,8 @@ class ScheduleEntryBase(BaseModel):
 
 
 class ScheduleEntryCreate(ScheduleEntryBase):
-    pass
+    # A dated entry may record a single week's cancellation or substitution
+    status: ScheduleStatus = ScheduleStatus.SCHEDULED
 
 
 class ScheduleEntryUpdate(BaseModel):
@@ -51,3 +53,29 @@ class ScheduleEntryWithDetails(ScheduleEntryInDB):
     end_time: str
     substitute_teacher_name: Optional[str] = None
 
+
+class ScheduleOccurrence(ScheduleEntryWithDetails):
+    """A class on a concrete date of the calendar."""
+    date: date
+    recurring: bool
+
+
+class CalendarFeedKind(str, enum.Enum):
+    GROUP = "group"
+    TEACHER = "teacher"
+    CLASSROOM = "classroom"
+
+
+class CalendarFeedLink(BaseModel):
+    url: str
+
+
+class ScheduleBulkError(BaseModel):
+    index: int
+    detail: str
+
+
+class ScheduleBulkResult(BaseModel):
+    created: int
+    created_ids: List[int]
+    errors: List[ScheduleBulkError]
@@ -0,0 +1,56 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+from app.models.classroom import ClassroomType
+from app.models.schedule import DayOfWeek
+from app.models.timetable_job import TimetableJobStatus
+
+
+class CurriculumItem(BaseModel):
+    group_id: int
+    subject_id: int
+    teacher_id: int
+    lessons_per_week: int = Field(ge=1, le=40)
+    classroom_type: Optional[ClassroomType] = None
+    required_equipment: List[str] = []
+
+
+class TimetableGenerateRequest(BaseModel):
+    institution_id: Optional[int] = None
+    curriculum: List[CurriculumItem]
+    days: List[DayOfWeek] = [
+        DayOfWeek.MONDAY, DayOfWeek.TUESDAY, DayOfWeek.WEDNESDAY, DayOfWeek.THURSDAY, DayOfWeek.FRIDAY
+    ]
+    time_budget_seconds: int = Field(60, ge=1)
+    replace_existing: bool = False
+
+
+class GeneratedEntry(BaseModel):
+    day_of_week: DayOfWeek
+    time_slot_id: int
+    group_id: int
+    subject_id: int
+    teacher_id: int
+    classroom_id: int
+
+
+class UnplacedLesson(BaseModel):
+    group_id: int
+    subject_id: int
+    teacher_id: int
+    reason: str
+
+
+class TimetableJobInDB(BaseModel):
+    id: int
+    status: TimetableJobStatus
+    progress: float
+    institution_id: int
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    cost: Optional[float] = None
+    attempts: Optional[int] = None
+    entries: Optional[List[GeneratedEntry]] = None
+    unplaced: Optional[List[UnplacedLesson]] = None
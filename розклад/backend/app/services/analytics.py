@@ -0,0 +1,281 @@
+"""Workload and utilization analytics of an institution's weekly timetable.
+
+The recurring, non-cancelled entries are loaded with one query into dense
+occupancy tensors of shape (day, period, resource) - one per teacher,
+group and classroom axis - and every report is a handful of vectorized
+reductions over them:
+
+* lessons and hours per week, lessons per day and active days,
+* gaps ("windows"): free periods between a resource's first and last
+  lesson of a day,
+* classroom utilization: occupied share of the periods of the working days
+  (Monday to Friday plus any weekend day with classes),
+* substitution and cancellation rates of approved change requests per 100
+  scheduled lessons over a date range.
+
+Teachers are counted by who actually teaches, i.e. the substitute if there
+is one; change request rates are attributed to the original teacher.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import List
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.schedule import ScheduleEntry, DayOfWeek, ScheduleStatus
+from app.models.change_request import ChangeRequest, ChangeRequestStatus, ChangeType
+from app.models.group import Group
+from app.models.teacher import Teacher
+from app.models.classroom import Classroom
+from app.models.time_slot import TimeSlot
+
+WEEKDAYS = list(DayOfWeek)
+DAYS = len(WEEKDAYS)
+# Monday to Friday are working days even without classes
+BASE_WORKING_DAYS = 5
+
+
+@dataclass
+class Axis:
+    """Resources along one tensor axis: sorted ids and their names."""
+    ids: np.ndarray
+    names: List[str]
+
+    def positions(self, values: np.ndarray) -> np.ndarray:
+        """Index of each id in `values` (ids must be present)."""
+        return np.searchsorted(self.ids, values)
+
+
+@dataclass
+class Occupancy:
+    """Lessons per (day, period, resource) of an institution's week."""
+    slot_minutes: np.ndarray
+    teachers: Axis
+    groups: Axis
+    classrooms: Axis
+    teacher_lessons: np.ndarray
+    group_lessons: np.ndarray
+    classroom_lessons: np.ndarray
+    # Lessons per (day, teacher) of the original (not substitute) teacher
+    planned_teacher_days: np.ndarray
+
+    @property
+    def working_days(self) -> np.ndarray:
+        busy_days = self.group_lessons.sum(axis=(1, 2)) > 0
+        return (np.arange(DAYS) < BASE_WORKING_DAYS) | busy_days
+
+
+def _axis(db: Session, model, name_column, institution_id: int) -> Axis:
+    rows = db.execute(
+        select(model.id, name_column).where(model.institution_id == institution_id).order_by(model.id)
+    ).all()
+    return Axis(ids=np.array([row[0] for row in rows], dtype=np.int64), names=[row[1] for row in rows])
+
+
+def load_occupancy(db: Session, institution_id: int) -> Occupancy:
+    slots = db.execute(
+        select(TimeSlot.id, TimeSlot.start_time, TimeSlot.end_time)
+        .where(TimeSlot.institution_id == institution_id)
+        .order_by(TimeSlot.period_number, TimeSlot.id)
+    ).all()
+    # Periods in chronological order, so gaps are counted between neighbours
+    slot_ids = np.array([slot.id for slot in slots], dtype=np.int64)
+    slot_minutes = np.array([
+        (datetime.combine(date.min, slot.end_time) - datetime.combine(date.min, slot.start_time)).seconds / 60
+        for slot in slots
+    ])
+    teachers = _axis(db, Teacher, Teacher.full_name, institution_id)
+    groups = _axis(db, Group, Group.name, institution_id)
+    classrooms = _axis(db, Classroom, Classroom.name, institution_id)
+
+    rows = db.execute(
+        select(
+            ScheduleEntry.day_of_week,
+            ScheduleEntry.time_slot_id,
+            func.coalesce(ScheduleEntry.substitute_teacher_id, ScheduleEntry.teacher_id),
+            ScheduleEntry.teacher_id,
+            ScheduleEntry.group_id,
+            ScheduleEntry.classroom_id,
+        )
+        .join(Group, Group.id == ScheduleEntry.group_id)
+        .where(
+            Group.institution_id == institution_id,
+            ScheduleEntry.specific_date.is_(None),
+            ScheduleEntry.status != ScheduleStatus.CANCELLED,
+        )
+    ).all()
+    frame = pd.DataFrame(rows, columns=["day", "slot", "teacher", "planned_teacher", "group", "classroom"])
+    frame["day"] = frame["day"].map({day: index for index, day in enumerate(WEEKDAYS)})
+    # Entries referencing another institution's slots or resources are skipped
+    frame = frame[
+        frame["slot"].isin(slot_ids) & frame["teacher"].isin(teachers.ids)
+        & frame["planned_teacher"].isin(teachers.ids) & frame["classroom"].isin(classrooms.ids)
+    ]
+
+    day = frame["day"].to_numpy(dtype=np.int64)
+    by_id = np.argsort(slot_ids)
+    slot = by_id[np.searchsorted(slot_ids, frame["slot"].to_numpy(dtype=np.int64), sorter=by_id)]
+
+    def tensor(axis: Axis, column: str) -> np.ndarray:
+        lessons = np.zeros((DAYS, len(slot_ids), len(axis.ids)), dtype=np.int32)
+        np.add.at(lessons, (day, slot, axis.positions(frame[column].to_numpy(dtype=np.int64))), 1)
+        return lessons
+
+    planned = np.zeros((DAYS, len(teachers.ids)), dtype=np.int32)
+    np.add.at(planned, (day, teachers.positions(frame["planned_teacher"].to_numpy(dtype=np.int64))), 1)
+    return Occupancy(
+        slot_minutes=slot_minutes,
+        teachers=teachers,
+        groups=groups,
+        classrooms=classrooms,
+        teacher_lessons=tensor(teachers, "teacher"),
+        group_lessons=tensor(groups, "group"),
+        classroom_lessons=tensor(classrooms, "classroom"),
+        planned_teacher_days=planned,
+    )
+
+
+def gaps(lessons: np.ndarray) -> np.ndarray:
+    """Free periods between the first and last lesson of each (day, resource)."""
+    busy = lessons > 0
+    if busy.shape[1] == 0:
+        return np.zeros((busy.shape[0], busy.shape[2]), dtype=np.int64)
+    periods = busy.shape[1]
+    first = busy.argmax(axis=1)
+    last = periods - 1 - busy[:, ::-1, :].argmax(axis=1)
+    span = last - first + 1
+    return np.where(busy.any(axis=1), span - busy.sum(axis=1), 0)
+
+
+def workload_report(occupancy: Occupancy) -> dict:
+    teacher_days = occupancy.teacher_lessons.sum(axis=1)
+    teacher_week = teacher_days.sum(axis=0)
+    teacher_minutes = np.einsum("dsr,s->r", occupancy.teacher_lessons, occupancy.slot_minutes)
+    teacher_gaps = gaps(occupancy.teacher_lessons).sum(axis=0)
+
+    working_days = occupancy.working_days
+    group_days = occupancy.group_lessons.sum(axis=1)
+    group_gaps = gaps(occupancy.group_lessons).sum(axis=0)
+    working_group_days = group_days[working_days]
+
+    teachers = [
+        {
+            "teacher_id": int(teacher_id),
+            "name": name,
+            "lessons_per_week": int(teacher_week[index]),
+            "hours_per_week": round(float(teacher_minutes[index]) / 60, 2),
+            "days_per_week": int((teacher_days[:, index] > 0).sum()),
+            "max_lessons_per_day": int(teacher_days[:, index].max()),
+            "gaps": int(teacher_gaps[index]),
+        }
+        for index, (teacher_id, name) in enumerate(zip(occupancy.teachers.ids, occupancy.teachers.names))
+    ]
+    groups = [
+        {
+            "group_id": int(group_id),
+            "name": name,
+            "lessons_per_week": int(group_days[:, index].sum()),
+            "lessons_per_day": {
+                WEEKDAYS[day].value: int(group_days[day, index]) for day in np.flatnonzero(working_days)
+            },
+            "max_lessons_per_day": int(working_group_days[:, index].max()),
+            "min_lessons_per_day": int(working_group_days[:, index].min()),
+            "gaps": int(group_gaps[index]),
+        }
+        for index, (group_id, name) in enumerate(zip(occupancy.groups.ids, occupancy.groups.names))
+    ]
+    return {
+        "teachers": teachers,
+        "groups": groups,
+        "average_teacher_lessons": round(float(teacher_week.mean()), 2) if teacher_week.size else 0.0,
+        "teacher_lessons_stddev": round(float(teacher_week.std()), 2) if teacher_week.size else 0.0,
+    }
+
+
+def utilization_report(occupancy: Occupancy) -> dict:
+    available = int(occupancy.working_days.sum()) * len(occupancy.slot_minutes)
+    occupied = (occupancy.classroom_lessons > 0).sum(axis=(0, 1))
+    utilization = occupied / available * 100 if available else np.zeros(len(occupied))
+    classrooms = [
+        {
+            "classroom_id": int(classroom_id),
+            "name": name,
+            "occupied_slots": int(occupied[index]),
+            "available_slots": available,
+            "utilization": round(float(utilization[index]), 1),
+        }
+        for index, (classroom_id, name) in enumerate(zip(occupancy.classrooms.ids, occupancy.classrooms.names))
+    ]
+    return {
+        "classrooms": classrooms,
+        "average_utilization": round(float(utilization.mean()), 1) if utilization.size else 0.0,
+    }
+
+
+def weekday_counts(start: date, end: date) -> np.ndarray:
+    """How often each weekday occurs from `start` to `end` (inclusive)."""
+    days = (end - start).days + 1
+    weeks, rest = divmod(days, 7)
+    counts = np.full(DAYS, weeks)
+    counts[(start.weekday() + np.arange(rest)) % DAYS] += 1
+    return counts
+
+
+def change_report(db: Session, occupancy: Occupancy, institution_id: int, start: date, end: date) -> dict:
+    rows = db.execute(
+        select(ChangeRequest.change_type, ScheduleEntry.teacher_id)
+        .join(ScheduleEntry, ScheduleEntry.id == ChangeRequest.schedule_entry_id)
+        .join(Group, Group.id == ScheduleEntry.group_id)
+        .where(
+            Group.institution_id == institution_id,
+            ChangeRequest.status == ChangeRequestStatus.APPROVED,
+            ChangeRequest.change_type.in_([ChangeType.SUBSTITUTION, ChangeType.CANCELLATION]),
+            ChangeRequest.requested_date.between(start, end),
+        )
+    ).all()
+    changes = (
+        pd.DataFrame(rows, columns=["change_type", "teacher_id"])
+        .groupby(["teacher_id", "change_type"]).size()
+        .unstack(fill_value=0)
+        .reindex(index=occupancy.teachers.ids, columns=[ChangeType.SUBSTITUTION, ChangeType.CANCELLATION], fill_value=0)
+    )
+    substitutions = changes[ChangeType.SUBSTITUTION].to_numpy()
+    cancellations = changes[ChangeType.CANCELLATION].to_numpy()
+    scheduled = weekday_counts(start, end) @ occupancy.planned_teacher_days
+
+    def rate(count, total):
+        return np.divide(count * 100, total, out=np.zeros(np.shape(count)), where=np.asarray(total) > 0)
+
+    substitution_rate = rate(substitutions, scheduled)
+    cancellation_rate = rate(cancellations, scheduled)
+    teachers = [
+        {
+            "teacher_id": int(teacher_id),
+            "name": name,
+            "scheduled_lessons": int(scheduled[index]),
+            "substitutions": int(substitutions[index]),
+            "cancellations": int(cancellations[index]),
+            "substitution_rate": round(float(substitution_rate[index]), 2),
+            "cancellation_rate": round(float(cancellation_rate[index]), 2),
+        }
+        for index, (teacher_id, name) in enumerate(zip(occupancy.teachers.ids, occupancy.teachers.names))
+    ]
+    total = int(scheduled.sum())
+    return {
+        "from_date": start,
+        "to_date": end,
+        "scheduled_lessons": total,
+        "substitutions": int(substitutions.sum()),
+        "cancellations": int(cancellations.sum()),
+        "substitution_rate": round(float(rate(substitutions.sum(), total)), 2),
+        "cancellation_rate": round(float(rate(cancellations.sum(), total)), 2),
+        "teachers": teachers,
+    }
+
+
+def default_change_range(days: int) -> tuple:
+    end = date.today()
+    return end - timedelta(days=days - 1), end
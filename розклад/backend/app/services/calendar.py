@@ -0,0 +1,111 @@
+"""Date-expanded schedule: what actually happens on each day of a range.
+
+Recurring entries (no specific_date) repeat on their weekday every week.
+Dated entries are one-off classes and overrides: a dated entry of a group
+and time slot replaces the recurring class of that group and slot on its
+date, so a cancelled dated entry cancels a single week and a substituted
+or moved one changes it.
+
+Occurrences are produced lazily, day by day. Only the weekly template of
+the scope is held in memory; dated entries are streamed from the database
+in date order (served by the (resource, specific_date) indexes), so
+expanding a whole semester does not materialize it.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import AsyncIterator, Dict, Iterable, List
+
+from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.schedule import ScheduleEntry, DayOfWeek
+from app.models.time_slot import TimeSlot
+from app.services.schedule_details import schedule_details_query, row_to_details
+from app.services.schedule_scope import ScheduleScope
+
+WEEKDAYS = list(DayOfWeek)
+
+# Dated entries fetched per round trip
+FETCH_SIZE = 500
+
+
+async def weekly_template(db: AsyncSession, scope: ScheduleScope) -> Dict[DayOfWeek, List[dict]]:
+    """The recurring entries of a scope by weekday, in time order."""
+    query = (
+        scope.apply(schedule_details_query())
+        .where(ScheduleEntry.specific_date.is_(None))
+        .order_by(TimeSlot.start_time, ScheduleEntry.id)
+    )
+    template = defaultdict(list)
+    for row in await db.execute(query):
+        details = row_to_details(row)
+        template[DayOfWeek(row.day_of_week)].append(details)
+    return template
+
+
+def dated_entries_query(scope: ScheduleScope, groups: Iterable[int]):
+    """Dated entries of a scope and those that may override its recurring
+    entries (any dated entry of `groups`), in date and time order.
+
+    Rows carry an `in_scope` flag telling the two apart.
+    """
+    in_scope = scope.condition()
+    return (
+        schedule_details_query()
+        .add_columns(in_scope.label("in_scope"))
+        .where(
+            ScheduleEntry.specific_date.is_not(None),
+            or_(in_scope, ScheduleEntry.group_id.in_(sorted(groups))),
+        )
+        .order_by(ScheduleEntry.specific_date, TimeSlot.start_time, ScheduleEntry.id)
+        .execution_options(yield_per=FETCH_SIZE)
+    )
+
+
+async def expand_calendar(
+    db: AsyncSession,
+    scope: ScheduleScope,
+    start: date,
+    end: date,
+    template: Dict[DayOfWeek, List[dict]],
+) -> AsyncIterator[dict]:
+    """Yield the occurrences of every day from `start` to `end` (inclusive).
+
+    Each occurrence is a ScheduleEntryWithDetails dict plus its `date` and
+    whether it comes from a recurring entry. Dated entries outside the
+    scope are read too when they belong to a group of the template, since
+    they may override its recurring classes.
+    """
+    groups = {details["group_id"] for day in template.values() for details in day}
+    query = dated_entries_query(scope, groups).where(ScheduleEntry.specific_date.between(start, end))
+    result = await db.stream(query)
+    try:
+        dated = result.__aiter__()
+        pending = await anext(dated, None)
+
+        day = start
+        while day <= end:
+            overrides = []
+            while pending is not None and pending.specific_date == day:
+                overrides.append(pending)
+                pending = await anext(dated, None)
+
+            replaced = {(row.group_id, row.time_slot_id) for row in overrides}
+            occurrences = [
+                {**details, "date": day, "recurring": True}
+                for details in template.get(WEEKDAYS[day.weekday()], ())
+                if (details["group_id"], details["time_slot_id"]) not in replaced
+            ]
+            for row in overrides:
+                if row.in_scope:
+                    details = row_to_details(row)
+                    del details["in_scope"]
+                    occurrences.append({**details, "date": day, "recurring": False})
+            occurrences.sort(key=lambda item: (item["start_time"], item["id"]))
+
+            for occurrence in occurrences:
+                yield occurrence
+            day += timedelta(days=1)
+    finally:
+        # The client may disconnect mid-stream
+        await result.close()
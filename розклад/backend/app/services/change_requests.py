@@ -0,0 +1,193 @@
+"""Applying change requests to the schedule, one at a time or in batches."""
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.change_request import ChangeRequest, ChangeRequestStatus, ChangeType
+from app.models.schedule import ScheduleEntry, DayOfWeek, ScheduleStatus
+from app.schemas.change_request import ChangeRequestDecision
+from app.services.conflicts import (
+    PendingBookings, check_batch_item, conflict_detail, occupancy_index, unique_violation_detail,
+)
+from app.services.jobs import enqueue
+
+# Entry attributes a change request can touch (plus what conflict checks read)
+ENTRY_FIELDS = [
+    "id", "status", "day_of_week", "specific_date", "time_slot_id", "teacher_id",
+    "substitute_teacher_id", "group_id", "classroom_id", "original_classroom_id",
+    "change_request_id", "notes",
+]
+
+
+def apply_change(entry, change_request: ChangeRequest):
+    """Set the schedule fields an approved change request asks for.
+
+    `entry` is a ScheduleEntry or a detached copy of its fields (see
+    `entry_values`), so a change can be checked before it is applied.
+    """
+    if change_request.change_type == ChangeType.CANCELLATION:
+        entry.status = ScheduleStatus.CANCELLED
+    elif change_request.change_type == ChangeType.SUBSTITUTION:
+        entry.status = ScheduleStatus.SUBSTITUTED
+        entry.substitute_teacher_id = change_request.new_teacher_id
+    elif change_request.change_type == ChangeType.RESCHEDULE:
+        entry.status = ScheduleStatus.RESCHEDULED
+        if change_request.new_time_slot_id:
+            entry.time_slot_id = change_request.new_time_slot_id
+        if change_request.new_date:
+            entry.specific_date = change_request.new_date
+            entry.day_of_week = list(DayOfWeek)[change_request.new_date.weekday()]
+    elif change_request.change_type == ChangeType.CLASSROOM_CHANGE:
+        entry.original_classroom_id = entry.classroom_id
+        entry.classroom_id = change_request.new_classroom_id
+    
+    entry.change_request_id = change_request.id
+    entry.notes = change_request.reason
+
+
+def entry_values(entry: ScheduleEntry) -> SimpleNamespace:
+    return SimpleNamespace(**{field: getattr(entry, field) for field in ENTRY_FIELDS})
+
+
+def process_batch(
+    db: Session, decisions: Sequence[ChangeRequestDecision], admin_id: int, atomic: bool = False
+) -> dict:
+    """Approve or reject many change requests in the caller's transaction.
+
+    Requests and their schedule entries are loaded with one query each.
+    Approved changes are checked against the occupancy index and against
+    the effects of the earlier items of the batch: slots an item frees
+    (cancellations, moves) become available to later items. Each applied
+    change is flushed before the next item, so the database sees the
+    changes in request order: a room is released before it is reassigned.
+    Items that fail are reported and left untouched: without `atomic`,
+    each change is flushed in a savepoint, so one the database rejects
+    (e.g. a slot another worker booked since the index was loaded) fails
+    only its own item. With `atomic` nothing is applied if any item fails
+    and the other items are reported as rolled back.
+    Notifications are enqueued as a single job.
+    The caller commits (inside `booking_guard`).
+    """
+    ids = [decision.id for decision in decisions]
+    requests: Dict[int, ChangeRequest] = {
+        request.id: request
+        for request in db.query(ChangeRequest).filter(ChangeRequest.id.in_(ids))
+    }
+    entries: Dict[int, ScheduleEntry] = {
+        entry.id: entry
+        for entry in db.query(ScheduleEntry).filter(
+            ScheduleEntry.id.in_({request.schedule_entry_id for request in requests.values()})
+        )
+    }
+    
+    connection = db.connection()
+    for entry in entries.values():
+        booking = occupancy_index.booking_for(connection, entry)
+        if booking:
+            occupancy_index.ensure_loaded(connection, booking.institution_id)
+    
+    pending = PendingBookings()
+    # Current booking of every entry the batch has changed so far
+    bookings: Dict[int, Optional[object]] = {}
+    results: List[dict] = []
+    seen = set()
+    now = datetime.utcnow()
+    
+    for decision in decisions:
+        request = requests.get(decision.id)
+        error = None
+        if decision.id in seen:
+            error = "Duplicate change request in batch"
+        elif request is None:
+            error = "Change request not found"
+        elif request.status != ChangeRequestStatus.PENDING:
+            error = f"Change request is already {request.status.value}"
+        elif decision.status == ChangeRequestStatus.PENDING:
+            error = "Decision must be approved or rejected"
+        seen.add(decision.id)
+        if error:
+            results.append({"id": decision.id, "status": "error", "detail": error})
+            continue
+        
+        if decision.status == ChangeRequestStatus.APPROVED:
+            entry = entries.get(request.schedule_entry_id)
+            if entry is not None:
+                previous = _current_booking(entry.id, bookings)
+                error = _check_change(db, entry, request, pending, bookings)
+                if error:
+                    results.append({"id": decision.id, "status": "error", "detail": error})
+                    continue
+                if atomic:
+                    apply_change(entry, request)
+                    db.flush()
+                else:
+                    error = _flush_change(db, entry, request)
+                if error:
+                    # The entry is back to its stored state; so is its booking
+                    booking = bookings[entry.id]
+                    if booking:
+                        pending.release(booking)
+                    if previous:
+                        pending.add(previous)
+                    bookings[entry.id] = previous
+                    results.append({"id": decision.id, "status": "error", "detail": error})
+                    continue
+        
+        request.status = decision.status
+        if decision.admin_comment is not None:
+            request.admin_comment = decision.admin_comment
+        request.processed_by = admin_id
+        request.processed_at = now
+        results.append({"id": decision.id, "status": decision.status.value, "detail": None})
+    
+    processed = [result["id"] for result in results if result["status"] != "error"]
+    failed = len(results) - len(processed)
+    if atomic and failed:
+        db.rollback()
+        processed = []
+        for result in results:
+            if result["status"] != "error":
+                result.update(status="rolled_back", detail="Not applied: another item of the batch failed")
+    elif processed:
+        enqueue(db, "notify_change_requests_processed", change_request_ids=processed)
+    return {"processed": len(processed), "results": results}
+
+
+def _flush_change(db: Session, entry: ScheduleEntry, request: ChangeRequest) -> Optional[str]:
+    """Apply and flush one change in a savepoint; return why the database rejected it."""
+    try:
+        with db.begin_nested():
+            apply_change(entry, request)
+            db.flush()
+    except IntegrityError as exc:
+        # The savepoint rollback expired the entry, so it reloads unchanged
+        return unique_violation_detail(exc) or "Change rejected by the database"
+    return None
+
+
+def _current_booking(entry_id: int, bookings: dict):
+    """The entry's booking as changed by the batch so far."""
+    if entry_id in bookings:
+        return bookings[entry_id]
+    return occupancy_index.booking_of(entry_id)
+
+
+def _check_change(db: Session, entry, request, pending: PendingBookings, bookings: dict) -> Optional[str]:
+    """Validate an approval against the index and the batch; record its booking if valid."""
+    previous = _current_booking(entry.id, bookings)
+    if previous:
+        pending.release(previous)
+    
+    values = entry_values(entry)
+    apply_change(values, request)
+    booking, busy = check_batch_item(db, values, pending)
+    if busy:
+        # Keep the entry's current booking in place
+        if previous:
+            pending.add(previous)
+        return conflict_detail(busy)
+    bookings[entry.id] = booking
+    return None
@@ -0,0 +1,421 @@
+"""In-memory occupancy index for schedule conflict detection.
+
+The index maps (institution, day/date, time slot) to the teachers, groups
+and classrooms booked there, so "is X free at Y" is answered with a few
+dictionary lookups instead of a database query.
+
+* Recurring entries (no specific_date) occupy their weekday every week,
+  so they are checked against the recurring entries of that weekday and
+  against the dated entries of its upcoming dates, except the dates on
+  which the entry's group has a dated entry replacing its class.
+* Dated entries occupy one date. A dated entry replaces the recurring
+  class of its group and time slot on that date (see app.services.calendar),
+  so it is checked against the other dated entries of the date and against
+  the recurring entries of that weekday whose group is not overridden.
+* Cancelled entries occupy nothing, but a cancelled dated entry still
+  overrides (cancels) its group's recurring class. Substituted entries
+  occupy the substitute teacher instead of the original one.
+
+Institutions are loaded lazily on first use and reloaded after
+OCCUPANCY_INDEX_TTL_SECONDS so that writes made by other workers are picked
+up. Writes made through this process are applied on commit by the session
+listeners at the bottom of this module.
+"""
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.schedule import ScheduleEntry, DayOfWeek, ScheduleStatus
+from app.models.time_slot import TimeSlot
+
+WEEKDAYS = list(DayOfWeek)
+
+
+class Booking(NamedTuple):
+    """What a single schedule entry occupies."""
+    institution_id: int
+    day_of_week: DayOfWeek
+    specific_date: Optional[date]
+    time_slot_id: int
+    teacher_id: int
+    group_id: int
+    classroom_id: int
+    cancelled: bool = False
+
+    def own_key(self) -> tuple:
+        if self.specific_date:
+            return self.date_key(self.specific_date)
+        return self.week_key()
+
+    def date_key(self, day: date) -> tuple:
+        return (self.institution_id, "date", day, self.time_slot_id)
+
+    def week_key(self) -> tuple:
+        return (self.institution_id, "week", self.weekday(), self.time_slot_id)
+
+    def weekday(self) -> DayOfWeek:
+        if self.specific_date:
+            return WEEKDAYS[self.specific_date.weekday()]
+        return DayOfWeek(self.day_of_week)
+
+    def resources(self) -> List[tuple]:
+        if self.cancelled:
+            return []
+        return [
+            ("teacher", self.teacher_id),
+            ("group", self.group_id),
+            ("classroom", self.classroom_id),
+        ]
+
+
+class SlotCounts:
+    """Bookings counted per slot key.
+
+    * `resources`: key -> how many bookings hold each resource.
+    * `weekly_groups`: (week key, group) -> resources held by that group's
+      recurring bookings, to free them where the group is overridden.
+    * `overrides`: date key -> how many dated entries each group has.
+    * `dates`: week key -> how many dated entries each date of that
+      weekday has, to find the dates a recurring booking runs into.
+
+    Counts may go negative in a layer that releases bookings of another.
+    """
+
+    def __init__(self):
+        self.resources: Dict[tuple, Counter] = defaultdict(Counter)
+        self.weekly_groups: Dict[tuple, Counter] = defaultdict(Counter)
+        self.overrides: Dict[tuple, Counter] = defaultdict(Counter)
+        self.dates: Dict[tuple, Counter] = defaultdict(Counter)
+
+    def update(self, booking: Booking, sign: int = 1):
+        key = booking.own_key()
+        resources = Counter({resource: sign for resource in booking.resources()})
+        _add(self.resources, key, resources)
+        if booking.specific_date:
+            _add(self.overrides, key, Counter({booking.group_id: sign}))
+            _add(self.dates, booking.week_key(), Counter({booking.specific_date: sign}))
+        else:
+            _add(self.weekly_groups, (key, booking.group_id), resources)
+
+    def clear(self):
+        self.resources.clear()
+        self.weekly_groups.clear()
+        self.overrides.clear()
+        self.dates.clear()
+
+
+def _add(counts: Dict[tuple, Counter], key: tuple, delta: Counter):
+    if not delta:
+        return
+    slot = counts[key]
+    for item, value in delta.items():
+        slot[item] += value
+        if slot[item] == 0:
+            del slot[item]
+    if not slot:
+        del counts[key]
+
+
+def _total(layers: Sequence[SlotCounts], counts: str, key: tuple, item) -> int:
+    total = 0
+    for layer in layers:
+        slot = getattr(layer, counts).get(key)
+        if slot:
+            total += slot[item]
+    return total
+
+
+def busy_resources(booking: Booking, layers: Sequence[SlotCounts]) -> List[str]:
+    """Resources of `booking` already held in the sum of `layers`."""
+    week_key = booking.week_key()
+    if not booking.specific_date:
+        # Upcoming dates of the weekday on which the group's class takes place
+        today = date.today()
+        days = {day for layer in layers for day in layer.dates.get(week_key, ()) if day >= today}
+        date_keys = [
+            booking.date_key(day) for day in sorted(days)
+            if _total(layers, "dates", week_key, day) > 0
+            and _total(layers, "overrides", booking.date_key(day), booking.group_id) <= 0
+        ]
+        return [
+            kind for kind, resource_id in booking.resources()
+            if _total(layers, "resources", week_key, (kind, resource_id)) > 0
+            or any(_total(layers, "resources", key, (kind, resource_id)) > 0 for key in date_keys)
+        ]
+
+    date_key = booking.own_key()
+    groups = {group_id for layer in layers for group_id in layer.overrides.get(date_key, ())}
+    # Recurring classes of these groups do not take place on this date
+    replaced = {
+        group_id for group_id in groups if _total(layers, "overrides", date_key, group_id) > 0
+    } | {booking.group_id}
+    busy = []
+    for kind, resource_id in booking.resources():
+        resource = (kind, resource_id)
+        weekly = _total(layers, "resources", week_key, resource) - sum(
+            _total(layers, "weekly_groups", (week_key, group_id), resource) for group_id in replaced
+        )
+        if weekly > 0 or _total(layers, "resources", date_key, resource) > 0:
+            busy.append(kind)
+    return busy
+
+
+class OccupancyIndex:
+    """Thread-safe occupancy index shared by all requests of a worker."""
+
+    def __init__(self, ttl_seconds: int = 300):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.RLock()
+        self._counts = SlotCounts()
+        self._entries: Dict[int, Booking] = {}
+        self._loaded_at: Dict[int, float] = {}
+        self._slot_institutions: Dict[int, int] = {}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+            self._entries.clear()
+            self._loaded_at.clear()
+            self._slot_institutions.clear()
+
+    def institution_of_slot(self, connection, time_slot_id: int) -> Optional[int]:
+        """Return the institution owning a time slot (cached)."""
+        institution_id = self._slot_institutions.get(time_slot_id)
+        if institution_id is None:
+            institution_id = connection.execute(
+                select(TimeSlot.institution_id).where(TimeSlot.id == time_slot_id)
+            ).scalar()
+            if institution_id is not None:
+                self._slot_institutions[time_slot_id] = institution_id
+        return institution_id
+
+    def booking_for(self, connection, values) -> Optional[Booking]:
+        """Build a Booking from an entry, a schema or any object with entry attributes."""
+        institution_id = self.institution_of_slot(connection, values.time_slot_id)
+        if institution_id is None:
+            return None
+        return Booking(
+            institution_id=institution_id,
+            day_of_week=values.day_of_week,
+            specific_date=values.specific_date,
+            time_slot_id=values.time_slot_id,
+            teacher_id=getattr(values, "substitute_teacher_id", None) or values.teacher_id,
+            group_id=values.group_id,
+            classroom_id=values.classroom_id,
+            cancelled=getattr(values, "status", None) == ScheduleStatus.CANCELLED,
+        )
+
+    def ensure_loaded(self, connection, institution_id: int):
+        """Load (or reload once the TTL expired) an institution's bookings."""
+        loaded_at = self._loaded_at.get(institution_id)
+        if loaded_at is not None and time.monotonic() - loaded_at < self.ttl_seconds:
+            return
+
+        slots = connection.execute(
+            select(TimeSlot.id).where(TimeSlot.institution_id == institution_id)
+        ).scalars().all()
+        rows = connection.execute(
+            select(
+                ScheduleEntry.id,
+                ScheduleEntry.day_of_week,
+                ScheduleEntry.specific_date,
+                ScheduleEntry.status,
+                ScheduleEntry.time_slot_id,
+                ScheduleEntry.teacher_id,
+                ScheduleEntry.substitute_teacher_id,
+                ScheduleEntry.group_id,
+                ScheduleEntry.classroom_id,
+            )
+            .join(TimeSlot, TimeSlot.id == ScheduleEntry.time_slot_id)
+            .where(TimeSlot.institution_id == institution_id)
+        ).all()
+
+        with self._lock:
+            for entry_id in [i for i, b in self._entries.items() if b.institution_id == institution_id]:
+                self._discard(entry_id)
+            for slot_id in slots:
+                self._slot_institutions[slot_id] = institution_id
+            for row in rows:
+                booking = self.booking_for(connection, row)
+                if booking:
+                    self._store(row.id, booking)
+            self._loaded_at[institution_id] = time.monotonic()
+
+    def prime_slots(self, slot_institutions: Iterable[tuple]):
+        """Seed the time slot -> institution cache from (slot_id, institution_id) pairs."""
+        with self._lock:
+            self._slot_institutions.update(slot_institutions)
+
+    def expire(self):
+        """Force every institution to reload on its next check."""
+        with self._lock:
+            for institution_id in self._loaded_at:
+                self._loaded_at[institution_id] = float("-inf")
+
+    def is_loaded(self, institution_id: int) -> bool:
+        return institution_id in self._loaded_at
+
+    def set_booking(self, entry_id: int, booking: Optional[Booking]):
+        """Record the current booking of an entry (None removes it)."""
+        with self._lock:
+            self._discard(entry_id)
+            if booking and self.is_loaded(booking.institution_id):
+                self._store(entry_id, booking)
+
+    def busy(self, booking: Booking, *layers: SlotCounts) -> List[str]:
+        """Resources of `booking` held in the index plus `layers`."""
+        with self._lock:
+            return busy_resources(booking, [self._counts, *layers])
+
+    def booking_of(self, entry_id: int) -> Optional[Booking]:
+        return self._entries.get(entry_id)
+
+    def conflicts(self, booking: Booking, ignore: Iterable[int] = ()) -> List[str]:
+        """Return the resources of `booking` that are already occupied.
+
+        Entries listed in `ignore` (e.g. the entry being updated) do not count.
+        """
+        with self._lock:
+            released = SlotCounts()
+            for entry_id in ignore:
+                if entry_id in self._entries:
+                    released.update(self._entries[entry_id], -1)
+            return self.busy(booking, released)
+
+    def _store(self, entry_id: int, booking: Booking):
+        self._entries[entry_id] = booking
+        self._counts.update(booking)
+
+    def _discard(self, entry_id: int):
+        booking = self._entries.pop(entry_id, None)
+        if booking is not None:
+            self._counts.update(booking, -1)
+
+
+occupancy_index = OccupancyIndex(ttl_seconds=settings.OCCUPANCY_INDEX_TTL_SECONDS)
+
+
+def find_conflicts(db: Session, values, ignore: Iterable[int] = ()) -> List[str]:
+    """Check a prospective entry against the occupancy index.
+
+    `values` is anything with schedule entry attributes (a ScheduleEntry,
+    ScheduleEntryCreate, ...). Returns the list of busy resources, empty if
+    the slot is free.
+    """
+    connection = db.connection()
+    booking = occupancy_index.booking_for(connection, values)
+    if booking is None:
+        return []
+    occupancy_index.ensure_loaded(connection, booking.institution_id)
+    return occupancy_index.conflicts(booking, ignore)
+
+
+class PendingBookings(SlotCounts):
+    """Uncommitted changes of a batch, layered over the occupancy index.
+
+    Bookings accepted earlier in the batch count as occupied; bookings the
+    batch releases (deleted or moved entries) count as free.
+    """
+
+    def add(self, booking: Booking):
+        self.update(booking)
+
+    def release(self, booking: Booking):
+        self.update(booking, -1)
+
+
+def check_batch_item(db: Session, values, pending: PendingBookings) -> tuple:
+    """Check one batch item against the index and the batch so far.
+
+    Returns (booking, busy). A conflict-free booking is added to `pending`.
+    """
+    connection = db.connection()
+    booking = occupancy_index.booking_for(connection, values)
+    if booking is None:
+        return None, []
+    occupancy_index.ensure_loaded(connection, booking.institution_id)
+    busy = occupancy_index.busy(booking, pending)
+    if not busy:
+        pending.add(booking)
+    return booking, busy
+
+
+def track_booking(db: Session, entry_id: int, booking: Optional[Booking]):
+    """Register a booking written with a Core statement (bypassing the ORM flush)."""
+    db.info.setdefault("occupancy_changes", {})[entry_id] = booking
+
+
+def conflict_detail(busy: List[str]) -> str:
+    return f"Schedule conflict: {', '.join(busy)} already occupied at this time"
+
+
+def unique_violation_detail(exc: IntegrityError) -> Optional[str]:
+    """The conflict detail for a uq_schedule_* violation, None for other errors."""
+    # PostgreSQL names the index, SQLite lists the indexed columns
+    message = str(exc.orig)
+    if "uq_schedule_" not in message and "UNIQUE constraint failed: schedule_entries." not in message:
+        return None
+    busy = [kind for kind in ("teacher", "group", "classroom") if kind in message]
+    return conflict_detail(busy or ["teacher, group or classroom"])
+
+
+@contextmanager
+def booking_guard(db: Session):
+    """Turn a unique-booking violation raised inside the block into a 400 conflict.
+
+    The uq_schedule_* indexes catch double bookings that slipped past the
+    in-memory check, e.g. two workers writing the same slot concurrently.
+    Wrap the flush/commit of every schedule write in this block.
+    """
+    try:
+        yield
+    except IntegrityError as exc:
+        db.rollback()
+        detail = unique_violation_detail(exc)
+        if detail is None:
+            raise
+        # Another worker wrote this slot; our copy of the index is stale
+        occupancy_index.expire()
+        raise HTTPException(status_code=400, detail=detail)
+
+
+# Keep the index in sync with every ORM write. Bookings are captured at
+# flush time and applied only once the transaction commits. SQLAlchemy also
+# fires the commit and rollback hooks for savepoints, which the hooks here
+# and in the other session listeners skip.
+
+@event.listens_for(Session, "after_flush")
+def _collect_booking_changes(session, flush_context):
+    changes = session.info.setdefault("occupancy_changes", {})
+    connection = session.connection()
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, ScheduleEntry) and obj.id is not None:
+            changes[obj.id] = occupancy_index.booking_for(connection, obj)
+    for obj in session.deleted:
+        if isinstance(obj, ScheduleEntry) and obj.id is not None:
+            changes[obj.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_booking_changes(session):
+    if session.in_nested_transaction():
+        return
+    changes: Dict[int, Optional[Booking]] = session.info.pop("occupancy_changes", {})
+    for entry_id, booking in changes.items():
+        occupancy_index.set_booking(entry_id, booking)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_booking_changes(session):
+    if session.in_nested_transaction():
+        return
+    session.info.pop("occupancy_changes", None)
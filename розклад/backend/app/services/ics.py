@@ -0,0 +1,248 @@
+"""iCalendar (RFC 5545) feeds of a group's, teacher's or classroom's schedule.
+
+* A recurring entry is one weekly event (RRULE) starting on its first
+  weekday after it was created.
+* A dated entry is a single event. It also removes the recurring class of
+  its group and time slot on that date from the series (EXDATE), so
+  single-week cancellations, substitutions and moves show up correctly.
+
+Times are local to CALENDAR_TIMEZONE, whose VTIMEZONE (its UTC offset
+transitions over the years around today, from the tz database) opens the
+feed.
+
+Calendar apps poll subscribed feeds every few minutes. Feeds therefore
+carry an ETag and Last-Modified derived from the schedule version counters
+(app.services.schedule_versions) and the rendered body is kept in the
+response cache until one of those versions changes. Besides the feed's own
+scope, a feed depends on the groups of its recurring entries, whose dated
+entries may override them.
+"""
+import hashlib
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.schedule import ScheduleEntry, ScheduleStatus
+from app.models.schedule_version import ScheduleVersion
+from app.models.group import Group
+from app.models.teacher import Teacher
+from app.models.classroom import Classroom
+from app.services.calendar import WEEKDAYS, dated_entries_query
+from app.services.schedule_details import schedule_details_query
+from app.services.schedule_scope import ScheduleScope
+from app.services.schedule_versions import REFERENCE_SCOPE
+
+# Starlette adds the charset to text/* media types
+MEDIA_TYPE = "text/calendar"
+
+PRODID = "-//Rozklad//Schedule//EN"
+
+RRULE_DAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+
+# Years before and after the current one covered by the VTIMEZONE
+TIMEZONE_YEARS_BEFORE = 5
+TIMEZONE_YEARS_AFTER = 10
+
+# Feed kind -> (scope filter, model, name column)
+FEEDS = {
+    "group": ("group_ids", Group, Group.name),
+    "teacher": ("teacher_ids", Teacher, Teacher.full_name),
+    "classroom": ("classroom_ids", Classroom, Classroom.name),
+}
+
+
+def feed_scope(kind: str, scope_id: int) -> ScheduleScope:
+    return ScheduleScope(**{FEEDS[kind][0]: (scope_id,)})
+
+
+def feed_name(db: Session, kind: str, scope_id: int) -> Optional[str]:
+    """Name of the feed's group, teacher or classroom; None if it does not exist."""
+    _, model, column = FEEDS[kind]
+    return db.execute(select(column).where(model.id == scope_id)).scalar()
+
+
+def feed_validators(db: Session, scope: ScheduleScope) -> Tuple[str, Optional[datetime], List[str]]:
+    """ETag, Last-Modified and cache tags of a feed, from the version counters."""
+    groups = db.execute(
+        scope.apply(select(ScheduleEntry.group_id).distinct())
+        .where(ScheduleEntry.specific_date.is_(None))
+    ).scalars()
+    keys = sorted(set(scope.version_keys()) | {("group", group_id) for group_id in groups} | {REFERENCE_SCOPE})
+    rows = db.execute(
+        select(ScheduleVersion.scope, ScheduleVersion.scope_id, ScheduleVersion.version, ScheduleVersion.updated_at)
+        .where(tuple_(ScheduleVersion.scope, ScheduleVersion.scope_id).in_(keys))
+    )
+    versions = {(row.scope, row.scope_id): row for row in rows}
+
+    state = [(key, versions[key].version if key in versions else 0) for key in keys]
+    digest = hashlib.sha1(repr(("ics", scope, state)).encode()).hexdigest()
+    last_modified = max((row.updated_at for row in versions.values()), default=None)
+    tags = [f"{name}:{scope_id}" for name, scope_id in keys]
+    return f'"{digest}"', last_modified, tags
+
+
+async def render_feed(db: AsyncSession, scope: ScheduleScope, name: str) -> AsyncIterator[bytes]:
+    """Yield the feed as iCalendar text, one event at a time.
+
+    Dated entries are streamed first, collecting the dates they take out of
+    the recurring series; the series (a week's worth of entries) follow.
+    """
+    yield _lines(
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        "X-WR-CALNAME:" + _escape(name),
+        f"X-WR-TIMEZONE:{settings.CALENDAR_TIMEZONE}",
+    )
+    year = date.today().year
+    yield _lines(*_vtimezone(
+        settings.CALENDAR_TIMEZONE, year - TIMEZONE_YEARS_BEFORE, year + TIMEZONE_YEARS_AFTER
+    ))
+
+    series = (await db.execute(
+        scope.apply(schedule_details_query())
+        .where(ScheduleEntry.specific_date.is_(None))
+        .order_by(ScheduleEntry.id)
+    )).all()
+
+    exdates = defaultdict(list)
+    result = await db.stream(dated_entries_query(scope, {row.group_id for row in series}))
+    try:
+        async for row in result:
+            exdates[(row.group_id, row.time_slot_id, row.specific_date.weekday())].append(row.specific_date)
+            if row.in_scope:
+                yield _event(row, row.specific_date)
+    finally:
+        await result.close()
+
+    for row in series:
+        weekday = WEEKDAYS.index(row.day_of_week)
+        created = (row.created_at or datetime.utcnow()).date()
+        first = created + timedelta(days=(weekday - created.weekday()) % 7)
+        excluded = exdates.get((row.group_id, row.time_slot_id, weekday), ())
+        yield _event(
+            row,
+            first,
+            f"RRULE:FREQ=WEEKLY;BYDAY={RRULE_DAYS[weekday]}",
+            *(f"EXDATE;TZID={settings.CALENDAR_TIMEZONE}:{_local(day, row.start_time)}" for day in excluded),
+        )
+
+    yield _lines("END:VCALENDAR")
+
+
+def _event(row, day: date, *recurrence: str) -> bytes:
+    teacher = row.substitute_teacher_name or row.teacher_name
+    description = f"{row.group_name}\n{teacher}"
+    if row.notes:
+        description += f"\n{row.notes}"
+    tzid = settings.CALENDAR_TIMEZONE
+    return _lines(
+        "BEGIN:VEVENT",
+        f"UID:schedule-entry-{row.id}@rozklad",
+        f"DTSTAMP:{(row.updated_at or row.created_at or datetime.utcnow()):%Y%m%dT%H%M%SZ}",
+        f"DTSTART;TZID={tzid}:{_local(day, row.start_time)}",
+        f"DTEND;TZID={tzid}:{_local(day, row.end_time)}",
+        *recurrence,
+        "SUMMARY:" + _escape(row.subject_name),
+        "LOCATION:" + _escape(row.classroom_name),
+        "DESCRIPTION:" + _escape(description),
+        "STATUS:" + ("CANCELLED" if row.status == ScheduleStatus.CANCELLED else "CONFIRMED"),
+        "END:VEVENT",
+    )
+
+
+@lru_cache(maxsize=8)
+def _vtimezone(tzid: str, first_year: int, last_year: int) -> Tuple[str, ...]:
+    """VTIMEZONE of a tz database zone: one observance per offset change.
+
+    A zone without changes in the range gets a single STANDARD observance.
+    """
+    zone = ZoneInfo(tzid)
+    start = datetime(first_year, 1, 1, tzinfo=timezone.utc)
+    end = datetime(last_year + 1, 1, 1, tzinfo=timezone.utc)
+    observances = []
+    # Offsets change at most a few times a year and never twice within a day
+    before = start
+    while before < end:
+        after = before + timedelta(days=1)
+        if after.astimezone(zone).utcoffset() != before.astimezone(zone).utcoffset():
+            onset = _transition(zone, before, after)
+            observances.append(_observance(zone, onset, before.astimezone(zone).utcoffset()))
+        before = after
+    if not observances:
+        observances.append(_observance(zone, start, start.astimezone(zone).utcoffset()))
+    return ("BEGIN:VTIMEZONE", f"TZID:{tzid}", *(line for o in observances for line in o), "END:VTIMEZONE")
+
+
+def _transition(zone: ZoneInfo, before: datetime, after: datetime) -> datetime:
+    """First whole minute in (before, after] with the offset of `after`."""
+    offset = after.astimezone(zone).utcoffset()
+    while after - before > timedelta(minutes=1):
+        middle = before + (after - before) / 2
+        middle -= timedelta(seconds=middle.second, microseconds=middle.microsecond)
+        if middle <= before:
+            break
+        if middle.astimezone(zone).utcoffset() == offset:
+            after = middle
+        else:
+            before = middle
+    return after
+
+
+def _observance(zone: ZoneInfo, onset: datetime, offset_from: timedelta) -> Tuple[str, ...]:
+    """Observance starting at `onset` (UTC); DTSTART is in the offset it replaces."""
+    local = onset.astimezone(zone)
+    kind = "DAYLIGHT" if local.dst() else "STANDARD"
+    return (
+        f"BEGIN:{kind}",
+        f"DTSTART:{(onset + offset_from).replace(tzinfo=None):%Y%m%dT%H%M%S}",
+        f"TZOFFSETFROM:{_offset(offset_from)}",
+        f"TZOFFSETTO:{_offset(local.utcoffset())}",
+        f"TZNAME:{local.tzname()}",
+        f"END:{kind}",
+    )
+
+
+def _offset(offset: timedelta) -> str:
+    minutes = int(offset.total_seconds()) // 60
+    sign = "-" if minutes < 0 else "+"
+    return f"{sign}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}"
+
+
+def _local(day: date, at: time) -> str:
+    return datetime.combine(day, at).strftime("%Y%m%dT%H%M%S")
+
+
+def _escape(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def _lines(*lines: str) -> bytes:
+    return b"".join(_fold(line) for line in lines)
+
+
+def _fold(line: str) -> bytes:
+    """Encode a content line, folded at 75 octets without splitting characters."""
+    chunks, current, size = [], [], 0
+    for char in line:
+        width = len(char.encode())
+        if size + width > 75:
+            chunks.append("".join(current))
+            # Continuation lines start with a space, which counts
+            current, size = [" "], 1
+        current.append(char)
+        size += width
+    chunks.append("".join(current))
+    return ("\r\n".join(chunks) + "\r\n").encode()
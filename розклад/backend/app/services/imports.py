@@ -0,0 +1,189 @@
+"""Bulk import of reference data from CSV or Excel files.
+
+Uploads are read row by row (csv over the spooled upload, openpyxl in
+read-only mode), validated against the entity's create schema and written
+in chunks of IMPORT_CHUNK_SIZE rows, so memory stays bounded by the chunk
+whatever the size of the file. Per chunk, existing rows are matched by the
+entity's natural key with one query, new rows are inserted with one
+multi-row INSERT and matched rows are updated with one executemany UPDATE.
+Only the columns present in the file are updated.
+
+Everything runs in the caller's transaction; the caller commits.
+"""
+import csv
+import io
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services.schedule_versions import REFERENCE_SCOPE, mark_scopes
+
+
+@dataclass(frozen=True)
+class ImportSpec:
+    """How rows of one entity are validated and matched to existing rows."""
+    model: type
+    schema: Type[BaseModel]
+    # Natural key within an institution; a row with a known key updates it
+    key: Tuple[str, ...]
+
+
+class ImportFormatError(ValueError):
+    """The upload cannot be read as a table."""
+
+
+FORMATS = {".csv": "csv", ".xlsx": "xlsx", ".xlsm": "xlsx"}
+
+
+def file_format(filename: Optional[str]) -> str:
+    suffix = "." + (filename or "").rsplit(".", 1)[-1].lower()
+    if suffix not in FORMATS:
+        raise ImportFormatError("Unsupported file type: upload a .csv or .xlsx file")
+    return FORMATS[suffix]
+
+
+def read_rows(file, format: str) -> Iterator[Tuple[int, dict]]:
+    """Yield (row number, {column: value}) for every non-empty data row.
+
+    The first row holds the column names. Empty cells are left out, so they
+    take the schema default on insert and keep the stored value on update.
+    """
+    workbook = None
+    if format == "csv":
+        text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+        rows = csv.reader(text)
+    else:
+        from openpyxl import load_workbook
+        try:
+            workbook = load_workbook(file, read_only=True, data_only=True)
+        except Exception as e:
+            raise ImportFormatError(f"Cannot read the workbook: {e}")
+        rows = workbook.active.iter_rows(values_only=True)
+
+    try:
+        header = next(rows, None)
+        if not header:
+            raise ImportFormatError("The file is empty")
+        columns = [_column_name(name) for name in header]
+
+        for number, values in enumerate(rows, start=2):
+            row = {
+                column: value.strip() if isinstance(value, str) else value
+                for column, value in zip(columns, values)
+                if column
+            }
+            row = {column: value for column, value in row.items() if value not in (None, "")}
+            if row:
+                yield number, row
+    except UnicodeDecodeError:
+        raise ImportFormatError("CSV files must be UTF-8 encoded")
+    finally:
+        if workbook is not None:
+            workbook.close()
+
+
+def _column_name(name) -> Optional[str]:
+    if name is None:
+        return None
+    return str(name).strip().lower().replace(" ", "_") or None
+
+
+def import_rows(db: Session, spec: ImportSpec, rows: Iterator[Tuple[int, dict]], institution_id: int) -> dict:
+    """Validate and upsert `rows`; returns the counts and per-row errors.
+
+    Errors are listed up to IMPORT_MAX_ERRORS; `failed` counts all of them.
+    """
+    result = {"created": 0, "updated": 0, "failed": 0, "errors": []}
+    chunk: Dict[tuple, BaseModel] = {}
+    for number, row in rows:
+        try:
+            values = _validate(spec.schema, row, institution_id)
+        except ValidationError as e:
+            _report(result, number, "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            ))
+            continue
+        except ValueError as e:
+            _report(result, number, str(e))
+            continue
+        # A key repeated within the chunk: the later row wins
+        chunk[tuple(getattr(values, column) for column in spec.key)] = values
+        if len(chunk) >= settings.IMPORT_CHUNK_SIZE:
+            _write_chunk(db, spec, chunk, institution_id, result)
+            chunk = {}
+    if chunk:
+        _write_chunk(db, spec, chunk, institution_id, result)
+    return result
+
+
+def _validate(schema: Type[BaseModel], row: dict, institution_id: int) -> BaseModel:
+    row = {**row, "institution_id": institution_id}
+    for name, field in schema.model_fields.items():
+        value = row.get(name)
+        if isinstance(value, str) and field.annotation in (list, dict):
+            row[name] = _parse_collection(name, value, field.annotation)
+        elif value is not None and not isinstance(value, str) and field.annotation is str:
+            # Excel stores names like "101" as numbers
+            row[name] = _cell_text(value)
+    return schema(**row)
+
+
+def _cell_text(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _parse_collection(name: str, value: str, kind: type):
+    """Lists may be comma-separated; lists and objects may be JSON."""
+    if kind is list and not value.startswith("["):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        raise ValueError(f"{name}: invalid JSON")
+    return parsed
+
+
+def _report(result: dict, number: int, detail: str):
+    result["failed"] += 1
+    if len(result["errors"]) < settings.IMPORT_MAX_ERRORS:
+        result["errors"].append({"row": number, "detail": detail})
+
+
+def _write_chunk(db: Session, spec: ImportSpec, chunk: Dict[tuple, BaseModel], institution_id: int, result: dict):
+    model = spec.model
+    key_columns = [getattr(model, column) for column in spec.key]
+    if len(key_columns) == 1:
+        matches = key_columns[0].in_([key for key, in chunk])
+    else:
+        matches = tuple_(*key_columns).in_(list(chunk))
+    existing = {
+        tuple(row[1:]): row[0]
+        for row in db.execute(
+            select(model.id, *key_columns).where(model.institution_id == institution_id, matches)
+        )
+    }
+    now = datetime.utcnow()
+    # Inserted rows get the schema defaults, updates only the columns in the file
+    new = [values.dict() for key, values in chunk.items() if key not in existing]
+    changed = [
+        {**values.dict(exclude_unset=True), "id": existing[key], "updated_at": now}
+        for key, values in chunk.items() if key in existing
+    ]
+    if new:
+        db.execute(insert(model), new)
+    if changed:
+        db.execute(update(model), changed)
+    if new or changed:
+        # Core statements bypass the flush hook: new time slots, renamed
+        # groups, ... change the grid and joined names of schedule views
+        mark_scopes(db, [REFERENCE_SCOPE], institution_id=institution_id)
+    result["created"] += len(new)
+    result["updated"] += len(changed)
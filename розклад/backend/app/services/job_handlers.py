@@ -0,0 +1,45 @@
+"""Handlers of the background jobs enqueued by the API.
+
+Every handler receives its own session and the job's payload; the worker
+commits on success and retries the job if the handler raises. Handlers
+load what they need by id, so a retried job sees the current state.
+"""
+from app.core.email import create_verification_token, send_verification_email
+from app.models.change_request import ChangeRequest
+from app.services.jobs import job
+from app.services.timetable_generation import run_generation_job
+from app.services.notifications import (
+    notify_admins_of_new_request, notify_users_of_change, notify_batch_processed
+)
+# Periodic maintenance jobs register themselves on import
+from app.services import job_retention, notification_counters, notification_retention  # noqa: F401
+
+
+@job("notify_change_request_created")
+def notify_change_request_created(db, change_request_id: int):
+    change_request = db.get(ChangeRequest, change_request_id)
+    if change_request:
+        notify_admins_of_new_request(db, change_request)
+
+
+@job("notify_change_request_processed")
+def notify_change_request_processed(db, change_request_id: int):
+    change_request = db.get(ChangeRequest, change_request_id)
+    if change_request:
+        notify_users_of_change(db, change_request)
+
+
+@job("notify_change_requests_processed")
+def notify_change_requests_processed(db, change_request_ids: list):
+    change_requests = db.query(ChangeRequest).filter(ChangeRequest.id.in_(change_request_ids)).all()
+    notify_batch_processed(db, change_requests)
+
+
+@job("generate_timetable")
+def generate_timetable(db, timetable_job_id: int):
+    run_generation_job(db, timetable_job_id)
+
+
+@job("send_verification_email")
+def send_verification(db, email: str):
+    send_verification_email(email, create_verification_token(email))
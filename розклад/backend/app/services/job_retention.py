@@ -0,0 +1,57 @@
+"""Job retention.
+
+Every job leaves a row behind, so the periodic "purge_jobs" job deletes
+jobs that finished more than JOB_RETENTION_DAYS ago, and failed ones after
+JOB_FAILED_RETENTION_DAYS so they can be inspected first. A finished run
+of a periodic job is kept for at least its interval, since it is what
+tells the workers that the job is not due yet.
+
+Rows go in batches of JOB_PURGE_BATCH_SIZE, each in its own short
+transaction, so the sweep never holds long locks on the queue.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.job import Job, JobStatus
+from app.services.jobs import job, schedules
+
+
+def expired_jobs(now: datetime):
+    """Condition matching finished jobs past their retention period."""
+    # Never less than the longest periodic interval
+    minimum = timedelta(seconds=max(schedules.values(), default=0))
+    done_cutoff = now - max(timedelta(days=settings.JOB_RETENTION_DAYS), minimum)
+    failed_cutoff = now - max(timedelta(days=settings.JOB_FAILED_RETENTION_DAYS), minimum)
+    return or_(
+        and_(Job.status == JobStatus.DONE, Job.finished_at < done_cutoff),
+        and_(Job.status == JobStatus.FAILED, Job.finished_at < failed_cutoff),
+    )
+
+
+def purge_batch(db: Session, now: datetime) -> int:
+    """Delete one batch of expired jobs; returns its size."""
+    ids = db.scalars(
+        select(Job.id)
+        .where(expired_jobs(now))
+        .order_by(Job.id)
+        .limit(settings.JOB_PURGE_BATCH_SIZE)
+    ).all()
+    if ids:
+        db.execute(delete(Job).where(Job.id.in_(ids)))
+    return len(ids)
+
+
+@job("purge_jobs", every=settings.JOB_PURGE_INTERVAL_SECONDS)
+def purge_jobs(db: Session) -> int:
+    """Sweep all expired jobs, committing after every batch."""
+    now = datetime.utcnow()
+    purged = 0
+    while True:
+        batch = purge_batch(db, now)
+        db.commit()
+        purged += batch
+        if batch < settings.JOB_PURGE_BATCH_SIZE:
+            return purged
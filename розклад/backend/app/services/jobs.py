@@ -0,0 +1,289 @@
+"""Durable background jobs (transactional outbox).
+
+`enqueue` adds a row to `jobs` in the caller's session, so a job exists if
+and only if the transaction that asked for it commits. Workers claim due
+jobs, run the registered handler in a session of their own and either
+mark the job done or schedule a retry with exponential backoff. After
+JOB_MAX_ATTEMPTS failures a job is left as FAILED for inspection.
+Finished jobs are deleted by the periodic "purge_jobs" job
+(app.services.job_retention).
+
+Workers run as a thread inside each API process (JOB_WORKER_MODE
+"inprocess") or as separate processes started with `python -m app.worker`
+("external"). Both can run side by side: a job is claimed by exactly one
+worker.
+
+Handlers registered with `every=` seconds are also enqueued periodically
+by the workers (maintenance such as counter reconciliation or purges).
+Handlers that may run longer than JOB_LOCK_TIMEOUT_SECONDS call
+`extend_claim` so their job is not handed to another worker.
+"""
+import logging
+import random
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+import time
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import event, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models.job import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+handlers: Dict[str, Callable] = {}
+# Periodic jobs: name -> interval in seconds
+schedules: Dict[str, float] = {}
+
+# How often a worker checks whether periodic jobs are due
+SCHEDULE_CHECK_SECONDS = 60
+
+
+def job(name: str, every: Optional[float] = None):
+    """Register a handler `fn(db, **payload)` for jobs called `name`.
+
+    With `every`, the job is also enqueued (without payload) every `every`
+    seconds; a non-positive interval disables it.
+    """
+    def register(fn):
+        handlers[name] = fn
+        if every and every > 0:
+            schedules[name] = every
+        return fn
+    return register
+
+
+def enqueue(db: Session, name: str, run_at: Optional[datetime] = None, **payload) -> Job:
+    """Add a job to the caller's transaction; it runs once that commits."""
+    new_job = Job(
+        name=name,
+        payload=payload,
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+        run_at=run_at or datetime.utcnow(),
+    )
+    db.add(new_job)
+    db.info["jobs_enqueued"] = True
+    return new_job
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, in seconds."""
+    delay = min(settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def enqueue_periodic_jobs(db: Session) -> int:
+    """Enqueue every periodic job that is due.
+
+    A job is due when no run of it is queued or running and the last one
+    finished over its interval ago. Workers race benignly: at worst a run
+    is duplicated, so periodic handlers must be idempotent.
+    """
+    now = datetime.utcnow()
+    enqueued = 0
+    for name, every in schedules.items():
+        recent = db.scalar(select(Job.id).where(
+            Job.name == name,
+            or_(
+                Job.status.in_([JobStatus.PENDING, JobStatus.RUNNING]),
+                Job.finished_at > now - timedelta(seconds=every),
+            ),
+        ).limit(1))
+        if recent is None:
+            enqueue(db, name)
+            enqueued += 1
+    db.commit()
+    return enqueued
+
+
+def requeue_stale_jobs(db: Session) -> int:
+    """Return jobs whose worker died mid-run to the queue."""
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT_SECONDS)
+    result = db.execute(
+        update(Job)
+        .where(Job.status == JobStatus.RUNNING, Job.locked_at < cutoff)
+        .values(status=JobStatus.PENDING, locked_by=None, locked_at=None)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def claim_jobs(db: Session, worker_id: str, limit: int) -> list:
+    """Atomically mark up to `limit` due jobs as running for this worker."""
+    now = datetime.utcnow()
+    due = (
+        select(Job.id)
+        .where(Job.status == JobStatus.PENDING, Job.run_at <= now)
+        .order_by(Job.run_at, Job.id)
+        .limit(limit)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        due = due.with_for_update(skip_locked=True)
+    ids = db.scalars(due).all()
+    if not ids:
+        db.rollback()
+        return []
+
+    # The status check makes the claim safe where SKIP LOCKED is unavailable
+    claim = f"{worker_id}:{uuid.uuid4().hex[:8]}"
+    db.execute(
+        update(Job)
+        .where(Job.id.in_(ids), Job.status == JobStatus.PENDING)
+        .values(status=JobStatus.RUNNING, locked_by=claim, locked_at=now, attempts=Job.attempts + 1)
+    )
+    db.commit()
+    return db.scalars(select(Job).where(Job.locked_by == claim).order_by(Job.id)).all()
+
+
+def extend_claim(db: Session, seconds: float):
+    """Keep the job run by `db` claimed for `seconds` more than the lock timeout."""
+    job_id, claim = db.info["job_claim"]
+    db.execute(
+        update(Job).where(Job.id == job_id, Job.locked_by == claim)
+        .values(locked_at=datetime.utcnow() + timedelta(seconds=seconds))
+    )
+    db.commit()
+
+
+def run_job(claimed: Job):
+    """Run one claimed job in its own session and record the outcome."""
+    handler = handlers.get(claimed.name)
+    db = SessionLocal()
+    # The lock timeout counts from the start of the job, not of its batch;
+    # a job requeued while it waited in the batch is skipped
+    renewed = db.execute(
+        update(Job).where(Job.id == claimed.id, Job.locked_by == claimed.locked_by)
+        .values(locked_at=datetime.utcnow())
+    )
+    db.commit()
+    if not renewed.rowcount:
+        db.close()
+        return
+    db.info["job_claim"] = (claimed.id, claimed.locked_by)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job {claimed.name!r}")
+        handler(db, **claimed.payload)
+        db.commit()
+        outcome = {"status": JobStatus.DONE, "finished_at": datetime.utcnow(), "last_error": None}
+    except Exception as exc:
+        db.rollback()
+        logger.exception("Job %s (%s) failed, attempt %s", claimed.id, claimed.name, claimed.attempts)
+        if claimed.attempts >= claimed.max_attempts:
+            outcome = {"status": JobStatus.FAILED, "finished_at": datetime.utcnow()}
+        else:
+            outcome = {
+                "status": JobStatus.PENDING,
+                "run_at": datetime.utcnow() + timedelta(seconds=retry_delay(claimed.attempts)),
+            }
+        outcome["last_error"] = f"{type(exc).__name__}: {exc}"
+    try:
+        db.execute(
+            update(Job).where(Job.id == claimed.id, Job.locked_by == claimed.locked_by)
+            .values(locked_by=None, locked_at=None, **outcome)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_pending_jobs(worker_id: str = "inline", limit: Optional[int] = None) -> int:
+    """Run due jobs until none are left (or `limit` ran); returns how many ran."""
+    ran = 0
+    db = SessionLocal()
+    try:
+        while limit is None or ran < limit:
+            batch = claim_jobs(db, worker_id, settings.JOB_BATCH_SIZE if limit is None else min(settings.JOB_BATCH_SIZE, limit - ran))
+            if not batch:
+                break
+            db.expunge_all()
+            for claimed in batch:
+                run_job(claimed)
+                ran += 1
+    finally:
+        db.close()
+    return ran
+
+
+class JobWorker:
+    """Polls the jobs table; woken early when this process enqueues a job."""
+
+    def __init__(self, worker_id: Optional[str] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:6]}"
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._next_schedule_check = 0.0
+
+    def wake(self):
+        self._wake.set()
+
+    def run_forever(self):
+        logger.info("Job worker %s started", self.worker_id)
+        while not self._stop.is_set():
+            try:
+                db = SessionLocal()
+                try:
+                    requeue_stale_jobs(db)
+                    if schedules and time.monotonic() >= self._next_schedule_check:
+                        enqueue_periodic_jobs(db)
+                        self._next_schedule_check = time.monotonic() + SCHEDULE_CHECK_SECONDS
+                finally:
+                    db.close()
+                ran = run_pending_jobs(self.worker_id)
+            except Exception:
+                logger.exception("Job worker %s poll failed", self.worker_id)
+                ran = 0
+            if not ran:
+                self._wake.wait(settings.JOB_POLL_INTERVAL_SECONDS)
+                self._wake.clear()
+
+    def start(self):
+        """Run the worker in a daemon thread of this process."""
+        self._thread = threading.Thread(target=self.run_forever, name="job-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+# The in-process worker of this API process, if started
+local_worker: Optional[JobWorker] = None
+
+
+def start_local_worker() -> JobWorker:
+    global local_worker
+    if local_worker is None:
+        local_worker = JobWorker()
+        local_worker.start()
+    return local_worker
+
+
+def stop_local_worker():
+    global local_worker
+    if local_worker is not None:
+        local_worker.stop()
+        local_worker = None
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_local_worker(session):
+    if session.in_nested_transaction():
+        return
+    if session.info.pop("jobs_enqueued", False) and local_worker is not None:
+        local_worker.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_enqueued_flag(session):
+    if session.in_nested_transaction():
+        return
+    session.info.pop("jobs_enqueued", None)
@@ -0,0 +1,101 @@
+"""Per-user unread notification counters.
+
+The badge count is read from `notification_counters` instead of counting
+notification rows. Every write that changes what is unread adjusts the
+counter in the same transaction:
+
+* fan_out / notify_user add one per recipient,
+* marking read or deleting an unread notification subtracts one,
+* marking all as read resets the counter to zero.
+
+Counters are upserted, so concurrent writers (including two requests
+creating the same user's first counter) add up instead of failing or
+overwriting each other. A counter can still drift, e.g. when a decrement
+is clamped at zero, so the periodic "reconcile_unread_counts" job
+recounts and corrects every counter.
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable
+
+from sqlalchemy import case, func, literal, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.notification import Notification
+from app.models.notification_counter import NotificationCounter
+from app.services.jobs import job
+
+
+def add_unread(db: Session, user_ids: Iterable[int]):
+    """Count one new unread notification for each id (repeated ids count again)."""
+    adjust_unread(db, Counter(user_ids))
+
+
+def adjust_unread(db: Session, deltas: Dict[int, int]):
+    """Add `deltas[user_id]` to each user's counter, never below zero.
+
+    Missing counters are created by the same upsert, so a concurrent
+    transaction creating a user's first counter is added to rather than
+    raising a unique violation.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    now = datetime.utcnow()
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    # One statement per distinct delta (a fan-out has a single one)
+    by_delta: Dict[int, list] = {}
+    for user_id, delta in sorted(deltas.items()):
+        by_delta.setdefault(delta, []).append(user_id)
+    for delta, user_ids in by_delta.items():
+        unread = NotificationCounter.unread + delta
+        statement = dialect.insert(NotificationCounter).values([
+            {"user_id": user_id, "unread": max(delta, 0), "updated_at": now} for user_id in user_ids
+        ])
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[NotificationCounter.user_id],
+            set_={"unread": case((unread < 0, 0), else_=unread), "updated_at": statement.excluded.updated_at},
+        ))
+
+
+def reset_unread(db: Session, user_id: int):
+    """Set a user's counter to zero (everything was marked read)."""
+    db.execute(
+        update(NotificationCounter)
+        .where(NotificationCounter.user_id == user_id)
+        .values(unread=0, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def count_unread(db: Session, user_id: int) -> int:
+    """Count unread notifications from the rows themselves (the slow path)."""
+    return db.scalar(
+        select(func.count()).select_from(Notification)
+        .where(Notification.user_id == user_id, Notification.is_read == False)
+    )
+
+
+@job("reconcile_unread_counts", every=settings.NOTIFICATION_COUNTER_RECONCILE_SECONDS)
+def reconcile_unread_counts(db: Session) -> int:
+    """Recount every user's unread notifications and fix drifted counters.
+
+    Rows and counters are read by one statement, so both come from the same
+    snapshot even under READ COMMITTED, and corrections are applied as
+    deltas, so writes committed while the recount runs are not lost.
+    Returns the number of counters corrected.
+    """
+    counts = union_all(
+        select(Notification.user_id, func.count().label("actual"), literal(0).label("stored"))
+        .where(Notification.is_read == False)
+        .group_by(Notification.user_id),
+        select(NotificationCounter.user_id, literal(0), NotificationCounter.unread),
+    ).subquery()
+    deltas = dict(db.execute(
+        select(counts.c.user_id, func.sum(counts.c.actual) - func.sum(counts.c.stored))
+        .group_by(counts.c.user_id)
+    ).all())
+    adjust_unread(db, deltas)
+    return sum(1 for delta in deltas.values() if delta)
@@ -0,0 +1,84 @@
+"""Notification retention.
+
+The periodic "purge_notifications" job removes notifications that were
+read more than NOTIFICATION_RETENTION_DAYS ago, and unread ones older than
+NOTIFICATION_UNREAD_RETENTION_DAYS (0 keeps unread notifications forever).
+With NOTIFICATION_RETENTION_MODE "archive" the rows are first copied to
+`notifications_archive`; with "delete" they are dropped.
+
+Rows go in batches of NOTIFICATION_PURGE_BATCH_SIZE, each in its own short
+transaction, so the sweep never holds long locks on the inbox table.
+Keeping each user's history bounded is what keeps the inbox index
+(user_id, is_read, created_at) small and the inbox queries fast.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, insert, literal, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.notification import Notification, ArchivedNotification
+from app.services.jobs import job
+from app.services.notification_counters import adjust_unread
+
+ARCHIVED_COLUMNS = [
+    "id", "title", "message", "type", "is_read", "digest_count", "user_id",
+    "schedule_entry_id", "change_request_id", "created_at", "read_at",
+]
+
+
+def expired_notifications(now: datetime):
+    """Condition matching notifications past their retention period."""
+    read_cutoff = now - timedelta(days=settings.NOTIFICATION_RETENTION_DAYS)
+    # read_at is missing on rows marked read before it was recorded
+    expired = and_(
+        Notification.is_read == True,
+        or_(Notification.read_at < read_cutoff,
+            and_(Notification.read_at.is_(None), Notification.created_at < read_cutoff)),
+    )
+    if settings.NOTIFICATION_UNREAD_RETENTION_DAYS > 0:
+        unread_cutoff = now - timedelta(days=settings.NOTIFICATION_UNREAD_RETENTION_DAYS)
+        expired = or_(expired, Notification.created_at < unread_cutoff)
+    return expired
+
+
+def purge_batch(db: Session, now: datetime) -> int:
+    """Archive (or delete) one batch of expired notifications; returns its size."""
+    rows = db.execute(
+        select(Notification.id, Notification.user_id, Notification.is_read)
+        .where(expired_notifications(now))
+        .order_by(Notification.created_at, Notification.id)
+        .limit(settings.NOTIFICATION_PURGE_BATCH_SIZE)
+    ).all()
+    if not rows:
+        return 0
+    
+    ids = [row.id for row in rows]
+    if settings.NOTIFICATION_RETENTION_MODE == "archive":
+        db.execute(insert(ArchivedNotification).from_select(
+            ARCHIVED_COLUMNS + ["archived_at"],
+            select(
+                *[Notification.__table__.c[name] for name in ARCHIVED_COLUMNS],
+                literal(now, ArchivedNotification.__table__.c.archived_at.type),
+            ).where(Notification.id.in_(ids)),
+        ))
+    db.execute(delete(Notification).where(Notification.id.in_(ids)))
+    
+    # Expired unread notifications still count towards the badge
+    unread = Counter(row.user_id for row in rows if not row.is_read)
+    adjust_unread(db, {user_id: -count for user_id, count in unread.items()})
+    return len(rows)
+
+
+@job("purge_notifications", every=settings.NOTIFICATION_PURGE_INTERVAL_SECONDS)
+def purge_notifications(db: Session) -> int:
+    """Sweep all expired notifications, committing after every batch."""
+    now = datetime.utcnow()
+    purged = 0
+    while True:
+        batch = purge_batch(db, now)
+        db.commit()
+        purged += batch
+        if batch < settings.NOTIFICATION_PURGE_BATCH_SIZE:
+            return purged
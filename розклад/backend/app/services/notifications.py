@@ -0,0 +1,293 @@
+"""Set-based notification fan-out.
+
+Recipients are selected and notifications written by a single
+INSERT ... SELECT per audience, so notifying a whole group or every admin
+costs the same few statements (the insert, the digest update and the
+unread counter update, see app.services.notification_counters) regardless
+of how many users it reaches, and no User or Notification objects are
+built in Python. The (role, group_id) index on users serves the recipient
+lookups. Inserts run in the caller's transaction; the caller commits.
+
+New notifications are pushed to the recipients' open streams
+(app.core.events) once the transaction commits.
+
+Bursts can be coalesced: a user who opts into digests (users get one
+notification per event by default) gets one notification per type and
+NOTIFICATION_COALESCE_SECONDS window, extended with every further message,
+instead of one row per change.
+
+The change-request notifications below run as background jobs
+(app.services.job_handlers), so an approval does not wait for its
+fan-out.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import String, cast, false, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.events import publish_event
+from app.models.user import User, UserRole
+from app.models.notification import Notification, NotificationType, NotificationDelivery
+from app.models.change_request import ChangeRequest, ChangeRequestStatus
+from app.models.schedule import ScheduleEntry
+from app.models.subject import Subject
+from app.services.notification_counters import add_unread
+
+ADMIN_ROLES = (UserRole.SUPER_ADMIN, UserRole.ADMIN)
+
+# Titles of coalesced notifications, followed by the count
+DIGEST_TITLES = {
+    NotificationType.SCHEDULE_CHANGE: "Schedule changes",
+    NotificationType.SUBSTITUTION: "Substitutions",
+    NotificationType.CANCELLATION: "Cancellations",
+    NotificationType.RESCHEDULE: "Reschedules",
+    NotificationType.CLASSROOM_CHANGE: "Classroom changes",
+    NotificationType.CHANGE_REQUEST_UPDATE: "Change request updates",
+}
+
+# Characters of the message pushed to streams; the list has the full text
+PUSH_MESSAGE_LENGTH = 500
+
+
+def fan_out(
+    db: Session,
+    recipients,
+    title: str,
+    message: str,
+    type: NotificationType,
+    schedule_entry_id: Optional[int] = None,
+    change_request_id: Optional[int] = None,
+) -> int:
+    """Notify every user selected by `recipients`.
+
+    `recipients` is a select() of a single user id column. Recipients who
+    prefer digests and still have an unread notification of this type from
+    the coalescing window get it extended instead of a new row. Returns the
+    number of notifications written.
+    """
+    recipients = recipients.subquery()
+    columns = Notification.__table__.c
+    created_at = datetime.utcnow()
+    refs = {"schedule_entry_id": schedule_entry_id, "change_request_id": change_request_id}
+    
+    open_digests = None
+    if settings.NOTIFICATION_COALESCE_SECONDS > 0:
+        open_digests = open_digest_ids(recipients, type, created_at)
+        coalesce(db, open_digests, message, type, refs)
+    
+    rows = select(
+        recipients.c[0],
+        literal(title, columns.title.type),
+        literal(message, columns.message.type),
+        literal(type, columns.type.type),
+        false(),
+        literal(schedule_entry_id, columns.schedule_entry_id.type),
+        literal(change_request_id, columns.change_request_id.type),
+        literal(created_at, columns.created_at.type),
+    )
+    if open_digests is not None:
+        rows = rows.where(recipients.c[0].not_in(
+            select(Notification.user_id).where(Notification.id.in_(open_digests))
+        ))
+    written = db.execute(
+        insert(Notification).from_select(
+            ["user_id", "title", "message", "type", "is_read",
+             "schedule_entry_id", "change_request_id", "created_at"],
+            rows,
+        ).returning(Notification.user_id, Notification.id)
+    ).all()
+    add_unread(db, [user_id for user_id, _ in written])
+    
+    # Extended digests are already counted and shown as unread; only new rows are pushed
+    if written:
+        data = push_data(title, message, type, created_at, **refs)
+        publish_event(db, {"type": "notification", "data": data, "recipients": [list(row) for row in written]})
+    return len(written)
+
+
+def open_digest_ids(recipients, type: NotificationType, now: datetime):
+    """Select the latest unread notification of `type` within the coalescing
+    window of each recipient who prefers digests."""
+    window_start = now - timedelta(seconds=settings.NOTIFICATION_COALESCE_SECONDS)
+    digest_users = select(User.id).where(
+        User.id.in_(select(recipients.c[0])),
+        User.notification_delivery == NotificationDelivery.DIGEST,
+    )
+    return (
+        select(func.max(Notification.id))
+        .where(
+            Notification.user_id.in_(digest_users),
+            Notification.type == type,
+            Notification.is_read == False,
+            Notification.created_at >= window_start,
+        )
+        .group_by(Notification.user_id)
+    )
+
+
+def coalesce(db: Session, open_digests, message: str, type: NotificationType, refs: dict) -> int:
+    """Append `message` to the open digests; returns how many were extended.
+
+    The window is anchored at the digest's first notification, so a digest
+    closes NOTIFICATION_COALESCE_SECONDS after it was created.
+    """
+    count = Notification.digest_count + 1
+    result = db.execute(
+        update(Notification)
+        .where(Notification.id.in_(open_digests))
+        .values(
+            digest_count=count,
+            title=literal(DIGEST_TITLES[type] + " (") + cast(count, String) + literal(")"),
+            message=Notification.message + literal("\n") + literal(message),
+            **refs,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def users_with_role(roles: Iterable[UserRole], group_ids: Optional[Iterable[int]] = None):
+    """Recipient select: users with one of `roles`, optionally in `group_ids`."""
+    query = select(User.id).where(User.role.in_(list(roles)))
+    if group_ids is not None:
+        query = query.where(User.group_id.in_(list(group_ids)))
+    return query
+
+
+def notify_user(db: Session, user_id: int, title: str, message: str, type: NotificationType, **refs):
+    """Notify a single user without loading the user."""
+    fan_out(db, select(User.id).where(User.id == user_id), title, message, type, **refs)
+
+
+def push_data(
+    title: str,
+    message: str,
+    type: NotificationType,
+    created_at: datetime,
+    schedule_entry_id: Optional[int] = None,
+    change_request_id: Optional[int] = None,
+) -> dict:
+    """Pushed notification fields, as in NotificationInDB (the id is added per recipient).
+
+    Long messages are cut to PUSH_MESSAGE_LENGTH characters, which keeps
+    the event within a NOTIFY payload.
+    """
+    return {
+        "title": title,
+        "message": message if len(message) <= PUSH_MESSAGE_LENGTH else message[:PUSH_MESSAGE_LENGTH - 1] + "…",
+        "type": type.value,
+        "is_read": False,
+        "created_at": created_at.isoformat(),
+        "read_at": None,
+        "digest_count": 1,
+        "schedule_entry_id": schedule_entry_id,
+        "change_request_id": change_request_id,
+    }
+
+
+def notify_admins_of_new_request(db: Session, change_request: ChangeRequest):
+    """Notify all admins of a new change request."""
+    fan_out(
+        db,
+        users_with_role(ADMIN_ROLES),
+        title="New Change Request",
+        message=f"A new change request has been submitted: {change_request.change_type.value}",
+        type=NotificationType.CHANGE_REQUEST_UPDATE,
+        change_request_id=change_request.id
+    )
+
+
+def notify_users_of_change(db: Session, change_request: ChangeRequest):
+    """Notify relevant users when a change request is processed."""
+    entry = db.execute(
+        select(ScheduleEntry.id, ScheduleEntry.group_id, Subject.name.label("subject_name"))
+        .join(Subject, Subject.id == ScheduleEntry.subject_id)
+        .where(ScheduleEntry.id == change_request.schedule_entry_id)
+    ).first()
+    
+    if not entry:
+        return
+    
+    # Notify the requester
+    if change_request.created_by:
+        notify_user(
+            db,
+            change_request.created_by,
+            title=f"Change Request {change_request.status.value.title()}",
+            message=f"Your change request has been {change_request.status.value}",
+            type=NotificationType.CHANGE_REQUEST_UPDATE,
+            change_request_id=change_request.id
+        )
+    
+    # If approved, notify students in the group
+    if change_request.status == ChangeRequestStatus.APPROVED:
+        fan_out(
+            db,
+            users_with_role([UserRole.STUDENT], group_ids=[entry.group_id]),
+            title="Schedule Change",
+            message=f"Your {entry.subject_name} class has been {change_request.change_type.value}",
+            type=NotificationType.SCHEDULE_CHANGE,
+            schedule_entry_id=entry.id
+        )
+
+
+def notify_batch_processed(db: Session, change_requests: List[ChangeRequest]):
+    """Notify the users affected by a batch of processed change requests.
+
+    Requesters get one fan-out per decision and students one per group,
+    listing every approved change of the group's classes, so the number of
+    statements does not grow with the size of the batch.
+    """
+    if not change_requests:
+        return
+    single = change_requests[0].id if len(change_requests) == 1 else None
+    
+    # Notify the requesters
+    requesters = defaultdict(set)
+    for change_request in change_requests:
+        if change_request.created_by:
+            requesters[change_request.status].add(change_request.created_by)
+    for status, user_ids in requesters.items():
+        fan_out(
+            db,
+            select(User.id).where(User.id.in_(sorted(user_ids))),
+            title=f"Change Request {status.value.title()}",
+            message=f"Your change request has been {status.value}",
+            type=NotificationType.CHANGE_REQUEST_UPDATE,
+            change_request_id=single
+        )
+    
+    # Notify students of the groups whose classes changed (an entry can
+    # have several approved requests in one batch)
+    approved = defaultdict(list)
+    for change_request in change_requests:
+        if change_request.status == ChangeRequestStatus.APPROVED:
+            approved[change_request.schedule_entry_id].append(change_request)
+    if not approved:
+        return
+    entries = db.execute(
+        select(ScheduleEntry.id, ScheduleEntry.group_id, Subject.name.label("subject_name"))
+        .join(Subject, Subject.id == ScheduleEntry.subject_id)
+        .where(ScheduleEntry.id.in_(list(approved)))
+        .order_by(ScheduleEntry.id)
+    ).all()
+    changes = defaultdict(list)
+    for entry in entries:
+        changes[entry.group_id].append(entry)
+    for group_id, group_entries in changes.items():
+        fan_out(
+            db,
+            users_with_role([UserRole.STUDENT], group_ids=[group_id]),
+            title="Schedule Change",
+            message="\n".join(
+                f"Your {entry.subject_name} class has been {change_request.change_type.value}"
+                for entry in group_entries
+                for change_request in approved[entry.id]
+            ),
+            type=NotificationType.SCHEDULE_CHANGE,
+            schedule_entry_id=group_entries[0].id if len(group_entries) == 1 else None
+        )
+
@@ -0,0 +1,91 @@
+"""Refresh token rotation.
+
+Every refresh token is single-use: redeeming it records its id in
+`revoked_tokens` and returns a new pair from the same family. Presenting a
+token a second time means it leaked (or two clients share it), so the
+whole family is revoked and the user must log in again. Only revoked ids
+that have not expired yet are kept, which keeps the set small.
+"""
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.principals import load_principal, principal_claims
+from app.core.security import create_access_token, create_refresh_token, decode_refresh_token
+from app.models.revoked_token import RevokedToken
+
+PURGE_INTERVAL_SECONDS = 3600
+_last_purge = 0.0
+
+
+def issue_tokens(user, family: Optional[str] = None) -> dict:
+    """Access and refresh token for a User or Principal."""
+    claims = {"sub": str(user.id)}
+    expires_delta = None
+    if settings.TOKEN_EMBED_CLAIMS:
+        claims.update(principal_claims(user))
+        # Embedded claims are not rechecked until the token expires
+        expires_delta = timedelta(minutes=settings.EMBEDDED_CLAIMS_TOKEN_EXPIRE_MINUTES)
+    return {
+        "access_token": create_access_token(data=claims, expires_delta=expires_delta),
+        "token_type": "bearer",
+        "refresh_token": create_refresh_token(user.id, family),
+    }
+
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> Optional[dict]:
+    """Redeem a refresh token for a new token pair; None if it is not usable."""
+    payload = decode_refresh_token(token)
+    if payload is None:
+        return None
+    await purge_expired_revocations(db)
+    if await db.get(RevokedToken, "fam:" + payload["fam"]):
+        return None
+
+    # The primary key makes redeeming atomic: of two concurrent uses one fails
+    db.add(RevokedToken(jti=payload["jti"], expires_at=datetime.utcfromtimestamp(payload["exp"])))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        await revoke_family(db, payload)
+        return None
+
+    user = await load_principal(db, int(payload["sub"]), fresh=True)
+    if user is None or not user.is_active:
+        return None
+    return issue_tokens(user, family=payload["fam"])
+
+
+async def revoke_refresh_token(db: AsyncSession, token: str) -> bool:
+    """Log out: revoke the family of a refresh token."""
+    payload = decode_refresh_token(token)
+    if payload is None:
+        return False
+    await revoke_family(db, payload)
+    return True
+
+
+async def revoke_family(db: AsyncSession, payload: dict):
+    # Tokens of the family expire at most one lifetime from now
+    expires_at = datetime.utcnow() + timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)
+    db.add(RevokedToken(jti="fam:" + payload["fam"], expires_at=expires_at))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+
+
+async def purge_expired_revocations(db: AsyncSession):
+    """Drop revocations of tokens that have expired anyway (hourly per worker)."""
+    global _last_purge
+    if time.monotonic() - _last_purge < PURGE_INTERVAL_SECONDS:
+        return
+    _last_purge = time.monotonic()
+    await db.execute(delete(RevokedToken).where(RevokedToken.expires_at < datetime.utcnow()))
+    await db.commit()
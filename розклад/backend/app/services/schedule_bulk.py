@@ -0,0 +1,105 @@
+from typing import Dict, Iterable, List, Sequence
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.models.schedule import ScheduleEntry
+from app.models.group import Group
+from app.models.subject import Subject
+from app.models.teacher import Teacher
+from app.models.classroom import Classroom
+from app.models.time_slot import TimeSlot
+from app.schemas.schedule import ScheduleEntryCreate
+from app.services.conflicts import (
+    PendingBookings, check_batch_item, conflict_detail, occupancy_index, track_booking
+)
+from app.services.schedule_versions import mark_entry_scopes
+
+REFERENCES = [
+    ("group_id", Group),
+    ("subject_id", Subject),
+    ("teacher_id", Teacher),
+    ("classroom_id", Classroom),
+]
+
+
+def _existing_ids(db: Session, model, ids: set) -> set:
+    if not ids:
+        return set()
+    return set(db.execute(select(model.id).where(model.id.in_(ids))).scalars())
+
+
+def bulk_create_entries(
+    db: Session,
+    entries: Sequence[ScheduleEntryCreate],
+    atomic: bool = False,
+    released_entry_ids: Iterable[int] = (),
+) -> dict:
+    """Validate a batch of schedule entries and insert the valid ones.
+
+    Foreign keys are checked with one IN query per referenced table, and
+    conflicts are checked against the occupancy index and against the
+    earlier items of the batch. Valid rows are written with a single
+    multi-row INSERT in the caller's transaction; the caller commits.
+    With `atomic`, nothing is inserted if any item fails.
+    `released_entry_ids` are entries the caller is removing in the same
+    transaction; their slots count as free.
+    """
+    errors: List[dict] = []
+
+    # Set-based reference checks
+    missing: Dict[str, set] = {}
+    for field, model in REFERENCES:
+        wanted = {getattr(entry, field) for entry in entries}
+        missing[field] = wanted - _existing_ids(db, model, wanted)
+    slot_ids = {entry.time_slot_id for entry in entries}
+    slot_rows = db.execute(
+        select(TimeSlot.id, TimeSlot.institution_id).where(TimeSlot.id.in_(slot_ids))
+    ).all()
+    occupancy_index.prime_slots(slot_rows)
+    missing["time_slot_id"] = slot_ids - {row.id for row in slot_rows}
+
+    pending = PendingBookings()
+    for institution_id in {row.institution_id for row in slot_rows}:
+        occupancy_index.ensure_loaded(db.connection(), institution_id)
+    for entry_id in released_entry_ids:
+        booking = occupancy_index.booking_of(entry_id)
+        if booking:
+            pending.release(booking)
+    valid = []
+    for index, entry in enumerate(entries):
+        unknown = [field for field, ids in missing.items() if getattr(entry, field) in ids]
+        if unknown:
+            errors.append({"index": index, "detail": f"Unknown {', '.join(unknown)}"})
+            continue
+        _, busy = check_batch_item(db, entry, pending)
+        if busy:
+            errors.append({"index": index, "detail": conflict_detail(busy)})
+            continue
+        valid.append(entry.dict())
+
+    if not valid or (atomic and errors):
+        return {"created": 0, "created_ids": [], "errors": errors}
+
+    # RETURNING carries the booking columns, so rows need not come back in order
+    created = db.execute(
+        insert(ScheduleEntry).returning(
+            ScheduleEntry.id,
+            ScheduleEntry.day_of_week,
+            ScheduleEntry.specific_date,
+            ScheduleEntry.status,
+            ScheduleEntry.time_slot_id,
+            ScheduleEntry.teacher_id,
+            ScheduleEntry.substitute_teacher_id,
+            ScheduleEntry.group_id,
+            ScheduleEntry.classroom_id,
+        ),
+        valid,
+    ).all()
+    connection = db.connection()
+    for row in created:
+        track_booking(db, row.id, occupancy_index.booking_for(connection, row))
+        mark_entry_scopes(db, row)
+
+    created_ids = sorted(row.id for row in created)
+    return {"created": len(created_ids), "created_ids": created_ids, "errors": errors}
@@ -0,0 +1,56 @@
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, aliased
+
+from app.models.schedule import ScheduleEntry
+from app.models.group import Group
+from app.models.subject import Subject
+from app.models.teacher import Teacher
+from app.models.classroom import Classroom
+from app.models.time_slot import TimeSlot
+
+SubstituteTeacher = aliased(Teacher)
+
+
+def schedule_details_query():
+    """Select every ScheduleEntryWithDetails field in a single joined query.
+
+    Columns are projected directly instead of loading ORM objects, so a
+    listing costs one round trip regardless of the number of entries.
+    """
+    return (
+        select(
+            *ScheduleEntry.__table__.c,
+            Group.name.label("group_name"),
+            Subject.name.label("subject_name"),
+            Teacher.full_name.label("teacher_name"),
+            Classroom.name.label("classroom_name"),
+            TimeSlot.name.label("time_slot_name"),
+            TimeSlot.start_time,
+            TimeSlot.end_time,
+            SubstituteTeacher.full_name.label("substitute_teacher_name"),
+        )
+        .join(Group, Group.id == ScheduleEntry.group_id)
+        .join(Subject, Subject.id == ScheduleEntry.subject_id)
+        .join(Teacher, Teacher.id == ScheduleEntry.teacher_id)
+        .join(Classroom, Classroom.id == ScheduleEntry.classroom_id)
+        .join(TimeSlot, TimeSlot.id == ScheduleEntry.time_slot_id)
+        .outerjoin(SubstituteTeacher, SubstituteTeacher.id == ScheduleEntry.substitute_teacher_id)
+    )
+
+
+def row_to_details(row) -> dict:
+    """Convert a row of schedule_details_query() to a ScheduleEntryWithDetails dict."""
+    details = dict(row._mapping)
+    details["start_time"] = str(details["start_time"])
+    details["end_time"] = str(details["end_time"])
+    return details
+
+
+def fetch_entry_details(db: Session, entry_id: int) -> Optional[dict]:
+    """Load a single schedule entry with details, or None if it does not exist."""
+    row = db.execute(
+        schedule_details_query().where(ScheduleEntry.id == entry_id)
+    ).first()
+    return row_to_details(row) if row else None
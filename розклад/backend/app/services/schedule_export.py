@@ -0,0 +1,140 @@
+"""Institution timetable as a spreadsheet grid.
+
+One row per group and day, one column per period. Entries are read with
+the joined details query in grid order and fetched EXPORT_FETCH_SIZE rows
+at a time (yield_per), and each grid row is written out as soon as it is
+complete, so memory stays flat whatever the size of the timetable:
+
+* CSV is streamed to the client row by row.
+* Excel workbooks are built with openpyxl in write-only mode, which keeps
+  finished rows in a temporary file, then sent from a spooled file.
+
+Names come from users, so cells that a spreadsheet would run as a formula
+are written as text: CSV cells get a leading apostrophe, Excel cells are
+typed as strings.
+"""
+import csv
+import io
+import tempfile
+from typing import Iterator, List
+
+from sqlalchemy import case, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.schedule import ScheduleEntry, DayOfWeek, ScheduleStatus
+from app.models.group import Group
+from app.models.time_slot import TimeSlot
+from app.services.schedule_details import schedule_details_query
+
+# Spooled workbooks stay in memory up to this size
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+CHUNK_SIZE = 64 * 1024
+
+# Leading characters that make a spreadsheet read a cell as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+# Several classes in one cell (normally prevented by the unique indexes)
+CELL_SEPARATOR = "; "
+
+DAY_ORDER = case(*[(ScheduleEntry.day_of_week == day, index) for index, day in enumerate(DayOfWeek)])
+
+
+def export_periods(db: Session, institution_id: int) -> List[tuple]:
+    """(time slot id, column title) of every period of an institution."""
+    slots = db.execute(
+        select(TimeSlot.id, TimeSlot.name, TimeSlot.start_time, TimeSlot.end_time)
+        .where(TimeSlot.institution_id == institution_id)
+        .order_by(TimeSlot.period_number, TimeSlot.id)
+    )
+    return [
+        (slot.id, f"{slot.name} ({slot.start_time:%H:%M}-{slot.end_time:%H:%M})")
+        for slot in slots
+    ]
+
+
+def grid_rows(db: Session, institution_id: int, periods: List[tuple]) -> Iterator[list]:
+    """Yield the header and then [group, day, cell per period] rows.
+
+    Covers the weekly (recurring) timetable; cancelled entries are left out
+    and substituted ones show the substitute teacher.
+    """
+    columns = {slot_id: index for index, (slot_id, _) in enumerate(periods)}
+    yield ["Group", "Day"] + [title for _, title in periods]
+
+    query = (
+        schedule_details_query()
+        .where(
+            Group.institution_id == institution_id,
+            ScheduleEntry.specific_date.is_(None),
+            ScheduleEntry.status != ScheduleStatus.CANCELLED,
+        )
+        .order_by(Group.name, Group.id, DAY_ORDER, TimeSlot.period_number)
+        .execution_options(yield_per=settings.EXPORT_FETCH_SIZE)
+    )
+    current, cells = None, None
+    for row in db.execute(query):
+        key = (row.group_id, row.day_of_week)
+        if key != current:
+            if current is not None:
+                yield cells
+            current = key
+            cells = [row.group_name, row.day_of_week.value.title()] + [None] * len(periods)
+        if row.time_slot_id in columns:
+            teacher = row.substitute_teacher_name or row.teacher_name
+            text = f"{row.subject_name}, {teacher}, {row.classroom_name}"
+            column = 2 + columns[row.time_slot_id]
+            cells[column] = text if cells[column] is None else cells[column] + CELL_SEPARATOR + text
+    if current is not None:
+        yield cells
+
+
+def csv_cell(value):
+    """Prefix text that a spreadsheet would evaluate with an apostrophe."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def export_csv(rows: Iterator[list]) -> Iterator[bytes]:
+    """Encode grid rows as CSV, one row at a time (UTF-8 with BOM for Excel)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    yield "\ufeff".encode()
+    for row in rows:
+        writer.writerow([csv_cell(value) for value in row])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def export_xlsx(rows: Iterator[list]):
+    """Write grid rows to a workbook; returns the file positioned at its start."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    def text_cell(value):
+        # openpyxl stores strings starting with "=" as formulas
+        if isinstance(value, str) and value.startswith("="):
+            cell = WriteOnlyCell(sheet, value)
+            cell.data_type = "s"
+            return cell
+        return value
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Timetable")
+    for row in rows:
+        sheet.append([text_cell(value) for value in row])
+    file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    workbook.save(file)
+    file.seek(0)
+    return file
+
+
+def read_chunks(file) -> Iterator[bytes]:
+    try:
+        while chunk := file.read(CHUNK_SIZE):
+            yield chunk
+    finally:
+        file.close()
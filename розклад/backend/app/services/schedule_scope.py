@@ -0,0 +1,78 @@
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_, true
+
+from app.models.schedule import ScheduleEntry
+
+
+@dataclass(frozen=True)
+class ScheduleScope:
+    """The effective filters of a schedule read after role scoping.
+
+    Each tuple is a conjunction: a student asking for another group's
+    timetable gets (own group, requested group) and therefore no rows.
+    Two requests with equal scopes return the same result.
+    """
+    group_ids: Tuple[int, ...] = ()
+    teacher_ids: Tuple[int, ...] = ()
+    classroom_ids: Tuple[int, ...] = ()
+    specific_date: Optional[date] = None
+
+    def conditions(self) -> list:
+        """The filters as a list of SQL conditions (all of which must hold)."""
+        conditions = [ScheduleEntry.group_id == group_id for group_id in self.group_ids]
+        for teacher_id in self.teacher_ids:
+            conditions.append(
+                or_(
+                    ScheduleEntry.teacher_id == teacher_id,
+                    ScheduleEntry.substitute_teacher_id == teacher_id
+                )
+            )
+        conditions += [ScheduleEntry.classroom_id == classroom_id for classroom_id in self.classroom_ids]
+        if self.specific_date:
+            conditions.append(ScheduleEntry.specific_date == self.specific_date)
+        return conditions
+
+    def condition(self):
+        """The filters as a single SQL condition."""
+        return and_(true(), *self.conditions())
+
+    def apply(self, query):
+        for condition in self.conditions():
+            query = query.where(condition)
+        return query
+
+    def version_keys(self) -> List[tuple]:
+        """Version counters whose values determine the result of this scope."""
+        keys = (
+            [("group", i) for i in self.group_ids]
+            + [("teacher", i) for i in self.teacher_ids]
+            + [("classroom", i) for i in self.classroom_ids]
+        )
+        return sorted(set(keys)) or [("all", 0)]
+
+
+def scope_for_user(user, group_id=None, teacher_id=None, classroom_id=None, specific_date=None) -> ScheduleScope:
+    """Combine role-based restrictions with the requested filters."""
+    group_ids, teacher_ids = [], []
+    
+    # Apply filters based on user role
+    if user.role == "student" and user.group_id:
+        group_ids.append(user.group_id)
+    elif user.role == "teacher" and user.teacher_id:
+        teacher_ids.append(user.teacher_id)
+    
+    # Apply additional filters
+    if group_id:
+        group_ids.append(group_id)
+    if teacher_id:
+        teacher_ids.append(teacher_id)
+    
+    return ScheduleScope(
+        group_ids=tuple(sorted(set(group_ids))),
+        teacher_ids=tuple(sorted(set(teacher_ids))),
+        classroom_ids=(classroom_id,) if classroom_id else (),
+        specific_date=specific_date,
+    )
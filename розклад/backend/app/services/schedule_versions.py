@@ -0,0 +1,234 @@
+"""Per-scope version counters for conditional schedule reads.
+
+Every group, teacher and classroom has a row in `schedule_versions` that is
+incremented in the same transaction as any schedule write touching it, so
+a client's ETag can be validated with one small query and no entry rows.
+
+* ORM writes of ScheduleEntry are picked up automatically at flush time,
+  including the old group/teacher/classroom of a moved entry.
+* Core writes (bulk inserts) must call `mark_entry_scopes`.
+* Renaming a group, subject, teacher, classroom or time slot changes the
+  joined names in every view, so it bumps the shared "reference" scope.
+* Unfiltered views depend on the "all" scope, bumped by every entry write.
+
+Cached responses are keyed by the ETag, so a bump makes them unreachable
+everywhere; committed scopes are also dropped from the local response
+cache right away to free the memory, and pushed to connected clients as
+"schedule_changed" events addressed to the institutions the scopes belong
+to. Reference changes written with Core statements name their institution
+through `mark_scopes(..., institution_id=...)`.
+"""
+import hashlib
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event, inspect, select, tuple_, union
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.schedule import ScheduleEntry
+from app.models.schedule_version import ScheduleVersion
+from app.models.group import Group
+from app.models.subject import Subject
+from app.models.teacher import Teacher
+from app.models.classroom import Classroom
+from app.models.time_slot import TimeSlot
+from app.core.cache import response_cache
+from app.core.events import publish_event
+from app.services.schedule_scope import ScheduleScope
+
+ALL_SCOPE = ("all", 0)
+REFERENCE_SCOPE = ("reference", 0)
+
+REFERENCE_MODELS = (Group, Subject, Teacher, Classroom, TimeSlot)
+
+# Models whose ids are the ids of a scope
+SCOPE_MODELS = {"group": Group, "teacher": Teacher, "classroom": Classroom}
+
+SCOPE_COLUMNS = [
+    ("group", "group_id"),
+    ("teacher", "teacher_id"),
+    ("teacher", "substitute_teacher_id"),
+    ("classroom", "classroom_id"),
+]
+
+
+def entry_scopes(values) -> Set[tuple]:
+    """Scopes whose views contain an entry with these attribute values."""
+    scopes = {ALL_SCOPE}
+    for scope, column in SCOPE_COLUMNS:
+        value = getattr(values, column, None)
+        if value is not None:
+            scopes.add((scope, value))
+    return scopes
+
+
+def mark_scopes(db: Session, scopes: Iterable[tuple], institution_id: Optional[int] = None):
+    """Schedule version bumps for `scopes` when the session commits.
+
+    Group, teacher and classroom scopes are traced back to their
+    institution; pass `institution_id` for the shared scopes.
+    """
+    db.info.setdefault("changed_scopes", set()).update(scopes)
+    if institution_id is not None:
+        db.info.setdefault("changed_institutions", set()).add(institution_id)
+
+
+def mark_entry_scopes(db: Session, values):
+    """Register an entry written with a Core statement (bypassing the ORM flush)."""
+    mark_scopes(db, entry_scopes(values))
+
+
+def bump_versions(db: Session, scopes: Iterable[tuple]):
+    """Increment the counters of `scopes`, creating missing ones.
+
+    One INSERT ... ON CONFLICT DO UPDATE, so concurrent first writes of a
+    scope both land instead of colliding on the primary key.
+    """
+    scopes = sorted(set(scopes))
+    if not scopes:
+        return
+    now = datetime.utcnow()
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(ScheduleVersion).values([
+        {"scope": scope, "scope_id": scope_id, "version": 1, "updated_at": now}
+        for scope, scope_id in scopes
+    ])
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[ScheduleVersion.scope, ScheduleVersion.scope_id],
+        set_={"version": ScheduleVersion.version + 1, "updated_at": statement.excluded.updated_at},
+    ))
+
+
+def scope_institutions(db: Session, scopes: Iterable[tuple]) -> Set[int]:
+    """Institutions of the group, teacher and classroom `scopes`."""
+    ids: Dict[str, Set[int]] = {}
+    for name, scope_id in scopes:
+        if name in SCOPE_MODELS:
+            ids.setdefault(name, set()).add(scope_id)
+    if not ids:
+        return set()
+    queries = [
+        select(SCOPE_MODELS[name].institution_id).where(SCOPE_MODELS[name].id.in_(sorted(values)))
+        for name, values in ids.items()
+    ]
+    return {institution_id for institution_id in db.scalars(union(*queries)) if institution_id is not None}
+
+
+def current_versions(db: Session, keys: List[tuple]) -> Dict[tuple, int]:
+    """Read the counters of `keys`; scopes never written are at version 0."""
+    key = tuple_(ScheduleVersion.scope, ScheduleVersion.scope_id)
+    rows = db.execute(
+        select(ScheduleVersion.scope, ScheduleVersion.scope_id, ScheduleVersion.version)
+        .where(key.in_(keys))
+    )
+    versions = {k: 0 for k in keys}
+    versions.update({(row.scope, row.scope_id): row.version for row in rows})
+    return versions
+
+
+def schedule_etag(db: Session, scope: ScheduleScope, *variant) -> str:
+    """Strong ETag of a schedule view.
+
+    Derived from the versions the view depends on plus everything else that
+    shapes the response (the effective filters and `variant`, e.g. paging).
+    """
+    keys = scope.version_keys() + [REFERENCE_SCOPE]
+    versions = current_versions(db, keys)
+    digest = hashlib.sha1(repr((scope, variant, sorted(versions.items()))).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def cache_tags(scope: ScheduleScope) -> List[str]:
+    """Response cache tags of a schedule view, one per version it depends on."""
+    return [f"{name}:{scope_id}" for name, scope_id in scope.version_keys() + [REFERENCE_SCOPE]]
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    """RFC 7232 If-None-Match check (weak comparison, as required for GET)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+# Collect the scopes touched by every ORM flush and bump them right before
+# the transaction commits, so the versions change atomically with the rows.
+
+def _old_scopes(obj) -> Set[tuple]:
+    state = inspect(obj)
+    scopes = set()
+    for scope, column in SCOPE_COLUMNS:
+        for value in state.attrs[column].history.deleted:
+            if value is not None:
+                scopes.add((scope, value))
+    return scopes
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_scope_changes(session, flush_context):
+    changed = set()
+    institutions = set()
+    for obj in session.new:
+        if isinstance(obj, ScheduleEntry):
+            changed |= entry_scopes(obj)
+        elif isinstance(obj, REFERENCE_MODELS):
+            changed.add(REFERENCE_SCOPE)
+            institutions.add(obj.institution_id)
+    for obj in session.dirty:
+        if isinstance(obj, ScheduleEntry) and session.is_modified(obj, include_collections=False):
+            changed |= entry_scopes(obj) | _old_scopes(obj)
+        elif isinstance(obj, REFERENCE_MODELS) and session.is_modified(obj, include_collections=False):
+            changed.add(REFERENCE_SCOPE)
+            institutions.add(obj.institution_id)
+    for obj in session.deleted:
+        if isinstance(obj, ScheduleEntry):
+            changed |= entry_scopes(obj)
+        elif isinstance(obj, REFERENCE_MODELS):
+            changed.add(REFERENCE_SCOPE)
+            institutions.add(obj.institution_id)
+    if changed:
+        mark_scopes(session, changed)
+    institutions.discard(None)
+    if institutions:
+        session.info.setdefault("changed_institutions", set()).update(institutions)
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_changed_scopes(session):
+    if session.in_nested_transaction():
+        return
+    # Flush first: commit's own flush runs after this hook
+    session.flush()
+    scopes = session.info.pop("changed_scopes", None)
+    institutions = session.info.pop("changed_institutions", set())
+    if scopes:
+        bump_versions(session, scopes)
+        session.info["committed_scopes"] = scopes
+        # Tell connected clients of these scopes to refetch
+        publish_event(session, {
+            "type": "schedule_changed",
+            "data": {"scopes": sorted([name, scope_id] for name, scope_id in scopes if name != "all")},
+            "scopes": [list(scope) for scope in scopes],
+            "institutions": sorted(institutions | scope_institutions(session, scopes)),
+        })
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_scopes(session):
+    if session.in_nested_transaction():
+        return
+    scopes = session.info.pop("committed_scopes", None)
+    if scopes:
+        response_cache.invalidate_tags(f"{name}:{scope_id}" for name, scope_id in scopes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_scope_changes(session):
+    if session.in_nested_transaction():
+        return
+    session.info.pop("changed_scopes", None)
+    session.info.pop("changed_institutions", None)
+    session.info.pop("committed_scopes", None)
@@ -0,0 +1,226 @@
+"""Timetable constraint solver.
+
+This module only works on plain data (dicts, tuples, sets) so it can run in
+worker processes. Loading the problem from the database and storing the
+result is done by app.services.timetable_generation.
+
+Hard constraints: a teacher, group or classroom is used at most once per
+(day, slot); the classroom type, capacity and equipment must suit the
+lesson; teachers are never placed on their `unavailable_days`.
+
+Soft constraints (minimised): classes before a teacher's
+`no_classes_before` (a `datetime.time`, like slot start times), days outside `preferred_days`, the same subject twice
+a day for a group, uneven daily load and late periods.
+
+The search is a randomised most-constrained-first greedy construction,
+restarted with different seeds until the time budget runs out. Each worker
+process runs its own restarts and the best result over all workers wins.
+"""
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import get_context
+from typing import Callable, Dict, List, Optional
+
+# Classroom types that suit each subject type when the curriculum does not
+# name one explicitly.
+ROOM_TYPES_FOR_SUBJECT = {
+    "lecture": ["lecture_hall", "regular"],
+    "seminar": ["regular", "lecture_hall"],
+    "practical": ["regular", "computer_lab", "lab"],
+    "lab": ["lab", "computer_lab"],
+    "gym": ["gym"],
+}
+
+EARLY_CLASS_PENALTY = 5.0
+NON_PREFERRED_DAY_PENALTY = 2.0
+REPEATED_SUBJECT_PENALTY = 3.0
+DAILY_LOAD_PENALTY = 1.0
+LATE_PERIOD_PENALTY = 0.1
+
+# A worker stops early once it has a complete timetable and this many
+# further restarts brought no improvement.
+STALL_ATTEMPTS = 200
+
+# Seconds between progress reports
+PROGRESS_INTERVAL = 1.0
+
+
+def expand_lessons(problem: dict) -> List[dict]:
+    """Turn curriculum items into one lesson per weekly occurrence, with candidate rooms."""
+    rooms = problem["rooms"]
+    lessons = []
+    for item_index, item in enumerate(problem["curriculum"]):
+        allowed_types = (
+            [item["classroom_type"]] if item.get("classroom_type")
+            else ROOM_TYPES_FOR_SUBJECT.get(item["subject_type"], [])
+        )
+        required = set(item.get("required_equipment") or [])
+        size = item.get("group_size") or 0
+        candidates = [
+            room["id"] for room in rooms
+            if room["type"] in allowed_types
+            and (room["capacity"] is None or room["capacity"] >= size)
+            and required <= set(room["equipment"] or [])
+        ]
+        # Prefer the smallest room that fits, then the preferred room type
+        candidates.sort(key=lambda room_id: (
+            allowed_types.index(problem["room_by_id"][room_id]["type"]),
+            problem["room_by_id"][room_id]["capacity"] or 0,
+        ))
+        for _ in range(item["lessons_per_week"]):
+            lessons.append({**item, "item_index": item_index, "rooms": candidates})
+    return lessons
+
+
+def construct(problem: dict, lessons: List[dict], rng: random.Random) -> dict:
+    """Build one timetable greedily; returns assignments, unplaced lessons and cost."""
+    busy = set(map(tuple, problem["fixed"]))
+    preferences = problem["teacher_preferences"]
+    slots = problem["slots"]
+    daily_load: Dict[tuple, int] = {}
+    subject_days = set()
+
+    # Most constrained first: fewest candidate rooms, then busiest teacher
+    teacher_load: Dict[int, int] = {}
+    for lesson in lessons:
+        teacher_load[lesson["teacher_id"]] = teacher_load.get(lesson["teacher_id"], 0) + 1
+    order = sorted(
+        lessons,
+        key=lambda l: (len(l["rooms"]), -teacher_load[l["teacher_id"]], rng.random()),
+    )
+
+    assignments, unplaced = [], []
+    total_cost = 0.0
+    for lesson in order:
+        if not lesson["rooms"]:
+            unplaced.append({**_lesson_ref(lesson), "reason": "No suitable classroom"})
+            continue
+
+        teacher, group = lesson["teacher_id"], lesson["group_id"]
+        prefs = preferences.get(str(teacher)) or preferences.get(teacher) or {}
+        best = None
+        for slot in slots:
+            day = slot["day"]
+            if day in prefs.get("unavailable_days", ()):
+                continue
+            key = (day, slot["time_slot_id"])
+            if (key + ("teacher", teacher)) in busy or (key + ("group", group)) in busy:
+                continue
+            room = next((r for r in lesson["rooms"] if (key + ("classroom", r)) not in busy), None)
+            if room is None:
+                continue
+
+            cost = LATE_PERIOD_PENALTY * slot["period_number"]
+            cost += DAILY_LOAD_PENALTY * daily_load.get((group, day), 0)
+            if (group, lesson["subject_id"], day) in subject_days:
+                cost += REPEATED_SUBJECT_PENALTY
+            if prefs.get("no_classes_before") and slot["start_time"] < prefs["no_classes_before"]:
+                cost += EARLY_CLASS_PENALTY
+            if prefs.get("preferred_days") and day not in prefs["preferred_days"]:
+                cost += NON_PREFERRED_DAY_PENALTY
+            # Random jitter breaks ties differently on every restart
+            cost += rng.random() * 0.5
+
+            if best is None or cost < best[0]:
+                best = (cost, slot, room)
+
+        if best is None:
+            unplaced.append({**_lesson_ref(lesson), "reason": "No free slot for teacher, group and classroom"})
+            continue
+
+        cost, slot, room = best
+        key = (slot["day"], slot["time_slot_id"])
+        busy.update({key + ("teacher", teacher), key + ("group", group), key + ("classroom", room)})
+        daily_load[(group, slot["day"])] = daily_load.get((group, slot["day"]), 0) + 1
+        subject_days.add((group, lesson["subject_id"], slot["day"]))
+        total_cost += cost
+        assignments.append({
+            "day_of_week": slot["day"],
+            "time_slot_id": slot["time_slot_id"],
+            "group_id": group,
+            "subject_id": lesson["subject_id"],
+            "teacher_id": teacher,
+            "classroom_id": room,
+        })
+
+    return {"entries": assignments, "unplaced": unplaced, "cost": round(total_cost, 2)}
+
+
+def _lesson_ref(lesson: dict) -> dict:
+    return {
+        "group_id": lesson["group_id"],
+        "subject_id": lesson["subject_id"],
+        "teacher_id": lesson["teacher_id"],
+    }
+
+
+def _better(candidate: dict, best: Optional[dict]) -> bool:
+    if best is None:
+        return True
+    return (len(candidate["unplaced"]), candidate["cost"]) < (len(best["unplaced"]), best["cost"])
+
+
+def search(
+    problem: dict,
+    seed: int,
+    deadline: float,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> dict:
+    """Run randomised restarts until `deadline` (epoch seconds) and return the best result.
+
+    `on_progress` is called with the elapsed share of the time budget at
+    most every PROGRESS_INTERVAL seconds.
+    """
+    rng = random.Random(seed)
+    lessons = expand_lessons(problem)
+    best, attempts, stalled = None, 0, 0
+    started = time.time()
+    next_report = started + PROGRESS_INTERVAL
+    while True:
+        result = construct(problem, lessons, rng)
+        attempts += 1
+        if _better(result, best):
+            best, stalled = result, 0
+        else:
+            stalled += 1
+        now = time.time()
+        if now >= deadline:
+            break
+        if on_progress and now >= next_report:
+            on_progress(min(0.99, (now - started) / (deadline - started)))
+            next_report = now + PROGRESS_INTERVAL
+        if not best["unplaced"] and stalled >= STALL_ATTEMPTS:
+            break
+    best["attempts"] = attempts
+    return best
+
+
+def solve(
+    problem: dict,
+    time_budget: float,
+    workers: int,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> dict:
+    """Search in `workers` processes for at most `time_budget` seconds."""
+    problem["room_by_id"] = {room["id"]: room for room in problem["rooms"]}
+    started = time.time()
+    deadline = started + time_budget
+
+    if workers <= 1:
+        return search(problem, seed=0, deadline=deadline, on_progress=on_progress)
+
+    best, attempts = None, 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        pending = {pool.submit(search, problem, seed, deadline) for seed in range(workers)}
+        while pending:
+            done, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                attempts += result["attempts"]
+                if _better(result, best):
+                    best = result
+            if on_progress:
+                on_progress(min(0.99, (time.time() - started) / time_budget))
+    best["attempts"] = attempts
+    return best
@@ -0,0 +1,280 @@
+"""Background timetable generation jobs.
+
+A job is stored in `timetable_jobs` so its progress can be polled from any
+worker, and solved by the durable job queue (app.services.jobs), so it
+survives restarts and can run in external workers: if the worker solving
+it dies, the queue hands the job to another worker, which starts over.
+The solver itself (app.services.solver) runs in a process pool; this
+module loads its input from the database and stores its output.
+"""
+import logging
+import os
+from datetime import datetime, time
+
+from sqlalchemy import select, union, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.schedule import ScheduleEntry, DayOfWeek, ScheduleStatus
+from app.models.group import Group
+from app.models.subject import Subject
+from app.models.teacher import Teacher
+from app.models.classroom import Classroom
+from app.models.time_slot import TimeSlot
+from app.models.change_request import ChangeRequest
+from app.models.notification import Notification
+from app.models.timetable_job import TimetableJob, TimetableJobStatus
+from app.schemas.schedule import ScheduleEntryCreate
+from app.schemas.timetable import TimetableGenerateRequest
+from app.services import solver
+from app.services.schedule_bulk import bulk_create_entries
+from app.services.conflicts import booking_guard
+from app.services.jobs import enqueue, extend_claim
+
+logger = logging.getLogger(__name__)
+
+DAY_ALIASES = {day.value[:3]: day.value for day in DayOfWeek}
+
+
+def _normalize_days(days) -> list:
+    """Accept "Mon", "monday" or "Monday" style day names from teacher preferences."""
+    normalized = []
+    for day in days or []:
+        value = DAY_ALIASES.get(str(day).strip().lower()[:3])
+        if value:
+            normalized.append(value)
+    return normalized
+
+
+def _parse_time(value, teacher_id: int):
+    """Parse a "HH:MM" time from teacher preferences."""
+    if not value:
+        return None
+    try:
+        return time.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f"Teacher {teacher_id} has an invalid no_classes_before time: {value!r}")
+
+
+def build_problem(db: Session, institution_id: int, request: TimetableGenerateRequest) -> dict:
+    """Load everything the solver needs as plain data."""
+    group_ids = {item.group_id for item in request.curriculum}
+    groups = {
+        g.id: g for g in db.execute(
+            select(Group.id, Group.student_count)
+            .where(Group.id.in_(group_ids), Group.institution_id == institution_id)
+        )
+    }
+    subjects = {
+        s.id: s.type.value for s in db.execute(
+            select(Subject.id, Subject.type).where(
+                Subject.id.in_({i.subject_id for i in request.curriculum}),
+                Subject.institution_id == institution_id,
+            )
+        )
+    }
+    teachers = db.execute(
+        select(Teacher.id, Teacher.preferences).where(Teacher.institution_id == institution_id)
+    ).all()
+    rooms = [
+        {"id": r.id, "type": r.type.value, "capacity": r.capacity, "equipment": r.equipment or []}
+        for r in db.execute(
+            select(Classroom.id, Classroom.type, Classroom.capacity, Classroom.equipment)
+            .where(Classroom.institution_id == institution_id)
+        )
+    ]
+    time_slots = db.execute(
+        select(TimeSlot.id, TimeSlot.period_number, TimeSlot.start_time)
+        .where(TimeSlot.institution_id == institution_id)
+        .order_by(TimeSlot.period_number)
+    ).all()
+
+    teacher_ids = {teacher.id for teacher in teachers}
+    missing = [
+        item for item in request.curriculum
+        if item.group_id not in groups or item.subject_id not in subjects or item.teacher_id not in teacher_ids
+    ]
+    if missing:
+        raise ValueError("Curriculum references unknown groups, subjects or teachers")
+
+    curriculum = [
+        {
+            "group_id": item.group_id,
+            "subject_id": item.subject_id,
+            "subject_type": subjects[item.subject_id],
+            "teacher_id": item.teacher_id,
+            "lessons_per_week": item.lessons_per_week,
+            "classroom_type": item.classroom_type.value if item.classroom_type else None,
+            "required_equipment": item.required_equipment,
+            "group_size": groups[item.group_id].student_count,
+        }
+        for item in request.curriculum
+    ]
+
+    teacher_preferences = {}
+    for teacher in teachers:
+        prefs = teacher.preferences or {}
+        teacher_preferences[teacher.id] = {
+            "unavailable_days": _normalize_days(prefs.get("unavailable_days")),
+            "preferred_days": _normalize_days(prefs.get("preferred_days")),
+            "no_classes_before": _parse_time(prefs.get("no_classes_before"), teacher.id),
+        }
+
+    slots = [
+        {
+            "day": day.value,
+            "time_slot_id": slot.id,
+            "period_number": slot.period_number,
+            "start_time": slot.start_time,
+        }
+        for day in request.days
+        for slot in time_slots
+    ]
+
+    # Recurring entries that stay in place are fixed occupancy for the solver
+    existing = select(
+        ScheduleEntry.day_of_week,
+        ScheduleEntry.time_slot_id,
+        ScheduleEntry.teacher_id,
+        ScheduleEntry.substitute_teacher_id,
+        ScheduleEntry.group_id,
+        ScheduleEntry.classroom_id,
+    ).join(TimeSlot, TimeSlot.id == ScheduleEntry.time_slot_id).where(
+        TimeSlot.institution_id == institution_id,
+        ScheduleEntry.specific_date.is_(None),
+        ScheduleEntry.status != ScheduleStatus.CANCELLED,
+    )
+    if request.replace_existing:
+        existing = existing.where(ScheduleEntry.group_id.not_in(group_ids))
+    fixed = []
+    for row in db.execute(existing):
+        day = row.day_of_week.value
+        fixed.append((day, row.time_slot_id, "teacher", row.substitute_teacher_id or row.teacher_id))
+        fixed.append((day, row.time_slot_id, "group", row.group_id))
+        fixed.append((day, row.time_slot_id, "classroom", row.classroom_id))
+
+    return {
+        "curriculum": curriculum,
+        "rooms": rooms,
+        "slots": slots,
+        "fixed": fixed,
+        "teacher_preferences": teacher_preferences,
+    }
+
+
+def start_generation_job(
+    db: Session, institution_id: int, user_id: int, request: TimetableGenerateRequest
+) -> TimetableJob:
+    """Store a new job and queue it for a background worker."""
+    job = TimetableJob(
+        institution_id=institution_id,
+        created_by=user_id,
+        params=request.model_dump(mode="json"),
+    )
+    db.add(job)
+    db.flush()
+    enqueue(db, "generate_timetable", timetable_job_id=job.id)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def run_generation_job(db: Session, job_id: int):
+    """Solve a stored job (the "generate_timetable" background job).
+
+    A job left RUNNING was being solved by a worker that died; it starts
+    over. Failures are recorded on the job and not retried.
+    """
+    try:
+        job = db.get(TimetableJob, job_id)
+        if job is None or job.status not in (TimetableJobStatus.PENDING, TimetableJobStatus.RUNNING):
+            return
+        request = TimetableGenerateRequest(**job.params)
+        job.status = TimetableJobStatus.RUNNING
+        job.started_at = datetime.utcnow()
+        job.progress = 0.0
+        db.commit()
+
+        problem = build_problem(db, job.institution_id, request)
+        db.commit()
+
+        def report(progress: float):
+            db.execute(update(TimetableJob).where(TimetableJob.id == job_id).values(progress=progress))
+            db.commit()
+
+        budget = min(request.time_budget_seconds, settings.SOLVER_MAX_TIME_BUDGET_SECONDS)
+        workers = settings.SOLVER_WORKERS or os.cpu_count() or 1
+        # The solve may outlast the queue's lock timeout
+        extend_claim(db, budget)
+        result = solver.solve(problem, budget, workers, on_progress=report)
+
+        job = db.get(TimetableJob, job_id)
+        job.result = result
+        job.progress = 1.0
+        job.status = TimetableJobStatus.COMPLETED
+        job.finished_at = datetime.utcnow()
+        db.commit()
+    except Exception as exc:
+        logger.exception("Timetable generation job %s failed", job_id)
+        db.rollback()
+        db.execute(update(TimetableJob).where(TimetableJob.id == job_id).values(
+            status=TimetableJobStatus.FAILED, error=str(exc), finished_at=datetime.utcnow()
+        ))
+        db.commit()
+
+
+def apply_generation_job(db: Session, job: TimetableJob) -> dict:
+    """Write a completed job's entries to the schedule in one transaction."""
+    request = TimetableGenerateRequest(**job.params)
+    entries = [ScheduleEntryCreate(**entry) for entry in job.result["entries"]]
+
+    with booking_guard(db):
+        replaced_ids = []
+        if request.replace_existing:
+            group_ids = {item.group_id for item in request.curriculum}
+            replaced = db.query(ScheduleEntry).filter(
+                ScheduleEntry.group_id.in_(group_ids),
+                ScheduleEntry.specific_date.is_(None),
+            ).all()
+            replaced_ids = [entry.id for entry in replaced]
+            referenced = set(db.scalars(union(
+                select(ChangeRequest.schedule_entry_id).where(ChangeRequest.schedule_entry_id.in_(replaced_ids)),
+                select(Notification.schedule_entry_id).where(Notification.schedule_entry_id.in_(replaced_ids)),
+            )))
+            # ORM delete/update so the occupancy index drops the entries on
+            # commit. Entries that change requests or notifications point at
+            # are cancelled instead, so those rows keep their reference.
+            for entry in replaced:
+                if entry.id in referenced:
+                    entry.status = ScheduleStatus.CANCELLED
+                else:
+                    db.delete(entry)
+            db.flush()
+
+        result = bulk_create_entries(db, entries, atomic=True, released_entry_ids=replaced_ids)
+        if result["errors"]:
+            db.rollback()
+            return result
+
+        job.status = TimetableJobStatus.APPLIED
+        db.commit()
+    return result
+
+
+def describe_job(job: TimetableJob) -> dict:
+    """Flatten a job and its stored result for TimetableJobInDB."""
+    result = job.result or {}
+    return {
+        "id": job.id,
+        "status": job.status,
+        "progress": job.progress or 0.0,
+        "institution_id": job.institution_id,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "cost": result.get("cost"),
+        "attempts": result.get("attempts"),
+        "entries": result.get("entries"),
+        "unplaced": result.get("unplaced"),
+    }
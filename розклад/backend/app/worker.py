@@ -0,0 +1,23 @@
+"""Standalone job worker: `python -m app.worker`.
+
+Use with JOB_WORKER_MODE=external so the API processes only enqueue jobs.
+Run as many workers as needed; each job is claimed by exactly one.
+"""
+import logging
+
+import app.models  # noqa: F401  (register every table with the mappers)
+import app.services.job_handlers  # noqa: F401  (register the handlers)
+from app.services.jobs import JobWorker
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    worker = JobWorker()
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Shared fixtures: the app runs against a throwaway SQLite database.
+
+Settings are read when `app` is first imported, so the environment is set
+up before any app module is loaded. Every test starts from empty tables
+and empty in-process caches.
+"""
+import os
+import tempfile
+from datetime import time
+from types import SimpleNamespace
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="rozklad-tests-"), "test.db")
+os.environ["JOB_WORKER_MODE"] = "external"
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ["EVENT_BROADCAST"] = "local"
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.main import app
+from app.database import Base, SessionLocal, engine, async_engine
+from app.core.cache import response_cache
+from app.core.principals import principal_cache
+from app.core.security import create_access_token, get_password_hash
+from app.models import Institution, TimeSlot, Group, Teacher, Classroom, Subject, User, ScheduleEntry
+from app.models.user import UserRole
+from app.services.conflicts import occupancy_index
+
+PASSWORD = "password"
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    occupancy_index.reset()
+    response_cache.clear()
+    principal_cache.clear()
+    yield
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def auth(user_id: int) -> dict:
+    return {"Authorization": "Bearer " + create_access_token({"sub": str(user_id)})}
+
+
+@pytest.fixture
+def seed(db):
+    """An institution with four periods, three groups, four teachers and
+    four classrooms, one subject, an admin, a teacher and six students."""
+    institution = Institution(name="School", type="school")
+    db.add(institution)
+    db.flush()
+    slots = [
+        TimeSlot(
+            name=f"Period {i}", period_number=i, start_time=time(8 + i), end_time=time(8 + i, 45),
+            institution_id=institution.id,
+        )
+        for i in range(1, 5)
+    ]
+    groups = [Group(name=f"G{i}", student_count=20, institution_id=institution.id) for i in range(3)]
+    teachers = [Teacher(full_name=f"Teacher {i}", institution_id=institution.id) for i in range(4)]
+    classrooms = [
+        Classroom(name=f"Room {i}", type="REGULAR", capacity=30, institution_id=institution.id) for i in range(4)
+    ]
+    subject = Subject(name="Math", type="LECTURE", institution_id=institution.id)
+    db.add_all(slots + groups + teachers + classrooms + [subject])
+    db.flush()
+
+    hashed = get_password_hash(PASSWORD)
+
+    def user(username, role, **fields):
+        return User(
+            email=f"{username}@example.com", username=username, hashed_password=hashed, full_name=username,
+            role=role, is_active=True, is_verified=True, institution_id=institution.id, **fields
+        )
+
+    admin = user("admin", UserRole.ADMIN)
+    teacher = user("teacher", UserRole.TEACHER, teacher_id=teachers[0].id)
+    students = [user(f"student{i}", UserRole.STUDENT, group_id=groups[i % 3].id) for i in range(6)]
+    db.add_all([admin, teacher] + students)
+    db.commit()
+    return SimpleNamespace(
+        institution=institution.id,
+        slots=[slot.id for slot in slots],
+        groups=[group.id for group in groups],
+        teachers=[teacher.id for teacher in teachers],
+        classrooms=[classroom.id for classroom in classrooms],
+        subject=subject.id,
+        admin=admin.id,
+        teacher_user=teacher.id,
+        students=[student.id for student in students],
+    )
+
+
+@pytest.fixture
+def admin_headers(seed):
+    return auth(seed.admin)
+
+
+@pytest.fixture
+def entry_data(seed):
+    """Build the JSON of a new schedule entry; index i picks group/teacher/classroom i."""
+
+    def build(day="monday", slot=0, index=0, **fields):
+        data = {
+            "day_of_week": day,
+            "group_id": seed.groups[index],
+            "subject_id": seed.subject,
+            "teacher_id": seed.teachers[index],
+            "classroom_id": seed.classrooms[index],
+            "time_slot_id": seed.slots[slot],
+        }
+        data.update(fields)
+        return data
+
+    return build
+
+
+@pytest.fixture
+def create_entry(client, admin_headers, entry_data):
+    """Create a schedule entry through the API and return its JSON."""
+
+    def create(**fields):
+        response = client.post("/api/v1/schedule/", json=entry_data(**fields), headers=admin_headers)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return create
+
+
+@pytest.fixture
+def statements():
+    """SQL statements executed by either engine while the test runs."""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    targets = [engine, async_engine.sync_engine]
+    for target in targets:
+        event.listen(target, "before_cursor_execute", record)
+    yield executed
+    for target in targets:
+        event.remove(target, "before_cursor_execute", record)
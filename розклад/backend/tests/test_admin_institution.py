@@ -0,0 +1,55 @@
+import pytest
+
+from conftest import auth
+from app.models import Institution, User
+from app.models.user import UserRole
+
+# Admin endpoints that work on one institution (`institution_id`, else the user's own)
+REPORTS = [
+    "/api/v1/analytics/workload",
+    "/api/v1/analytics/utilization",
+    "/api/v1/analytics/changes",
+    "/api/v1/schedule/export.csv",
+    "/api/v1/schedule/export.xlsx",
+]
+
+
+@pytest.fixture
+def other_institution(db):
+    institution = Institution(name="Other School", type="school")
+    db.add(institution)
+    db.commit()
+    return institution.id
+
+
+def user(db, role, institution_id=None):
+    account = User(
+        email=f"{role.value}@example.org", username=role.value, hashed_password="x", full_name=role.value,
+        role=role, is_active=True, institution_id=institution_id,
+    )
+    db.add(account)
+    db.commit()
+    return account.id
+
+
+@pytest.mark.parametrize("path", REPORTS)
+def test_admin_gets_reports_of_their_own_institution(client, seed, admin_headers, create_entry, path):
+    create_entry()
+
+    assert client.get(path, headers=admin_headers).status_code == 200
+    assert client.get(path, params={"institution_id": seed.institution}, headers=admin_headers).status_code == 200
+
+
+@pytest.mark.parametrize("path", REPORTS)
+def test_admin_cannot_name_another_institution(client, admin_headers, other_institution, path):
+    response = client.get(path, params={"institution_id": other_institution}, headers=admin_headers)
+
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize("path", REPORTS)
+def test_super_admin_names_the_institution(client, db, seed, other_institution, path):
+    headers = auth(user(db, UserRole.SUPER_ADMIN))
+
+    assert client.get(path, headers=headers).status_code == 400
+    assert client.get(path, params={"institution_id": other_institution}, headers=headers).status_code == 200
@@ -0,0 +1,146 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app.models import ChangeRequest, ScheduleEntry
+from app.models.change_request import ChangeRequestStatus, ChangeType
+from app.models.schedule import DayOfWeek, ScheduleStatus
+from app.services.analytics import gaps, weekday_counts
+
+
+def test_gaps_count_free_periods_between_lessons():
+    # One day, five periods, three resources
+    lessons = np.zeros((1, 5, 3), dtype=np.int32)
+    lessons[0, [0, 3], 0] = 1
+    lessons[0, [1, 2], 1] = 1
+
+    assert gaps(lessons).tolist() == [[2, 0, 0]]
+    assert gaps(np.zeros((7, 0, 2))).tolist() == [[0, 0]] * 7
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    # Monday to the Wednesday of the next week
+    (date(2026, 10, 19), date(2026, 10, 28), [2, 2, 2, 1, 1, 1, 1]),
+    # Saturday to Tuesday, across the weekend
+    (date(2026, 10, 24), date(2026, 10, 27), [1, 1, 0, 0, 0, 1, 1]),
+    (date(2026, 10, 22), date(2026, 10, 22), [0, 0, 0, 1, 0, 0, 0]),
+    (date(2026, 10, 19), date(2026, 11, 1), [2] * 7),
+])
+def test_weekday_counts_over_partial_weeks(start, end, expected):
+    assert weekday_counts(start, end).tolist() == expected
+
+
+@pytest.fixture
+def timetable(db, seed):
+    """Teacher 0 teaches group 0 on Monday periods 1 and 4 and Tuesday period 2;
+    teacher 2 substitutes teacher 1 with group 1 on Monday period 2; teacher 3
+    teaches group 2 on Saturday period 1. Slots last 45 minutes."""
+    def entry(day, slot, index, **fields):
+        return ScheduleEntry(
+            day_of_week=day, time_slot_id=seed.slots[slot], group_id=seed.groups[index], subject_id=seed.subject,
+            teacher_id=seed.teachers[index], classroom_id=seed.classrooms[index], **fields,
+        )
+
+    entries = [
+        entry(DayOfWeek.MONDAY, 0, 0),
+        entry(DayOfWeek.MONDAY, 3, 0),
+        entry(DayOfWeek.TUESDAY, 1, 0),
+        entry(DayOfWeek.MONDAY, 1, 1, substitute_teacher_id=seed.teachers[2], status=ScheduleStatus.SUBSTITUTED),
+        ScheduleEntry(
+            day_of_week=DayOfWeek.SATURDAY, time_slot_id=seed.slots[0], group_id=seed.groups[2],
+            subject_id=seed.subject, teacher_id=seed.teachers[3], classroom_id=seed.classrooms[2],
+        ),
+        # Not part of the weekly timetable
+        entry(DayOfWeek.WEDNESDAY, 0, 0, status=ScheduleStatus.CANCELLED),
+        entry(DayOfWeek.THURSDAY, 0, 0, specific_date=date(2026, 10, 22)),
+    ]
+    db.add_all(entries)
+    db.flush()
+
+    def change(entry, change_type, requested_date=date(2026, 10, 19), status=ChangeRequestStatus.APPROVED):
+        return ChangeRequest(
+            change_type=change_type, status=status, reason="Ill", requested_date=requested_date,
+            schedule_entry_id=entry.id, created_by=seed.teacher_user,
+        )
+
+    first, _, _, substituted = entries[:4]
+    db.add_all([
+        change(first, ChangeType.SUBSTITUTION),
+        change(first, ChangeType.CANCELLATION, date(2026, 10, 26)),
+        change(substituted, ChangeType.SUBSTITUTION),
+        # Not counted: pending, outside the range, other change types
+        change(first, ChangeType.CANCELLATION, status=ChangeRequestStatus.PENDING),
+        change(first, ChangeType.CANCELLATION, date(2026, 10, 28)),
+        change(first, ChangeType.CLASSROOM_CHANGE),
+    ])
+    db.commit()
+
+
+def report(client, admin_headers, name, **params):
+    response = client.get(f"/api/v1/analytics/{name}", params=params, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_workload_report(client, admin_headers, timetable):
+    workload = report(client, admin_headers, "workload")
+
+    teachers = {teacher["name"]: teacher for teacher in workload["teachers"]}
+    assert teachers["Teacher 0"] == {
+        **teachers["Teacher 0"],
+        "lessons_per_week": 3, "hours_per_week": 2.25, "days_per_week": 2, "max_lessons_per_day": 2, "gaps": 2,
+    }
+    # The substitute teaches the lesson
+    assert teachers["Teacher 1"]["lessons_per_week"] == 0
+    assert teachers["Teacher 2"]["lessons_per_week"] == 1 and teachers["Teacher 2"]["hours_per_week"] == 0.75
+    assert workload["average_teacher_lessons"] == 1.25
+    assert workload["teacher_lessons_stddev"] == round(float(np.std([3, 0, 1, 1])), 2)
+
+    groups = {group["name"]: group for group in workload["groups"]}
+    # Saturday has classes, so it is a working day; Sunday is not
+    assert groups["G0"]["lessons_per_day"] == {
+        "monday": 2, "tuesday": 1, "wednesday": 0, "thursday": 0, "friday": 0, "saturday": 0,
+    }
+    assert groups["G0"]["max_lessons_per_day"] == 2 and groups["G0"]["min_lessons_per_day"] == 0
+    assert groups["G0"]["gaps"] == 2
+    assert groups["G2"]["lessons_per_week"] == 1
+
+
+def test_utilization_report(client, admin_headers, timetable):
+    utilization = report(client, admin_headers, "utilization")
+
+    # Six working days of four periods
+    rooms = {room["name"]: (room["occupied_slots"], room["available_slots"], room["utilization"])
+             for room in utilization["classrooms"]}
+    assert rooms == {
+        "Room 0": (3, 24, 12.5), "Room 1": (1, 24, 4.2), "Room 2": (1, 24, 4.2), "Room 3": (0, 24, 0.0),
+    }
+    assert utilization["average_utilization"] == 5.2
+
+
+def test_change_report(client, admin_headers, timetable):
+    # Two Mondays and Tuesdays, one of every other weekday
+    changes = report(client, admin_headers, "changes", **{"from": "2026-10-19", "to": "2026-10-27"})
+
+    teachers = {teacher["name"]: teacher for teacher in changes["teachers"]}
+    assert {name: teacher["scheduled_lessons"] for name, teacher in teachers.items()} == {
+        "Teacher 0": 6, "Teacher 1": 2, "Teacher 2": 0, "Teacher 3": 1,
+    }
+    assert teachers["Teacher 0"]["substitutions"] == 1 and teachers["Teacher 0"]["cancellations"] == 1
+    assert teachers["Teacher 0"]["substitution_rate"] == 16.67
+    assert teachers["Teacher 1"]["substitution_rate"] == 50.0
+    assert teachers["Teacher 2"]["substitution_rate"] == 0.0
+    assert {key: changes[key] for key in (
+        "scheduled_lessons", "substitutions", "cancellations", "substitution_rate", "cancellation_rate",
+    )} == {
+        "scheduled_lessons": 9, "substitutions": 2, "cancellations": 1,
+        "substitution_rate": 22.22, "cancellation_rate": 11.11,
+    }
+
+
+def test_change_report_rejects_a_reversed_range(client, admin_headers, seed):
+    response = client.get(
+        "/api/v1/analytics/changes", params={"from": "2026-10-27", "to": "2026-10-19"}, headers=admin_headers,
+    )
+    assert response.status_code == 400
@@ -0,0 +1,30 @@
+import pytest
+
+# Two consecutive Mondays
+MONDAY, NEXT_MONDAY = "2026-10-19", "2026-10-26"
+
+
+def calendar(client, headers, group_id):
+    response = client.get(
+        "/api/v1/schedule/calendar",
+        params={"from": MONDAY, "to": NEXT_MONDAY, "group_id": group_id},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    return [(item["date"], item["time_slot_id"], item["recurring"], item["status"]) for item in response.json()]
+
+
+@pytest.mark.parametrize("status", ["substituted", "cancelled"])
+def test_dated_entry_replaces_the_weekly_class_on_its_date(client, seed, admin_headers, create_entry, status):
+    create_entry(slot=0)
+    create_entry(slot=1)
+
+    create_entry(slot=0, specific_date=MONDAY, teacher_id=seed.teachers[3], status=status)
+
+    first, second = seed.slots[:2]
+    assert calendar(client, admin_headers, seed.groups[0]) == [
+        (MONDAY, first, False, status),
+        (MONDAY, second, True, "scheduled"),
+        (NEXT_MONDAY, first, True, "scheduled"),
+        (NEXT_MONDAY, second, True, "scheduled"),
+    ]
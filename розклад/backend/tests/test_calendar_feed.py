@@ -0,0 +1,43 @@
+import re
+
+from app.models import User
+
+
+def feed_url(client, headers, group_id):
+    response = client.post(f"/api/v1/schedule/ics/group/{group_id}/token", headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["url"]
+
+
+def test_feed_declares_the_time_zone_of_its_times(client, seed, admin_headers, create_entry):
+    create_entry()
+
+    response = client.get(feed_url(client, admin_headers, seed.groups[0]))
+
+    assert response.status_code == 200, response.text
+    body = response.text
+    declared = re.findall(r"^TZID:(.+)\r$", body, re.M)
+    used = set(re.findall(r";TZID=([^:]+):", body))
+    assert len(declared) == 1 and used == set(declared)
+    assert body.index("BEGIN:VTIMEZONE") < body.index("BEGIN:VEVENT")
+
+
+def test_revoking_feed_links_invalidates_old_urls(client, seed, admin_headers, create_entry):
+    create_entry()
+    old = feed_url(client, admin_headers, seed.groups[0])
+
+    response = client.delete("/api/v1/schedule/ics/tokens", headers=admin_headers)
+    assert response.status_code == 200, response.text
+
+    assert client.get(old).status_code == 401
+    assert client.get(feed_url(client, admin_headers, seed.groups[0])).status_code == 200
+
+
+def test_feed_of_a_deactivated_user_is_rejected(client, db, seed, admin_headers, create_entry):
+    create_entry()
+    url = feed_url(client, admin_headers, seed.groups[0])
+
+    db.get(User, seed.admin).is_active = False
+    db.commit()
+
+    assert client.get(url).status_code == 401
@@ -0,0 +1,113 @@
+from datetime import date
+
+from sqlalchemy import select
+
+from app.models import ChangeRequest, Notification, ScheduleEntry
+from app.models.change_request import ChangeRequestStatus, ChangeType
+from app.models.notification import NotificationType
+from app.models.schedule import DayOfWeek, ScheduleStatus
+from app.services.conflicts import occupancy_index
+from app.services.jobs import run_pending_jobs
+
+
+def change_request(db, seed, entry_id, change_type, **fields):
+    request = ChangeRequest(
+        change_type=change_type, reason="Planned", requested_date=date(2026, 10, 19),
+        schedule_entry_id=entry_id, created_by=seed.teacher_user, **fields
+    )
+    db.add(request)
+    db.commit()
+    return request.id
+
+
+def approve(client, headers, ids, atomic=False):
+    response = client.post(
+        f"/api/v1/change-requests/batch?atomic={str(atomic).lower()}",
+        json=[{"id": request_id, "status": "approved"} for request_id in ids],
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_room_freed_by_a_cancellation_is_reassigned_in_the_same_batch(
+    client, db, seed, admin_headers, create_entry
+):
+    # The entry taking the room has the lower id, so a flush in primary-key
+    # order would write the move before the cancellation
+    moved = create_entry(index=0)
+    cancelled = create_entry(index=1)
+    move = change_request(
+        db, seed, moved["id"], ChangeType.CLASSROOM_CHANGE, new_classroom_id=seed.classrooms[1]
+    )
+    cancel = change_request(db, seed, cancelled["id"], ChangeType.CANCELLATION)
+
+    result = approve(client, admin_headers, [cancel, move])
+
+    assert result["processed"] == 2
+    assert [item["status"] for item in result["results"]] == ["approved", "approved"]
+    db.expire_all()
+    assert db.get(ScheduleEntry, moved["id"]).classroom_id == seed.classrooms[1]
+    assert db.get(ScheduleEntry, cancelled["id"]).status == ScheduleStatus.CANCELLED
+
+
+def test_atomic_failure_reports_the_other_items_as_rolled_back(
+    client, db, seed, admin_headers, create_entry
+):
+    first = create_entry(index=0)
+    second = create_entry(index=1)
+    cancel = change_request(db, seed, first["id"], ChangeType.CANCELLATION)
+    move = change_request(db, seed, second["id"], ChangeType.CLASSROOM_CHANGE, new_classroom_id=seed.classrooms[0])
+
+    result = approve(client, admin_headers, [cancel, move, cancel], atomic=True)
+
+    assert result["processed"] == 0
+    assert [item["status"] for item in result["results"]] == ["rolled_back", "rolled_back", "error"]
+    db.expire_all()
+    assert db.get(ChangeRequest, cancel).status == ChangeRequestStatus.PENDING
+    assert db.get(ScheduleEntry, first["id"]).status == ScheduleStatus.SCHEDULED
+    assert db.get(ScheduleEntry, second["id"]).classroom_id == seed.classrooms[1]
+
+
+def test_item_rejected_by_the_database_fails_alone(client, db, seed, admin_headers, create_entry):
+    moved = create_entry(index=0)
+    cancelled = create_entry(index=1)
+    # Another worker books room 2; this worker's loaded index does not know
+    other = ScheduleEntry(
+        day_of_week=DayOfWeek.MONDAY, time_slot_id=seed.slots[0], group_id=seed.groups[2], subject_id=seed.subject,
+        teacher_id=seed.teachers[2], classroom_id=seed.classrooms[2],
+    )
+    db.add(other)
+    db.commit()
+    occupancy_index.set_booking(other.id, None)
+    move = change_request(db, seed, moved["id"], ChangeType.CLASSROOM_CHANGE, new_classroom_id=seed.classrooms[2])
+    cancel = change_request(db, seed, cancelled["id"], ChangeType.CANCELLATION)
+
+    result = approve(client, admin_headers, [move, cancel])
+
+    assert result["processed"] == 1
+    assert [item["status"] for item in result["results"]] == ["error", "approved"]
+    assert "classroom" in result["results"][0]["detail"]
+    db.expire_all()
+    assert db.get(ChangeRequest, move).status == ChangeRequestStatus.PENDING
+    assert db.get(ScheduleEntry, moved["id"]).classroom_id == seed.classrooms[0]
+    assert db.get(ScheduleEntry, cancelled["id"]).status == ScheduleStatus.CANCELLED
+
+
+def test_students_hear_of_every_approved_change_of_an_entry(client, db, seed, admin_headers, create_entry):
+    entry = create_entry(index=0)
+    substitute = change_request(db, seed, entry["id"], ChangeType.SUBSTITUTION, new_teacher_id=seed.teachers[3])
+    move = change_request(db, seed, entry["id"], ChangeType.CLASSROOM_CHANGE, new_classroom_id=seed.classrooms[3])
+
+    assert approve(client, admin_headers, [substitute, move])["processed"] == 2
+    run_pending_jobs()
+
+    [message] = db.scalars(
+        select(Notification.message).where(
+            Notification.user_id == seed.students[0], Notification.type == NotificationType.SCHEDULE_CHANGE
+        )
+    ).all()
+    assert sorted(message.split("\n")) == [
+        "Your Math class has been classroom_change",
+        "Your Math class has been substitution",
+    ]
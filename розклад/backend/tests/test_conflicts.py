@@ -0,0 +1,204 @@
+from datetime import date, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.schedule import DayOfWeek, ScheduleEntry, ScheduleStatus
+from app.services.conflicts import booking_guard, occupancy_index
+
+# A Monday
+DATE = "2026-10-19"
+
+
+def post_entry(client, headers, entry_data, **fields):
+    return client.post("/api/v1/schedule/", json=entry_data(**fields), headers=headers)
+
+
+def test_weekly_double_booking_is_rejected(client, admin_headers, entry_data, create_entry):
+    create_entry()
+
+    response = post_entry(client, admin_headers, entry_data, index=1, teacher_id=entry_data()["teacher_id"])
+    assert response.status_code == 400
+    assert "teacher" in response.json()["detail"]
+
+
+def test_dated_substitution_replaces_the_weekly_class(client, seed, admin_headers, entry_data, create_entry):
+    create_entry()
+
+    response = post_entry(
+        client, admin_headers, entry_data,
+        specific_date=DATE, teacher_id=seed.teachers[3], status="substituted",
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "substituted"
+
+
+def test_dated_cancellation_replaces_the_weekly_class(client, db, admin_headers, entry_data, create_entry):
+    create_entry()
+
+    response = post_entry(client, admin_headers, entry_data, specific_date=DATE, status="cancelled")
+    assert response.status_code == 200, response.text
+    entry = db.get(ScheduleEntry, response.json()["id"])
+    assert entry.status == ScheduleStatus.CANCELLED
+
+
+def test_dated_entry_conflicts_with_weekly_classes_of_other_groups(
+    client, seed, admin_headers, entry_data, create_entry
+):
+    create_entry(index=0)
+
+    # Group 1 on the date, but with the teacher and room of group 0's weekly class
+    response = post_entry(
+        client, admin_headers, entry_data,
+        index=1, specific_date=DATE, teacher_id=seed.teachers[0], classroom_id=seed.classrooms[0],
+    )
+    assert response.status_code == 400
+    assert "teacher" in response.json()["detail"]
+    assert "classroom" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("reload", [False, True])
+def test_overridden_weekly_class_frees_its_resources(
+    client, seed, admin_headers, entry_data, create_entry, reload
+):
+    create_entry(index=0)
+    post_entry(client, admin_headers, entry_data, index=0, specific_date=DATE, status="cancelled")
+    if reload:
+        # Same answer from bookings loaded from the database
+        occupancy_index.reset()
+
+    # Group 0 has no class on the date, so its teacher and room are free
+    response = post_entry(
+        client, admin_headers, entry_data,
+        index=1, specific_date=DATE, teacher_id=seed.teachers[0], classroom_id=seed.classrooms[0],
+    )
+    assert response.status_code == 200, response.text
+
+
+def test_dated_entries_of_the_same_date_conflict(client, seed, admin_headers, entry_data):
+    assert post_entry(client, admin_headers, entry_data, index=0, specific_date=DATE).status_code == 200
+
+    response = post_entry(
+        client, admin_headers, entry_data, index=1, specific_date=DATE, classroom_id=seed.classrooms[0],
+    )
+    assert response.status_code == 400
+    assert "classroom" in response.json()["detail"]
+
+    # Another week is free
+    response = post_entry(
+        client, admin_headers, entry_data, index=1, specific_date="2026-10-26", classroom_id=seed.classrooms[0],
+    )
+    assert response.status_code == 200, response.text
+
+
+def test_bulk_create_accepts_overrides(client, seed, admin_headers, entry_data):
+    items = [
+        entry_data(index=0),
+        entry_data(index=0, specific_date=DATE, status="cancelled"),
+        entry_data(index=1, specific_date=DATE, teacher_id=seed.teachers[0]),
+        entry_data(index=2, specific_date=DATE, teacher_id=seed.teachers[0]),
+    ]
+    response = client.post("/api/v1/schedule/bulk", json=items, headers=admin_headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["created"] == 3
+    assert [error["index"] for error in result["errors"]] == [3]
+
+
+def next_monday(weeks=0):
+    today = date.today()
+    return (today + timedelta(days=7 - today.weekday() + 7 * weeks)).isoformat()
+
+
+def test_weekly_entry_conflicts_with_upcoming_dated_entries(client, seed, admin_headers, entry_data):
+    assert post_entry(client, admin_headers, entry_data, index=1, specific_date=next_monday(2)).status_code == 200
+
+    # Group 0 every Monday, with the teacher and room group 1 holds on one of them
+    response = post_entry(
+        client, admin_headers, entry_data,
+        index=0, teacher_id=seed.teachers[1], classroom_id=seed.classrooms[1],
+    )
+    assert response.status_code == 400
+    assert "teacher" in response.json()["detail"]
+    assert "classroom" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("reload", [False, True])
+def test_weekly_entry_skips_dates_its_group_replaces(client, seed, admin_headers, entry_data, reload):
+    monday = next_monday()
+    post_entry(client, admin_headers, entry_data, index=0, specific_date=monday, status="cancelled")
+    post_entry(client, admin_headers, entry_data, index=1, specific_date=monday)
+    if reload:
+        occupancy_index.reset()
+
+    # Group 0 has no class on that Monday, so group 1's dated booking is no conflict
+    response = post_entry(client, admin_headers, entry_data, index=0, teacher_id=seed.teachers[1])
+    assert response.status_code == 200, response.text
+
+
+def test_weekly_entry_ignores_past_dated_entries(client, seed, admin_headers, entry_data):
+    past = (date.today() - timedelta(days=date.today().weekday() + 7)).isoformat()
+    assert post_entry(client, admin_headers, entry_data, index=1, specific_date=past).status_code == 200
+
+    response = post_entry(client, admin_headers, entry_data, index=0, teacher_id=seed.teachers[1])
+    assert response.status_code == 200, response.text
+
+
+def direct_entry(seed, index=0, **fields):
+    """A schedule entry written straight through the ORM, skipping find_conflicts."""
+    values = dict(
+        day_of_week=DayOfWeek.MONDAY, time_slot_id=seed.slots[0], group_id=seed.groups[index],
+        subject_id=seed.subject, teacher_id=seed.teachers[index], classroom_id=seed.classrooms[index],
+    )
+    values.update(fields)
+    return ScheduleEntry(**values)
+
+
+@pytest.mark.parametrize("kind, clash", [
+    ("teacher", lambda seed: {"teacher_id": seed.teachers[0]}),
+    ("teacher", lambda seed: {"substitute_teacher_id": seed.teachers[0]}),
+    ("group", lambda seed: {"group_id": seed.groups[0]}),
+    ("classroom", lambda seed: {"classroom_id": seed.classrooms[0]}),
+], ids=["teacher", "substitute", "group", "classroom"])
+@pytest.mark.parametrize("specific_date", [None, date(2026, 10, 19)], ids=["weekly", "dated"])
+def test_unique_indexes_reject_double_bookings(db, seed, kind, clash, specific_date):
+    db.add(direct_entry(seed, specific_date=specific_date))
+    db.commit()
+
+    db.add(direct_entry(seed, index=1, specific_date=specific_date, **clash(seed)))
+    with pytest.raises(HTTPException) as exc_info:
+        with booking_guard(db):
+            db.commit()
+
+    assert exc_info.value.status_code == 400
+    assert kind in exc_info.value.detail
+    assert db.query(ScheduleEntry).count() == 1
+
+
+def test_cancelled_entries_leave_the_slot_free(db, seed):
+    db.add(direct_entry(seed, status=ScheduleStatus.CANCELLED))
+    db.add(direct_entry(seed))
+    db.commit()
+
+    assert db.query(ScheduleEntry).count() == 2
+
+
+def test_writes_past_a_stale_index_get_a_400(
+    client, db, seed, admin_headers, entry_data, create_entry, statements
+):
+    create_entry(index=0)
+    # Another worker books teacher 1; this worker's loaded index does not know
+    db.add(direct_entry(seed, index=2, teacher_id=seed.teachers[1]))
+    db.commit()
+    occupancy_index.set_booking(db.query(ScheduleEntry).filter_by(group_id=seed.groups[2]).one().id, None)
+
+    response = post_entry(client, admin_headers, entry_data, index=1)
+    assert response.status_code == 400
+    assert "teacher" in response.json()["detail"]
+
+    # The index was expired, so the next attempt is caught before the insert
+    statements.clear()
+    response = post_entry(client, admin_headers, entry_data, index=1)
+    assert response.status_code == 400
+    assert "teacher" in response.json()["detail"]
+    assert not [s for s in statements if s.startswith("INSERT INTO schedule_entries")]
@@ -0,0 +1,96 @@
+import asyncio
+import json
+from datetime import datetime, time
+from types import SimpleNamespace
+
+from app.core.events import NOTIFY_PAYLOAD_LIMIT, PostgresBroadcast, event_broker, notify_payloads
+from app.core.principals import Principal
+from app.models import Institution, TimeSlot, Group, Teacher, Classroom, Subject, ScheduleEntry
+from app.models.notification import NotificationType
+from app.models.schedule import DayOfWeek
+from app.models.user import UserRole
+from app.services.notifications import PUSH_MESSAGE_LENGTH, push_data
+
+
+def add_entry(db, institution_id):
+    """Book one class in a fresh group, teacher and classroom of the institution."""
+    slot = TimeSlot(name="Period", period_number=9, start_time=time(17), end_time=time(17, 45), institution_id=institution_id)
+    group = Group(name="Other group", student_count=10, institution_id=institution_id)
+    teacher = Teacher(full_name="Other teacher", institution_id=institution_id)
+    classroom = Classroom(name="Other room", type="REGULAR", capacity=20, institution_id=institution_id)
+    subject = Subject(name="Other subject", type="LECTURE", institution_id=institution_id)
+    db.add_all([slot, group, teacher, classroom, subject])
+    db.flush()
+    db.add(ScheduleEntry(
+        day_of_week=DayOfWeek.MONDAY, group_id=group.id, subject_id=subject.id, teacher_id=teacher.id,
+        classroom_id=classroom.id, time_slot_id=slot.id,
+    ))
+    db.commit()
+    return group.id
+
+
+def drain(subscriber):
+    items = []
+    while not subscriber.queue.empty():
+        items.append(subscriber.queue.get_nowait())
+    return items
+
+
+def test_schedule_changes_reach_only_the_admins_of_their_institution(db, seed):
+    other = Institution(name="Other school", type="school")
+    db.add(other)
+    db.commit()
+
+    async def run():
+        streams = {
+            name: event_broker.subscribe(Principal(id=user_id, role=role, is_active=True, institution_id=institution))
+            for name, user_id, role, institution in [
+                ("admin", 901, UserRole.ADMIN, seed.institution),
+                ("other_admin", 902, UserRole.ADMIN, other.id),
+                ("super_admin", 903, UserRole.SUPER_ADMIN, None),
+            ]
+        }
+        try:
+            group = add_entry(db, other.id)
+            await asyncio.sleep(0)
+            return group, {name: drain(subscriber) for name, subscriber in streams.items()}
+        finally:
+            for subscriber in streams.values():
+                event_broker.unsubscribe(subscriber)
+
+    group, received = asyncio.run(run())
+
+    assert received["admin"] == []
+    for name in ("other_admin", "super_admin"):
+        [(type, data)] = received[name]
+        assert type == "schedule_changed"
+        assert ["group", group] in data["scopes"]
+
+
+def test_notify_payloads_split_recipients_by_size():
+    event = {"type": "notification", "data": {"message": "Заміна " * 100}, "recipients": [[i, 10_000 + i] for i in range(2000)]}
+
+    payloads = notify_payloads(event, NOTIFY_PAYLOAD_LIMIT)
+
+    assert len(payloads) > 1
+    assert all(len(payload.encode()) <= NOTIFY_PAYLOAD_LIMIT for payload in payloads)
+    assert [r for payload in payloads for r in json.loads(payload)["recipients"]] == event["recipients"]
+
+
+def test_oversized_events_are_dropped_without_raising(caplog):
+    sent = []
+    session = SimpleNamespace(connection=lambda: SimpleNamespace(execute=sent.append))
+    broadcast = PostgresBroadcast(event_broker, "postgresql://localhost/rozklad", "events")
+
+    broadcast.send(session, {"type": "notification", "data": {"message": "x" * 9000}, "recipients": [[1, 1]]})
+    broadcast.send(session, {"type": "notification", "data": {"message": "x"}, "recipients": [[1, 1]]})
+
+    assert len(sent) == 1
+    assert "Dropped a notification event" in caplog.text
+
+
+def test_pushed_messages_are_cut_to_fit():
+    data = push_data("Changed", "x" * 10_000, NotificationType.SCHEDULE_CHANGE, datetime(2026, 1, 1))
+
+    assert len(data["message"]) == PUSH_MESSAGE_LENGTH
+    assert notify_payloads({"type": "notification", "data": data, "recipients": [[1, 1]]}, NOTIFY_PAYLOAD_LIMIT)
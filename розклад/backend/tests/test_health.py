@@ -0,0 +1,27 @@
+import pytest
+
+from app.core.security import get_password_hash
+from app.models import User
+from app.models.user import UserRole
+
+from conftest import auth
+
+METRICS = ["/health/db", "/health/password-hashing", "/health/email", "/health/streams"]
+
+
+def test_liveness_check_is_public(client):
+    assert client.get("/health").json() == {"status": "healthy"}
+
+
+@pytest.mark.parametrize("path", METRICS)
+def test_metrics_are_for_super_admins_only(client, db, seed, path):
+    super_admin = User(
+        email="root@example.com", username="root", hashed_password=get_password_hash("x"), full_name="Root",
+        role=UserRole.SUPER_ADMIN, is_active=True, is_verified=True,
+    )
+    db.add(super_admin)
+    db.commit()
+
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers=auth(seed.admin)).status_code == 403
+    assert client.get(path, headers=auth(super_admin.id)).status_code == 200
@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import select
+
+from app.models import ScheduleVersion
+from app.services.schedule_versions import REFERENCE_SCOPE
+
+
+def reference_version(db):
+    db.expire_all()
+    scope, scope_id = REFERENCE_SCOPE
+    return db.scalar(
+        select(ScheduleVersion.version).where(ScheduleVersion.scope == scope, ScheduleVersion.scope_id == scope_id)
+    ) or 0
+
+
+@pytest.mark.parametrize("name", ["Room 9", "Room 0"], ids=["created", "updated"])
+def test_import_changes_the_reference_version(client, db, seed, admin_headers, name):
+    before = reference_version(db)
+
+    response = client.post(
+        "/api/v1/imports/classrooms",
+        files={"file": ("rooms.csv", f"name,type,capacity\n{name},regular,40\n", "text/csv")},
+        headers=admin_headers,
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json()["failed"] == 0
+    assert reference_version(db) == before + 1
+
+
+def test_xlsx_import_accepts_numeric_names(client, db, seed, admin_headers):
+    from io import BytesIO
+
+    from openpyxl import Workbook
+
+    from app.models import Classroom
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Name", "Type", "Capacity", "Building"])
+    sheet.append([101, "regular", 40, 2.0])
+    sheet.append([102.0, "lab", 15, 2.5])
+    upload = BytesIO()
+    workbook.save(upload)
+
+    response = client.post(
+        "/api/v1/imports/classrooms",
+        files={"file": ("rooms.xlsx", upload.getvalue(), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+        headers=admin_headers,
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json() == {"created": 2, "updated": 0, "failed": 0, "errors": []}
+    rooms = {room.name: room for room in db.scalars(select(Classroom).where(Classroom.name.in_(["101", "102"])))}
+    assert rooms["101"].capacity == 40 and rooms["101"].building == "2"
+    assert rooms["102"].type.value == "lab" and rooms["102"].building == "2.5"
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models.job import Job, JobStatus
+from app.services import jobs
+from app.services.job_retention import purge_jobs
+from app.services.jobs import claim_jobs, enqueue, enqueue_periodic_jobs, retry_delay, run_pending_jobs
+
+
+def add_job(db, name="noop", **fields):
+    job = Job(name=name, payload={}, max_attempts=settings.JOB_MAX_ATTEMPTS, **fields)
+    db.add(job)
+    db.commit()
+    return job.id
+
+
+def job_rows(db):
+    db.expire_all()
+    return {job.id: job for job in db.scalars(select(Job))}
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    """Register test handlers by name for the duration of a test."""
+    def register(name, fn):
+        monkeypatch.setitem(jobs.handlers, name, fn)
+    return register
+
+
+def test_claim_takes_due_jobs_oldest_first_and_only_once(db):
+    now = datetime.utcnow()
+    later = add_job(db, run_at=now - timedelta(seconds=5))
+    first = add_job(db, run_at=now - timedelta(seconds=60))
+    add_job(db, run_at=now + timedelta(hours=1))
+
+    assert [job.id for job in claim_jobs(db, "worker-a", 1)] == [first]
+    assert [job.id for job in claim_jobs(db, "worker-b", 5)] == [later]
+    assert claim_jobs(db, "worker-c", 5) == []
+
+    claimed = job_rows(db)[first]
+    assert claimed.status == JobStatus.RUNNING and claimed.attempts == 1
+    assert claimed.locked_by.startswith("worker-a:")
+
+
+def test_failed_jobs_are_retried_with_backoff_then_give_up(db, handlers, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 2)
+
+    def fail(db):
+        raise RuntimeError("boom")
+    handlers("fail", fail)
+    enqueue(db, "fail")
+    db.commit()
+
+    before = datetime.utcnow()
+    assert run_pending_jobs() == 1
+    [job] = job_rows(db).values()
+    assert job.status == JobStatus.PENDING and job.attempts == 1
+    assert job.last_error == "RuntimeError: boom" and job.locked_by is None
+    delay = (job.run_at - before).total_seconds()
+    assert settings.JOB_RETRY_BASE_SECONDS * 0.8 <= delay <= settings.JOB_RETRY_BASE_SECONDS * 1.2 + 1
+
+    # Not due yet
+    assert run_pending_jobs() == 0
+    job.run_at = datetime.utcnow()
+    db.commit()
+    assert run_pending_jobs() == 1
+    [job] = job_rows(db).values()
+    assert job.status == JobStatus.FAILED and job.attempts == 2 and job.finished_at is not None
+
+
+def test_retry_delay_doubles_up_to_the_maximum(monkeypatch):
+    monkeypatch.setattr(jobs.random, "uniform", lambda low, high: 1.0)
+
+    assert [retry_delay(attempts) for attempts in (1, 2, 3)] == [
+        settings.JOB_RETRY_BASE_SECONDS * factor for factor in (1, 2, 4)
+    ]
+    assert retry_delay(100) == settings.JOB_RETRY_MAX_SECONDS
+
+
+def test_periodic_jobs_are_enqueued_once_per_interval(db, handlers, monkeypatch):
+    ran = []
+    handlers("tick", lambda db: ran.append(1))
+    monkeypatch.setattr(jobs, "schedules", {"tick": 3600})
+
+    assert enqueue_periodic_jobs(db) == 1
+    # Already queued
+    assert enqueue_periodic_jobs(db) == 0
+    run_pending_jobs()
+    assert ran == [1]
+    # Finished within the interval
+    assert enqueue_periodic_jobs(db) == 0
+
+    [job] = job_rows(db).values()
+    job.finished_at = datetime.utcnow() - timedelta(seconds=3601)
+    db.commit()
+    assert enqueue_periodic_jobs(db) == 1
+
+
+def test_purge_deletes_finished_jobs_past_retention(db, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_PURGE_BATCH_SIZE", 2)
+    now = datetime.utcnow()
+    done_days, failed_days = settings.JOB_RETENTION_DAYS, settings.JOB_FAILED_RETENTION_DAYS
+    old_done = [
+        add_job(db, status=JobStatus.DONE, finished_at=now - timedelta(days=done_days + 1)) for _ in range(3)
+    ]
+    recent_done = add_job(db, status=JobStatus.DONE, finished_at=now - timedelta(days=done_days - 1))
+    old_failed = add_job(db, status=JobStatus.FAILED, finished_at=now - timedelta(days=failed_days + 1))
+    recent_failed = add_job(db, status=JobStatus.FAILED, finished_at=now - timedelta(days=done_days + 1))
+    pending = add_job(db, run_at=now - timedelta(days=failed_days + 1))
+
+    assert purge_jobs(db) == len(old_done) + 1
+    assert set(job_rows(db)) == {recent_done, recent_failed, pending}
+    assert old_failed not in job_rows(db)
+
+
+def test_purge_keeps_the_last_run_of_long_periodic_jobs(db, monkeypatch):
+    interval = (settings.JOB_RETENTION_DAYS + 2) * 86400
+    monkeypatch.setitem(jobs.schedules, "weekly_report", interval)
+    last_run = add_job(
+        db, name="weekly_report", status=JobStatus.DONE,
+        finished_at=datetime.utcnow() - timedelta(days=settings.JOB_RETENTION_DAYS + 1),
+    )
+
+    assert purge_jobs(db) == 0
+    assert last_run in job_rows(db)
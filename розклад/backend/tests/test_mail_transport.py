@@ -0,0 +1,145 @@
+import smtplib
+from email.message import EmailMessage
+
+import pytest
+
+from app.core import mail_transport
+from app.core.mail_transport import RateLimiter, SMTPPool
+
+
+class FakeSMTP:
+    """Stands in for smtplib.SMTP; `failures` maps a send number to the error it raises."""
+
+    instances = []
+    failures = {}
+    sends = 0
+
+    def __init__(self, host, port, timeout=None):
+        self.sent = []
+        self.calls = []
+        self.closed = False
+        FakeSMTP.instances.append(self)
+
+    def starttls(self):
+        self.calls.append("starttls")
+
+    def login(self, username, password):
+        self.calls.append(("login", username))
+
+    def send_message(self, message):
+        FakeSMTP.sends += 1
+        error = FakeSMTP.failures.pop(FakeSMTP.sends, None)
+        if error is not None:
+            raise error
+        self.sent.append(message["To"])
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_smtp(monkeypatch):
+    monkeypatch.setattr(mail_transport.smtplib, "SMTP", FakeSMTP)
+    FakeSMTP.instances, FakeSMTP.failures, FakeSMTP.sends = [], {}, 0
+    return FakeSMTP
+
+
+def pool(**options):
+    return SMTPPool("smtp.example.com", 587, username="user", password="secret", **options)
+
+
+def message(to):
+    msg = EmailMessage()
+    msg["To"] = to
+    msg["Subject"] = "Hello"
+    return msg
+
+
+def delivered():
+    return [to for smtp in FakeSMTP.instances for to in smtp.sent]
+
+
+def test_connections_are_reused():
+    smtp_pool = pool()
+    for i in range(3):
+        smtp_pool.send(message(f"user{i}@example.com"))
+
+    [smtp] = FakeSMTP.instances
+    assert smtp.calls == ["starttls", ("login", "user")]
+    assert smtp.sent == ["user0@example.com", "user1@example.com", "user2@example.com"]
+    assert smtp_pool.metrics() == {"pool_size": 4, "idle_connections": 1, "connects": 1, "sent": 3, "failed": 0}
+
+
+def test_connections_are_replaced_after_max_messages():
+    smtp_pool = pool(max_messages_per_connection=2)
+
+    assert smtp_pool.send_many([message(f"user{i}@example.com") for i in range(5)]) == []
+
+    assert [len(smtp.sent) for smtp in FakeSMTP.instances] == [2, 2, 1]
+    assert [smtp.closed for smtp in FakeSMTP.instances] == [True, True, False]
+
+
+def test_idle_connections_are_not_reused_after_the_timeout():
+    smtp_pool = pool(idle_timeout=0)
+    smtp_pool.send(message("a@example.com"))
+    smtp_pool.send(message("b@example.com"))
+
+    first, second = FakeSMTP.instances
+    assert first.closed and not second.closed
+
+
+def test_dropped_connection_is_reopened_and_the_message_resent():
+    FakeSMTP.failures[2] = smtplib.SMTPServerDisconnected("gone")
+    smtp_pool = pool()
+
+    assert smtp_pool.send_many([message("a@example.com"), message("b@example.com")]) == []
+
+    assert delivered() == ["a@example.com", "b@example.com"]
+    assert smtp_pool.connects == 2 and smtp_pool.failed == 0
+
+
+def test_connection_errors_give_up_after_the_retries():
+    for send in (1, 2, 3):
+        FakeSMTP.failures[send] = ConnectionResetError()
+    smtp_pool = pool(retries=2)
+
+    with pytest.raises(ConnectionResetError):
+        smtp_pool.send(message("a@example.com"))
+    assert smtp_pool.connects == 3 and smtp_pool.failed == 1
+
+
+def test_refused_recipient_fails_only_its_message():
+    refused = smtplib.SMTPRecipientsRefused({"bad@example.com": (550, b"No such user")})
+    FakeSMTP.failures[1] = refused
+    smtp_pool = pool()
+
+    failures = smtp_pool.send_many([message("bad@example.com"), message("good@example.com")])
+
+    assert [(msg["To"], error) for msg, error in failures] == [("bad@example.com", refused)]
+    assert delivered() == ["good@example.com"]
+    assert smtp_pool.connects == 1
+
+
+def test_rate_limiter_spaces_sends_beyond_the_burst(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(mail_transport.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(mail_transport.time, "sleep", lambda seconds: clock.__setitem__(0, clock[0] + seconds))
+    limiter = RateLimiter(rate_per_minute=120)
+
+    times = []
+    for _ in range(4):
+        limiter.acquire()
+        times.append(clock[0] - 1000.0)
+
+    # A burst of two (one second's worth), then one every half second
+    assert times == pytest.approx([0.0, 0.0, 0.5, 1.0])
+
+
+def test_rate_limiter_disabled_at_zero(monkeypatch):
+    monkeypatch.setattr(mail_transport.time, "sleep", lambda seconds: pytest.fail("should not wait"))
+    limiter = RateLimiter(rate_per_minute=0)
+    for _ in range(100):
+        limiter.acquire()
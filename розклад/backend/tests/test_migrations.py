@@ -0,0 +1,82 @@
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect, text
+
+from app.core.config import settings
+from app.database import Base
+
+ALEMBIC_DIR = Path(__file__).resolve().parent.parent / "alembic"
+
+# Schema objects added by revisions after 003
+LATER_INDEXES = [
+    "ix_notifications_user_read_created",
+    "ix_notifications_created_at",
+    "ix_schedule_entries_group_date",
+    "ix_schedule_entries_teacher_date",
+    "ix_schedule_entries_classroom_date",
+]
+
+
+def database_at_003(url, archive_created_on_startup):
+    """Build the schema a deployment at revision 003 has, holding one user."""
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for name in LATER_INDEXES:
+            conn.execute(text(f"DROP INDEX {name}"))
+        conn.execute(text("ALTER TABLE users DROP COLUMN notification_delivery"))
+        conn.execute(text("ALTER TABLE users DROP COLUMN feed_token_version"))
+        conn.execute(text("ALTER TABLE notifications DROP COLUMN digest_count"))
+        if archive_created_on_startup:
+            conn.execute(text("ALTER TABLE notifications_archive DROP COLUMN digest_count"))
+        else:
+            conn.execute(text("DROP TABLE notifications_archive"))
+        conn.execute(text(
+            "INSERT INTO users (email, username, hashed_password, full_name, role, is_verified) "
+            "VALUES ('old@example.com', 'old', 'x', 'Old User', 'STUDENT', 1)"
+        ))
+    return engine
+
+
+@pytest.mark.parametrize("archive_created_on_startup", [False, True])
+def test_upgrade_from_003(tmp_path, monkeypatch, archive_created_on_startup):
+    url = f"sqlite:///{tmp_path / 'migrate.db'}"
+    engine = database_at_003(url, archive_created_on_startup)
+    monkeypatch.setattr(settings, "DATABASE_URL", url)
+    config = Config()
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+
+    command.stamp(config, "003_users_role_group")
+    command.upgrade(config, "head")
+
+    schema = inspect(engine)
+    archive_columns = {column["name"] for column in schema.get_columns("notifications_archive")}
+    assert {"user_id", "archived_at", "digest_count"} <= archive_columns
+    assert "ix_notifications_archive_user_id" in {i["name"] for i in schema.get_indexes("notifications_archive")}
+    with engine.connect() as conn:
+        # Existing users keep one notification per event
+        assert conn.scalar(text("SELECT notification_delivery FROM users WHERE username = 'old'")) == "IMMEDIATE"
+    engine.dispose()
+
+
+def index_names(engine):
+    with engine.connect() as conn:
+        return set(conn.scalars(text("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")))
+
+
+def test_every_revision_skips_objects_created_on_startup(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'startup.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    before = index_names(engine)
+    monkeypatch.setattr(settings, "DATABASE_URL", url)
+    config = Config()
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+
+    command.upgrade(config, "head")
+
+    assert index_names(engine) == before
+    engine.dispose()
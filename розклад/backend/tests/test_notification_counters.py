@@ -0,0 +1,81 @@
+from sqlalchemy import event, func, select
+
+from app.database import SessionLocal, engine
+from app.models import Notification, NotificationCounter
+from app.models.notification import NotificationType
+from app.services.notification_counters import add_unread, adjust_unread, reconcile_unread_counts
+
+
+def notify(db, user_id, count=1, counted=True):
+    db.add_all([
+        Notification(user_id=user_id, title="Changed", message="Changed", type=NotificationType.SCHEDULE_CHANGE)
+        for _ in range(count)
+    ])
+    if counted:
+        add_unread(db, [user_id] * count)
+    db.commit()
+
+
+def stored(db, user_id):
+    db.expire_all()
+    return db.scalar(select(NotificationCounter.unread).where(NotificationCounter.user_id == user_id))
+
+
+def test_reconcile_fixes_drifted_counters(db, seed):
+    admin, student = seed.admin, seed.students[0]
+    notify(db, admin, 2)
+    notify(db, student, 3, counted=False)
+    db.query(NotificationCounter).filter(NotificationCounter.user_id == admin).update({"unread": 7})
+    db.commit()
+
+    assert reconcile_unread_counts(db) == 2
+    db.commit()
+    assert stored(db, admin) == 2
+    assert stored(db, student) == 3
+
+
+def test_reconcile_keeps_writes_committed_during_the_recount(db, seed):
+    user_id = seed.admin
+    notify(db, user_id, 2)
+    db.query(NotificationCounter).update({"unread": 5})
+    db.commit()
+
+    # Another request notifies the user while the recount is running, just
+    # before the counters are read
+    written = []
+
+    def concurrent_write(conn, cursor, statement, parameters, context, executemany):
+        if not written and "notification_counters" in statement:
+            written.append(statement)
+            other = SessionLocal()
+            try:
+                notify(other, user_id)
+            finally:
+                other.close()
+
+    event.listen(engine, "before_cursor_execute", concurrent_write)
+    try:
+        reconcile_unread_counts(db)
+        db.commit()
+    finally:
+        event.remove(engine, "before_cursor_execute", concurrent_write)
+
+    actual = db.scalar(select(func.count()).select_from(Notification).where(Notification.is_read == False))
+    assert actual == 3
+    assert stored(db, user_id) == 3
+
+
+def test_counters_are_created_and_adjusted_by_one_upsert(db, seed, statements):
+    admin, student = seed.admin, seed.students[0]
+    notify(db, admin, 2)
+    statements.clear()
+
+    adjust_unread(db, {admin: -5, student: 1, seed.students[1]: 1})
+    db.commit()
+
+    counter_statements = [s for s in statements if "notification_counters" in s]
+    assert len(counter_statements) == 2
+    assert all(s.startswith("INSERT") and "ON CONFLICT" in s for s in counter_statements)
+    assert stored(db, admin) == 0
+    assert stored(db, student) == 1
+    assert stored(db, seed.students[1]) == 1
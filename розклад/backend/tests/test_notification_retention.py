@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models import Notification, NotificationCounter
+from app.models.notification import ArchivedNotification, NotificationType
+from app.services.notification_counters import add_unread
+from app.services.notification_retention import purge_notifications
+
+
+def notification(user_id, days_old, read_days_ago=None):
+    created_at = datetime.utcnow() - timedelta(days=days_old)
+    read_at = None if read_days_ago is None else datetime.utcnow() - timedelta(days=read_days_ago)
+    return Notification(
+        user_id=user_id, title="Changed", message=f"{days_old} days old", type=NotificationType.SCHEDULE_CHANGE,
+        is_read=read_at is not None, read_at=read_at, created_at=created_at,
+    )
+
+
+@pytest.mark.parametrize("mode", ["archive", "delete"])
+def test_expired_notifications_are_purged_in_batches(db, seed, monkeypatch, mode):
+    monkeypatch.setattr(settings, "NOTIFICATION_RETENTION_MODE", mode)
+    monkeypatch.setattr(settings, "NOTIFICATION_PURGE_BATCH_SIZE", 1)
+    reader, student = seed.admin, seed.students[0]
+    expired = [notification(reader, 200, read_days_ago=100), notification(student, 400)]
+    kept = [notification(reader, 20, read_days_ago=10), notification(student, 10)]
+    db.add_all(expired + kept)
+    add_unread(db, [student, student])
+    db.commit()
+    expected = [(n.id, n.user_id, n.is_read) for n in sorted(expired, key=lambda n: n.id)]
+
+    assert purge_notifications(db) == 2
+
+    db.expire_all()
+    assert sorted(db.scalars(select(Notification.id))) == sorted(n.id for n in kept)
+    archived = db.execute(
+        select(ArchivedNotification.id, ArchivedNotification.user_id, ArchivedNotification.is_read)
+        .order_by(ArchivedNotification.id)
+    ).all()
+    assert [tuple(row) for row in archived] == (expected if mode == "archive" else [])
+    # The purged unread notification no longer counts towards the badge
+    assert db.get(NotificationCounter, student).unread == 1
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.models import Notification, NotificationCounter, User
+from app.models.notification import NotificationDelivery, NotificationType
+from app.models.user import UserRole
+from app.services.notifications import ADMIN_ROLES, fan_out, users_with_role
+
+
+def unread_counts(db):
+    db.expire_all()
+    return dict(db.execute(select(NotificationCounter.user_id, NotificationCounter.unread)).all())
+
+
+def recipients(db):
+    return dict(db.execute(
+        select(Notification.user_id, func.count()).group_by(Notification.user_id)
+    ).all())
+
+
+def test_fan_out_writes_one_row_per_recipient_with_one_insert(db, seed, statements):
+    group_students = [seed.students[0], seed.students[3]]
+
+    written = fan_out(
+        db, users_with_role([UserRole.STUDENT], group_ids=[seed.groups[0]]),
+        title="Schedule Change", message="Math moved", type=NotificationType.SCHEDULE_CHANGE,
+    )
+    written += fan_out(
+        db, users_with_role(ADMIN_ROLES),
+        title="New Change Request", message="Cancellation", type=NotificationType.CHANGE_REQUEST_UPDATE,
+    )
+    db.commit()
+
+    assert written == 3
+    assert len([s for s in statements if s.startswith("INSERT INTO notifications")]) == 2
+    assert recipients(db) == {seed.students[0]: 1, seed.students[3]: 1, seed.admin: 1}
+    assert unread_counts(db) == {user_id: 1 for user_id in group_students + [seed.admin]}
+    assert db.scalar(select(Notification.message).where(Notification.user_id == seed.admin)) == "Cancellation"
+
+
+def test_digest_users_get_bursts_coalesced_into_one_notification(db, seed):
+    digest, immediate = seed.students[0], seed.students[3]
+    db.get(User, digest).notification_delivery = NotificationDelivery.DIGEST
+    db.commit()
+
+    def notify(message, type=NotificationType.SCHEDULE_CHANGE):
+        fan_out(db, users_with_role([UserRole.STUDENT], group_ids=[seed.groups[0]]), "Changed", message, type)
+        db.commit()
+
+    for message in ["Math moved", "Physics cancelled", "History moved"]:
+        notify(message)
+    notify("Request approved", NotificationType.CHANGE_REQUEST_UPDATE)
+
+    assert recipients(db) == {digest: 2, immediate: 4}
+    assert unread_counts(db) == {digest: 2, immediate: 4}
+    [coalesced] = db.scalars(select(Notification).where(
+        Notification.user_id == digest, Notification.type == NotificationType.SCHEDULE_CHANGE
+    )).all()
+    assert coalesced.digest_count == 3
+    assert coalesced.title == "Schedule changes (3)"
+    assert coalesced.message == "Math moved\nPhysics cancelled\nHistory moved"
+
+    # A digest closes once it is read or its window has passed
+    coalesced.is_read = True
+    db.commit()
+    notify("Art moved")
+    db.query(Notification).filter(Notification.message == "Art moved").update({
+        "created_at": datetime.utcnow() - timedelta(seconds=settings.NOTIFICATION_COALESCE_SECONDS + 1)
+    })
+    db.commit()
+    notify("Music moved")
+
+    assert recipients(db) == {digest: 4, immediate: 6}
@@ -0,0 +1,123 @@
+import base64
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.models import ChangeRequest, Notification, ScheduleEntry
+from app.models.change_request import ChangeType
+from app.models.notification import NotificationType
+from app.models.schedule import DayOfWeek
+
+PAGE = 4
+
+
+@pytest.fixture
+def rows(db, seed):
+    """Entries, change requests and notifications whose sort keys tie in runs of three."""
+    entries = [
+        ScheduleEntry(
+            day_of_week=day, time_slot_id=slot, group_id=seed.groups[i], subject_id=seed.subject,
+            teacher_id=seed.teachers[i], classroom_id=seed.classrooms[i],
+        )
+        for day in [DayOfWeek.MONDAY, DayOfWeek.TUESDAY]
+        for slot in seed.slots[:2]
+        for i in range(3)
+    ]
+    db.add_all(entries)
+    db.flush()
+    # Older in runs of three as ids grow, so only the id orders rows of a run
+    base = datetime(2026, 10, 1, 9)
+    for n in range(10):
+        created_at = base - timedelta(minutes=n // 3)
+        db.add(ChangeRequest(
+            change_type=ChangeType.CANCELLATION, reason="Trip", requested_date=date(2026, 10, 19),
+            schedule_entry_id=entries[n].id, created_by=seed.admin, created_at=created_at,
+        ))
+        db.add(Notification(
+            user_id=seed.admin, title="Changed", message=f"Change {n}", type=NotificationType.SCHEDULE_CHANGE,
+            created_at=created_at,
+        ))
+    db.commit()
+    return {
+        "entries": [(entry.day_of_week, entry.time_slot_id, entry.id) for entry in entries],
+        "change_requests": [request.id for request in db.query(ChangeRequest).order_by(ChangeRequest.id)],
+        "notifications": [notification.id for notification in db.query(Notification).order_by(Notification.id)],
+    }
+
+
+def walk(client, headers, url):
+    """Follow next_cursor from the first page to the last; return the ids in page order."""
+    ids, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": PAGE, **({"cursor": cursor} if cursor else {})}
+        response = client.get(url, params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page["items"]) <= PAGE
+        ids += [item["id"] for item in page["items"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids, pages
+
+
+@pytest.mark.parametrize("url, count", [
+    ("/api/v1/schedule/", 12), ("/api/v1/change-requests/", 10), ("/api/v1/notifications/", 10),
+])
+def test_pages_cover_every_row_once_in_order(client, admin_headers, rows, url, count):
+    everything = client.get(url, params={"limit": 500}, headers=admin_headers).json()
+    expected = [item["id"] for item in everything["items"]]
+
+    ids, pages = walk(client, admin_headers, url)
+
+    assert len(expected) == count
+    assert ids == expected
+    assert pages == -(-count // PAGE)
+
+
+@pytest.mark.parametrize("url, key", [("/api/v1/change-requests/", "change_requests"), ("/api/v1/notifications/", "notifications")])
+def test_rows_created_together_are_ordered_by_id(client, admin_headers, rows, url, key):
+    ids, _ = walk(client, admin_headers, url)
+
+    # Newest run first, highest id first within a run
+    first, second, third, fourth = [rows[key][i:i + 3] for i in range(0, 10, 3)]
+    assert ids == first[::-1] + second[::-1] + third[::-1] + fourth
+
+
+def test_entries_of_the_same_slot_are_ordered_by_id(client, admin_headers, rows):
+    ids, _ = walk(client, admin_headers, "/api/v1/schedule/")
+
+    slots = {}
+    for day, slot, entry_id in rows["entries"]:
+        slots.setdefault((day, slot), []).append(entry_id)
+    # Each slot's entries stay adjacent and in id order, although pages of
+    # four split the runs of three
+    for same_slot in slots.values():
+        start = ids.index(min(same_slot))
+        assert ids[start:start + 3] == sorted(same_slot)
+
+
+def encode(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("url, tampered", [
+    ("/api/v1/schedule/", encode('["someday",1,1]')),
+    ("/api/v1/schedule/", encode('["monday",1]')),
+    ("/api/v1/change-requests/", encode('[1,"x"]')),
+    ("/api/v1/notifications/", "not a cursor"),
+])
+def test_tampered_cursors_are_rejected(client, admin_headers, rows, url, tampered):
+    response = client.get(url, params={"limit": PAGE, "cursor": tampered}, headers=admin_headers)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid pagination cursor"
+
+
+@pytest.mark.parametrize("url", ["/api/v1/schedule/", "/api/v1/change-requests/", "/api/v1/notifications/"])
+def test_truncated_cursors_are_rejected(client, admin_headers, rows, url):
+    cursor = client.get(url, params={"limit": PAGE}, headers=admin_headers).json()["next_cursor"]
+
+    response = client.get(url, params={"limit": PAGE, "cursor": cursor[:-3]}, headers=admin_headers)
+
+    assert response.status_code == 400
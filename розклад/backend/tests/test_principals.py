@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+
+import pytest
+from jose import jwt
+
+from app.core.config import settings
+from app.core.events import event_broker
+from app.core.passwords import password_pool
+from app.core.principals import principal_cache
+from app.core.security import create_access_token
+from app.models import RevokedToken, User
+from app.services import refresh_tokens
+
+from conftest import PASSWORD
+
+
+@pytest.fixture
+def embed_claims(monkeypatch):
+    monkeypatch.setattr(settings, "TOKEN_EMBED_CLAIMS", True)
+
+
+def login(client, username="admin"):
+    response = client.post("/api/v1/auth/login", data={"username": username, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def deactivate(db, user_id):
+    db.get(User, user_id).is_active = False
+    db.commit()
+
+
+def test_embedded_claims_carry_the_active_flag_and_expire_soon(client, seed, embed_claims):
+    tokens = login(client)
+
+    claims = jwt.decode(tokens["access_token"], settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    assert claims["active"] is True
+    lifetime = datetime.utcfromtimestamp(claims["exp"]) - datetime.utcnow()
+    assert lifetime.total_seconds() <= settings.EMBEDDED_CLAIMS_TOKEN_EXPIRE_MINUTES * 60
+
+
+def test_embedded_inactive_claim_is_rejected(client, seed, embed_claims):
+    token = create_access_token({"sub": str(seed.admin), "role": "admin", "active": False})
+
+    response = client.get("/api/v1/schedule/", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 400
+
+
+def test_tokens_without_the_active_claim_check_the_user_row(client, db, seed, embed_claims):
+    deactivate(db, seed.admin)
+    token = create_access_token({"sub": str(seed.admin), "role": "admin"})
+
+    response = client.get("/api/v1/schedule/", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 400
+
+
+def test_refresh_rejects_a_deactivated_user(client, db, seed, embed_claims):
+    tokens = login(client)
+    deactivate(db, seed.admin)
+
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+
+def test_user_changes_are_broadcast_to_every_worker(client, db, seed, admin_headers, monkeypatch):
+    published = []
+    monkeypatch.setattr(event_broker, "publish", lambda event: published.append(event))
+    assert client.get("/api/v1/schedule/", headers=admin_headers).status_code == 200
+
+    deactivate(db, seed.admin)
+
+    assert {"type": "principals_changed", "users": [seed.admin]} in published
+
+
+def test_principals_changed_event_drops_cached_principals(client, seed, admin_headers):
+    assert client.get("/api/v1/schedule/", headers=admin_headers).status_code == 200
+    assert principal_cache.get(f"user:{seed.admin}") is not None
+
+    event_broker.publish({"type": "principals_changed", "users": [seed.admin]})
+
+    assert principal_cache.get(f"user:{seed.admin}") is None
+
+
+def refresh(client, token):
+    return client.post("/api/v1/auth/refresh", json={"refresh_token": token})
+
+
+def test_reusing_a_rotated_refresh_token_revokes_the_family(client, db, seed):
+    first = login(client)["refresh_token"]
+    second = refresh(client, first).json()["refresh_token"]
+
+    assert refresh(client, first).status_code == 401
+    # The token the reuse raced with is dead too: the user must log in again
+    assert refresh(client, second).status_code == 401
+    assert db.query(RevokedToken).filter(RevokedToken.jti.startswith("fam:")).count() == 1
+
+
+def test_expired_revocations_are_purged(client, db, seed, monkeypatch):
+    monkeypatch.setattr(refresh_tokens, "_last_purge", float("-inf"))
+    db.add_all([
+        RevokedToken(jti="expired", expires_at=datetime.utcnow() - timedelta(minutes=1)),
+        RevokedToken(jti="live", expires_at=datetime.utcnow() + timedelta(minutes=1)),
+    ])
+    db.commit()
+
+    assert refresh(client, login(client)["refresh_token"]).status_code == 200
+
+    db.expire_all()
+    assert db.get(RevokedToken, "expired") is None
+    assert db.get(RevokedToken, "live") is not None
+
+
+def test_saturated_password_pool_answers_503(client, seed, monkeypatch):
+    monkeypatch.setattr(password_pool, "in_flight", password_pool.workers + password_pool.max_queue)
+
+    response = client.post("/api/v1/auth/login", data={"username": "admin", "password": PASSWORD})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
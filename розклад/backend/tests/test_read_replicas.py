@@ -0,0 +1,53 @@
+import itertools
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app import database
+from app.database import READ_PRIMARY_COOKIE, ReadYourWritesMiddleware
+
+from conftest import auth
+
+REPLICA = ("sync replica", "async replica")
+
+
+@pytest.fixture
+def replicas(monkeypatch):
+    monkeypatch.setattr(database, "replica_engines", [REPLICA])
+    monkeypatch.setattr(database, "_replica_cycle", itertools.cycle([REPLICA]))
+
+
+@pytest.fixture
+def writer():
+    app = FastAPI()
+
+    @app.post("/write")
+    def write():
+        return {}
+
+    app.add_middleware(ReadYourWritesMiddleware)
+    return TestClient(app)
+
+
+def read_engines(headers):
+    scope = {"type": "http", "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()]}
+    return database._read_engines(Request(scope))
+
+
+def test_a_write_pins_its_user_to_the_primary_on_every_client(replicas, writer):
+    response = writer.post("/write", headers=auth(7))
+
+    assert READ_PRIMARY_COOKIE in response.cookies
+    # Another client of the same user sends no cookie but is pinned too
+    assert read_engines(auth(7)) is None
+    assert read_engines(auth(8)) == REPLICA
+    assert read_engines({}) == REPLICA
+
+
+def test_a_pinned_client_reads_from_the_primary(replicas, writer):
+    cookie = writer.post("/write").cookies[READ_PRIMARY_COOKIE]
+
+    assert read_engines({"Cookie": f"{READ_PRIMARY_COOKIE}={cookie}"}) is None
+    assert read_engines({}) == REPLICA
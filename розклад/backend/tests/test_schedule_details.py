@@ -0,0 +1,63 @@
+from app.core.cache import response_cache
+from app.core.principals import principal_cache
+from app.models.schedule import ScheduleEntry, DayOfWeek
+
+from conftest import auth
+
+DAYS = list(DayOfWeek)[:5]
+
+
+def add_entries(db, seed, count):
+    """Fill (day, period, group) cells in order, skipping those already taken."""
+    cells = [(day, slot, index) for day in DAYS for slot in seed.slots for index in range(3)]
+    taken = {
+        (entry.day_of_week, entry.time_slot_id, seed.groups.index(entry.group_id))
+        for entry in db.query(ScheduleEntry)
+    }
+    for day, slot, index in [cell for cell in cells if cell not in taken][:count]:
+        db.add(ScheduleEntry(
+            day_of_week=day, time_slot_id=slot, group_id=seed.groups[index], subject_id=seed.subject,
+            teacher_id=seed.teachers[index], classroom_id=seed.classrooms[index],
+        ))
+    db.commit()
+
+
+def list_schedule(client, headers, statements):
+    # Measure a cold request: nothing served from the response or principal cache
+    response_cache.clear()
+    principal_cache.clear()
+    statements.clear()
+    response = client.get("/api/v1/schedule/", headers=headers)
+    assert response.status_code == 200
+    selects = [statement for statement in statements if statement.lstrip().upper().startswith("SELECT")]
+    return response.json(), len(selects)
+
+
+def test_listing_runs_a_constant_number_of_selects(client, db, seed, statements):
+    headers = auth(seed.admin)
+
+    add_entries(db, seed, 3)
+    few, few_selects = list_schedule(client, headers, statements)
+    add_entries(db, seed, 40)
+    many, many_selects = list_schedule(client, headers, statements)
+
+    assert len(few) == 3
+    assert len(many) == 43
+    assert many_selects == few_selects
+
+
+def test_listing_includes_joined_names(client, seed, create_entry, admin_headers):
+    substituted = create_entry()
+    client.put(
+        f"/api/v1/schedule/{substituted['id']}",
+        json={"status": "substituted", "substitute_teacher_id": seed.teachers[3]},
+        headers=admin_headers,
+    )
+
+    entry, = client.get("/api/v1/schedule/", headers=admin_headers).json()
+    assert entry["group_name"] == "G0"
+    assert entry["subject_name"] == "Math"
+    assert entry["teacher_name"] == "Teacher 0"
+    assert entry["classroom_name"] == "Room 0"
+    assert entry["substitute_teacher_name"] == "Teacher 3"
+    assert (entry["start_time"], entry["end_time"]) == ("09:00:00", "09:45:00")
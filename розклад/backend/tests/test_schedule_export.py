@@ -0,0 +1,117 @@
+import csv
+import io
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from openpyxl import load_workbook
+
+from app.models import Group, Subject
+from app.models.schedule import ScheduleEntry, DayOfWeek, ScheduleStatus
+from app.services.schedule_export import grid_rows
+
+from conftest import auth
+
+PERIODS = [f"Period {i} ({8 + i:02d}:00-{8 + i:02d}:45)" for i in range(1, 5)]
+
+
+@pytest.fixture
+def timetable(db, seed):
+    def entry(day, slot, index, teacher=None, **fields):
+        return ScheduleEntry(
+            day_of_week=day, time_slot_id=seed.slots[slot], group_id=seed.groups[index], subject_id=seed.subject,
+            teacher_id=seed.teachers[index if teacher is None else teacher], classroom_id=seed.classrooms[index],
+            **fields,
+        )
+
+    db.add_all([
+        entry(DayOfWeek.MONDAY, 0, 0),
+        entry(DayOfWeek.MONDAY, 2, 0, substitute_teacher_id=seed.teachers[3], status=ScheduleStatus.SUBSTITUTED),
+        entry(DayOfWeek.MONDAY, 1, 1),
+        # Left out: cancelled and dated entries
+        entry(DayOfWeek.TUESDAY, 1, 0, status=ScheduleStatus.CANCELLED),
+        entry(DayOfWeek.WEDNESDAY, 0, 0, specific_date=date(2026, 10, 21)),
+        # G1's second grid row
+        entry(DayOfWeek.FRIDAY, 3, 1, teacher=2),
+    ])
+    db.commit()
+
+
+EXPECTED = [
+    ["Group", "Day"] + PERIODS,
+    ["G0", "Monday", "Math, Teacher 0, Room 0", "", "Math, Teacher 3, Room 0", ""],
+    ["G1", "Monday", "", "Math, Teacher 1, Room 1", "", ""],
+    ["G1", "Friday", "", "", "", "Math, Teacher 2, Room 1"],
+]
+
+
+def test_csv_export_is_a_group_by_day_grid(client, admin_headers, timetable):
+    response = client.get("/api/v1/schedule/export.csv", headers=admin_headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.content.startswith("﻿".encode())
+    assert list(csv.reader(io.StringIO(response.content.decode("utf-8-sig")))) == EXPECTED
+
+
+def test_xlsx_export_opens_with_openpyxl(client, admin_headers, timetable):
+    response = client.get("/api/v1/schedule/export.xlsx", headers=admin_headers)
+
+    assert response.status_code == 200
+    workbook = load_workbook(io.BytesIO(response.content), read_only=True)
+    width = len(EXPECTED[0])
+    rows = [
+        # Read-only sheets drop trailing empty cells
+        [cell or "" for cell in row] + [""] * (width - len(row))
+        for row in workbook["Timetable"].iter_rows(values_only=True)
+    ]
+    assert rows == EXPECTED
+
+
+def test_export_of_an_empty_timetable_has_only_the_header(client, seed, admin_headers):
+    response = client.get("/api/v1/schedule/export.csv", headers=admin_headers)
+
+    assert list(csv.reader(io.StringIO(response.content.decode("utf-8-sig")))) == [EXPECTED[0]]
+
+
+def test_export_is_for_admins(client, seed):
+    response = client.get("/api/v1/schedule/export.csv", headers=auth(seed.students[0]))
+    assert response.status_code == 403
+
+
+@pytest.fixture
+def formula_names(db, seed, timetable):
+    db.get(Subject, seed.subject).name = '=HYPERLINK("http://example.com")'
+    db.get(Group, seed.groups[1]).name = "@G1"
+    db.commit()
+
+
+def test_csv_cells_are_not_read_as_formulas(client, admin_headers, formula_names):
+    response = client.get("/api/v1/schedule/export.csv", headers=admin_headers)
+
+    rows = list(csv.reader(io.StringIO(response.content.decode("utf-8-sig"))))
+    assert rows[3][2] == "'=HYPERLINK(\"http://example.com\"), Teacher 0, Room 0"
+    assert [row[0] for row in rows[1:]] == ["'@G1", "'@G1", "G0"]
+
+
+def test_xlsx_cells_are_not_read_as_formulas(client, admin_headers, formula_names):
+    response = client.get("/api/v1/schedule/export.xlsx", headers=admin_headers)
+
+    sheet = load_workbook(io.BytesIO(response.content))["Timetable"]
+    cell = sheet.cell(row=4, column=3)
+    assert cell.data_type == "s"
+    assert cell.value == "=HYPERLINK(\"http://example.com\"), Teacher 0, Room 0"
+
+
+def test_classes_sharing_a_cell_are_all_listed():
+    def row(subject):
+        return SimpleNamespace(
+            group_id=1, group_name="G0", day_of_week=DayOfWeek.MONDAY, time_slot_id=10, subject_name=subject,
+            teacher_name="Teacher 0", substitute_teacher_name=None, classroom_name="Room 0",
+        )
+
+    db = SimpleNamespace(execute=lambda query: [row("Math"), row("Physics")])
+
+    _, cells = grid_rows(db, 1, [(10, "Period 1")])
+
+    assert cells == ["G0", "Monday", "Math, Teacher 0, Room 0; Physics, Teacher 0, Room 0"]
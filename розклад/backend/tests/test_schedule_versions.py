@@ -0,0 +1,46 @@
+from sqlalchemy import select
+
+from app.models import ScheduleVersion
+from app.services.schedule_versions import bump_versions
+
+from conftest import auth
+
+
+def versions(db):
+    db.expire_all()
+    return {(row.scope, row.scope_id): row.version for row in db.scalars(select(ScheduleVersion))}
+
+
+def test_bump_creates_and_increments_counters_in_one_statement(db, statements):
+    bump_versions(db, [("group", 1)])
+    db.commit()
+    statements.clear()
+
+    bump_versions(db, [("group", 1), ("group", 2), ("group", 2)])
+    db.commit()
+
+    assert statements == [statements[0]] and statements[0].startswith("INSERT INTO schedule_versions")
+    assert versions(db) == {("group", 1): 2, ("group", 2): 1}
+
+
+def test_conditional_get_answers_304_until_the_scope_changes(client, seed, create_entry):
+    create_entry(index=0)
+    headers = auth(seed.students[0])
+    params = {"group_id": seed.groups[0]}
+
+    first = client.get("/api/v1/schedule/", params=params, headers=headers)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and len(first.json()) == 1
+
+    cached = client.get("/api/v1/schedule/", params=params, headers={**headers, "If-None-Match": f"W/{etag}"})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag and cached.content == b""
+
+    # Another group's class leaves this view alone
+    create_entry(index=1)
+    assert client.get("/api/v1/schedule/", params=params, headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    create_entry(index=0, slot=1)
+    changed = client.get("/api/v1/schedule/", params=params, headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200 and len(changed.json()) == 2
+    assert changed.headers["ETag"] != etag
@@ -0,0 +1,171 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.models import Institution, User, Job, TimetableJob, Teacher, ChangeRequest, ScheduleEntry
+from app.models.change_request import ChangeType
+from app.models.job import JobStatus
+from app.models.schedule import ScheduleStatus
+from app.models.timetable_job import TimetableJobStatus
+from app.models.user import UserRole
+from app.services import solver
+from app.services.jobs import requeue_stale_jobs, run_pending_jobs
+
+from conftest import auth
+
+
+@pytest.fixture(autouse=True)
+def single_solver_process(monkeypatch):
+    monkeypatch.setattr(settings, "SOLVER_WORKERS", 1)
+
+
+@pytest.fixture
+def generate(client, seed, admin_headers):
+    def start(headers=admin_headers, **fields):
+        body = {
+            "curriculum": [
+                {"group_id": seed.groups[0], "subject_id": seed.subject, "teacher_id": seed.teachers[0],
+                 "lessons_per_week": 3},
+            ],
+            "time_budget_seconds": 1,
+            **fields,
+        }
+        return client.post("/api/v1/schedule/generate", json=body, headers=headers)
+
+    return start
+
+
+@pytest.fixture
+def other_admin(db):
+    institution = Institution(name="Other school", type="school")
+    db.add(institution)
+    db.flush()
+    admin = User(
+        email="other@example.com", username="other", hashed_password="x", full_name="Other",
+        role=UserRole.ADMIN, is_active=True, is_verified=True, institution_id=institution.id,
+    )
+    db.add(admin)
+    db.commit()
+    return admin
+
+
+def test_generation_runs_on_the_job_queue(client, db, admin_headers, generate):
+    response = generate()
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    queued = db.query(Job).filter(Job.name == "generate_timetable").one()
+    assert queued.payload == {"timetable_job_id": job_id}
+
+    assert run_pending_jobs() == 1
+    job = client.get(f"/api/v1/schedule/generate/{job_id}", headers=admin_headers).json()
+    assert job["status"] == "completed"
+    assert len(job["entries"]) == 3
+
+    result = client.post(f"/api/v1/schedule/generate/{job_id}/apply", headers=admin_headers).json()
+    assert result["created"] == 3
+
+
+def test_job_of_a_dead_worker_is_solved_again(client, db, admin_headers, generate):
+    job_id = generate().json()["id"]
+    # A worker claimed both jobs and died mid-solve
+    db.query(TimetableJob).update({"status": TimetableJobStatus.RUNNING, "started_at": datetime.utcnow()})
+    db.query(Job).update({
+        "status": JobStatus.RUNNING, "locked_by": "dead-worker", "attempts": 1,
+        "locked_at": datetime.utcnow() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT_SECONDS + 1),
+    })
+    db.commit()
+
+    assert requeue_stale_jobs(db) == 1
+    assert run_pending_jobs() == 1
+    job = client.get(f"/api/v1/schedule/generate/{job_id}", headers=admin_headers).json()
+    assert job["status"] == "completed"
+
+
+def test_jobs_of_other_institutions_are_hidden(client, seed, generate, other_admin):
+    job_id = generate().json()["id"]
+    run_pending_jobs()
+    headers = auth(other_admin.id)
+
+    assert client.get(f"/api/v1/schedule/generate/{job_id}", headers=headers).status_code == 404
+    assert client.post(f"/api/v1/schedule/generate/{job_id}/apply", headers=headers).status_code == 404
+    assert generate(headers=headers, institution_id=seed.institution).status_code == 403
+
+
+def test_single_process_solve_reports_progress(monkeypatch):
+    monkeypatch.setattr(solver, "PROGRESS_INTERVAL", 0.05)
+    # Never complete (no room fits), so the search runs until the deadline
+    problem = {
+        "rooms": [], "slots": [], "fixed": [], "teacher_preferences": {},
+        "curriculum": [
+            {"group_id": 1, "subject_id": 1, "teacher_id": 1, "subject_type": "lecture", "lessons_per_week": 1},
+        ],
+    }
+    reported = []
+
+    result = solver.solve(problem, time_budget=0.3, workers=1, on_progress=reported.append)
+
+    assert len(result["unplaced"]) == 1
+    assert len(reported) >= 2
+    assert reported == sorted(reported) and 0 < reported[0] and reported[-1] < 1
+
+
+def test_curriculum_of_another_institution_fails_the_job(client, db, seed, admin_headers, generate, other_admin):
+    foreign = Teacher(full_name="Foreign teacher", institution_id=other_admin.institution_id)
+    db.add(foreign)
+    db.commit()
+    curriculum = [{"group_id": seed.groups[0], "subject_id": seed.subject, "teacher_id": foreign.id, "lessons_per_week": 1}]
+
+    job_id = generate(curriculum=curriculum).json()["id"]
+    run_pending_jobs()
+
+    job = client.get(f"/api/v1/schedule/generate/{job_id}", headers=admin_headers).json()
+    assert job["status"] == "failed"
+    assert "unknown groups, subjects or teachers" in job["error"]
+
+
+def test_no_classes_before_is_compared_as_a_time(client, db, seed, admin_headers, generate):
+    db.get(Teacher, seed.teachers[0]).preferences = {"no_classes_before": "10:30"}
+    db.commit()
+
+    job_id = generate().json()["id"]
+    run_pending_jobs()
+
+    job = client.get(f"/api/v1/schedule/generate/{job_id}", headers=admin_headers).json()
+    assert job["status"] == "completed"
+    assert {entry["time_slot_id"] for entry in job["entries"]} <= set(seed.slots[2:])
+
+
+def test_invalid_no_classes_before_fails_the_job(client, db, seed, admin_headers, generate):
+    db.get(Teacher, seed.teachers[0]).preferences = {"no_classes_before": "after lunch"}
+    db.commit()
+
+    job_id = generate().json()["id"]
+    run_pending_jobs()
+
+    job = client.get(f"/api/v1/schedule/generate/{job_id}", headers=admin_headers).json()
+    assert job["status"] == "failed"
+    assert "invalid no_classes_before" in job["error"]
+
+
+def test_replaced_entries_with_change_requests_are_cancelled(client, db, seed, admin_headers, generate, create_entry):
+    requested = create_entry(slot=0)
+    create_entry(slot=1)
+    db.add(ChangeRequest(
+        change_type=ChangeType.CANCELLATION, reason="Trip", requested_date=date(2026, 10, 19),
+        schedule_entry_id=requested["id"], created_by=seed.teacher_user,
+    ))
+    db.commit()
+
+    job_id = generate(replace_existing=True).json()["id"]
+    run_pending_jobs()
+    response = client.post(f"/api/v1/schedule/generate/{job_id}/apply", headers=admin_headers)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["created"] == 3
+    db.expire_all()
+    assert db.get(ScheduleEntry, requested["id"]).status == ScheduleStatus.CANCELLED
+    # The unreferenced entry is deleted; only the three new entries remain besides the cancelled one
+    assert db.query(ScheduleEntry).filter(ScheduleEntry.status != ScheduleStatus.CANCELLED).count() == 3
+    assert db.query(ScheduleEntry).count() == 4
+    assert db.query(ChangeRequest).one().schedule_entry_id == requested["id"]
@@ -1,4 +1,4 @@
-import { ReactNode, useState } from 'react'
+import { ReactNode, useEffect, useState } from 'react'
 import { Link, useLocation, useNavigate } from 'react-router-dom'
 import { 
   Calendar, 
@@ -13,7 +13,7 @@ import {
   FileEdit
 } from 'lucide-react'
 import { useAuthStore } from '../store/authStore'
-import { useQuery } from '@tanstack/react-query'
+import { useQuery, useQueryClient } from '@tanstack/react-query'
 import { notificationsApi } from '../services/api'
 
 interface LayoutProps {
@@ -24,13 +24,27 @@ export default function Layout({ children }: LayoutProps) {
   const [sidebarOpen, setSidebarOpen] = useState(false)
   const location = useLocation()
   const navigate = useNavigate()
-  const { user, logout } = useAuthStore()
+  const { user, token, logout } = useAuthStore()
+  const queryClient = useQueryClient()
 
-  const { data: notifications } = useQuery({
-    queryKey: ['notifications', 'unread'],
-    queryFn: () => notificationsApi.getNotifications(true),
+  const { data: unreadCount } = useQuery({
+    queryKey: ['notifications', 'unread-count'],
+    queryFn: notificationsApi.getUnreadCount,
   })
 
+  // Refetch only when the server pushes a change (the browser reconnects on its own)
+  useEffect(() => {
+    if (!token) return
+    const source = new EventSource(notificationsApi.streamUrl(token))
+    source.addEventListener('notification', () => {
+      queryClient.invalidateQueries({ queryKey: ['notifications'] })
+    })
+    source.addEventListener('schedule_changed', () => {
+      queryClient.invalidateQueries({ queryKey: ['schedule'] })
+    })
+    return () => source.close()
+  }, [token, queryClient])
+
   const handleLogout = () => {
     logout()
     navigate('/login')
@@ -153,7 +167,7 @@ export default function Layout({ children }: LayoutProps) {
           <div className="flex flex-1 justify-end px-4">
             <button className="relative p-2 text-gray-400 hover:text-gray-600">
               <Bell className="h-6 w-6" />
-              {notifications && notifications.length > 0 && (
+              {!!unreadCount && (
                 <span className="absolute top-1 right-1 block h-2 w-2 rounded-full bg-red-500" />
               )}
             </button>
@@ -190,6 +190,10 @@ export const notificationsApi = {
     const response = await api.get('/notifications', { params: { unread_only: unreadOnly } })
     return response.data
   },
+  getUnreadCount: async (): Promise<number> => {
+    const response = await api.get('/notifications/unread-count')
+    return response.data.unread
+  },
   markAsRead: async (id: number) => {
     const response = await api.put(`/notifications/${id}/read`)
     return response.data
@@ -198,5 +202,8 @@ export const notificationsApi = {
     const response = await api.put('/notifications/mark-all-read')
     return response.data
   },
+  // Server-sent events; EventSource cannot send headers, so the token goes in the URL
+  streamUrl: (token: string) =>
+    `${API_URL}/api/v1/notifications/stream?token=${encodeURIComponent(token)}`,
 }
 